@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Self-hosted, content-hashed and pre-compressed assets for the JS viewers.
+
+The viewers load PDF.js, Mammoth, SheetJS, JSZip and Bootstrap. Rather than
+pulling them from public CDNs on every page view (which fails air-gapped and
+costs DNS/TLS round trips elsewhere), they are vendored and served by the app:
+
+    python assets.py fetch    # download the pinned libraries into static/vendor/ (needs network, once)
+    python assets.py build    # hash and pre-compress static/ into static/dist/
+
+Each library is pinned by URL and SHA-256. `fetch` refuses a download whose
+digest does not match, and `build` leaves out a vendored file that does not
+match, so it loads from its CDN instead. `python assets.py pin` prints the
+digests of the files currently published, to review and copy into `VENDOR`;
+a library without a digest is never vendored.
+
+Fetching is a build step, never done by the apps. At startup they only
+`build` what is already vendored, which writes nothing when static/dist is
+up to date.
+
+`build` copies every script and stylesheet under static/, ours and vendored
+alike, to static/dist/<name>.<hash>.<ext>. Each copy gets gzip and (with the
+optional `brotli` package) brotli variants next to it. It also writes a
+manifest mapping logical names to hashed ones, as manifest.json for the
+server and manifest.js for the static HTML viewers; manifest.js also carries
+the CDN URL of each library from `VENDOR`, the loader's fallback. A hashed URL never
+changes content, so it is served with a one-year immutable cache lifetime.
+Files from earlier builds are kept, for pages still referring to them.
+
+Commit static/vendor/ (or run `fetch` once where there is network) to deploy
+without network access; anything not vendored falls back to its CDN URL.
+"""
+
+import os
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+import mimetypes
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # gzip variants only
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Pinned third-party libraries: logical name -> (upstream URL, SHA-256 of the file).
+# A digest of None means not pinned yet: the library always loads from its CDN.
+VENDOR: Dict[str, Tuple[str, Optional[str]]] = {
+    'vendor/pdf.min.js': ('https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.min.js', None),
+    'vendor/pdf.worker.min.js': ('https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.worker.min.js', None),
+    'vendor/mammoth.browser.min.js': ('https://cdnjs.cloudflare.com/ajax/libs/mammoth/1.6.0/mammoth.browser.min.js', None),
+    'vendor/xlsx.full.min.js': ('https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.18.5/xlsx.full.min.js', None),
+    'vendor/jszip.min.js': ('https://cdnjs.cloudflare.com/ajax/libs/jszip/3.10.1/jszip.min.js', None),
+    'vendor/bootstrap.min.css': ('https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css', None),
+    'vendor/bootstrap.bundle.min.js': ('https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js', None),
+}
+
+ASSET_EXTENSIONS = ('.js', '.css')
+HASH_LENGTH = 10
+# Smaller files are not worth a compressed variant
+MIN_COMPRESS_BYTES = 1024
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class VendorMismatch(Exception):
+    """A library's content does not match its pinned SHA-256 (or it has none)."""
+
+
+def cdn_urls() -> Dict[str, str]:
+    """Upstream URL of each pinned library, the client's fallback."""
+    return {name: url for name, (url, _) in VENDOR.items()}
+
+
+def verify_vendor(name: str, data: bytes) -> None:
+    """Raise VendorMismatch unless `data` is the pinned content of library `name`."""
+    expected = VENDOR[name][1]
+    if expected is None:
+        raise VendorMismatch(f"{name} has no pinned sha256 (see `python assets.py pin`)")
+    actual = hashlib.sha256(data).hexdigest()
+    if actual != expected:
+        raise VendorMismatch(f"{name} has sha256 {actual}, expected {expected}")
+
+
+def _download(url: str, timeout: float) -> bytes:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def fetch_vendor(static_dir: str = STATIC_DIR, force: bool = False, timeout: float = 60.0) -> List[str]:
+    """Download the pinned libraries that are not vendored yet; returns the names fetched.
+
+    Libraries without a digest are skipped. Raises VendorMismatch, before
+    writing anything for that library, when a download does not match its pin.
+    """
+    fetched = []
+    for name, (url, digest) in VENDOR.items():
+        path = os.path.join(static_dir, *name.split('/'))
+        if digest is None or (os.path.exists(path) and not force):
+            continue
+        data = _download(url, timeout)
+        verify_vendor(name, data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+        fetched.append(name)
+    return fetched
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    """'vendor/pdf.min.js' -> 'vendor/pdf.min.<hash>.js'."""
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def pin_digests(timeout: float = 60.0) -> Dict[str, str]:
+    """SHA-256 of each library as currently published, for review before pinning."""
+    return {name: hashlib.sha256(_download(url, timeout)).hexdigest() for name, (url, _) in VENDOR.items()}
+
+
+def _write_once(path: str, data: bytes) -> None:
+    # Content-addressed: an existing file already holds these bytes
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def _write_if_changed(path: str, text: str) -> None:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(path + '.tmp', path)
+
+
+def build(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """Write hashed, pre-compressed copies of the assets to static/dist; returns the manifest.
+
+    Vendored libraries that do not match their pin are left out (and
+    reported), so the viewers load them from their CDN.
+    """
+    dist_dir = os.path.join(static_dir, 'dist')
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [d for d in dirs if d != 'dist']
+        for filename in files:
+            if not filename.endswith(ASSET_EXTENSIONS):
+                continue
+            path = os.path.join(root, filename)
+            name = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            if name in VENDOR:
+                try:
+                    verify_vendor(name, data)
+                except VendorMismatch as e:
+                    print(f"Skipping vendored library: {e} (it loads from its CDN)")
+                    continue
+            hashed = hashed_name(name, data)
+            target = os.path.join(dist_dir, *hashed.split('/'))
+            _write_once(target, data)
+            if len(data) >= MIN_COMPRESS_BYTES:
+                _write_once(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+                if brotli is not None:
+                    _write_once(target + '.br', brotli.compress(data, quality=11))
+            manifest[name] = hashed
+
+    manifest = dict(sorted(manifest.items()))
+    os.makedirs(dist_dir, exist_ok=True)
+    # Rewritten only on change, so starting an app with a current build writes nothing
+    _write_if_changed(os.path.join(dist_dir, 'manifest.json'), json.dumps(manifest, indent=1))
+    _write_if_changed(os.path.join(dist_dir, 'manifest.js'),
+                      f"window.ASSET_MANIFEST = {json.dumps(manifest, indent=1)};\n"
+                      f"window.ASSET_CDN = {json.dumps(cdn_urls(), indent=1)};\n")
+    return manifest
+
+
+def _accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class AssetManifest:
+    """Resolves logical asset names to URLs and picks pre-compressed variants to serve.
+
+    `base_url` is where the hashed files are served (see `variant`);
+    `static_url` is used for our own files when no build exists.
+    """
+
+    def __init__(self, static_dir: str = STATIC_DIR, base_url: str = '/assets', static_url: str = 'static'):
+        self.dist_dir = os.path.join(static_dir, 'dist')
+        self.base_url = base_url
+        self.static_url = static_url
+        try:
+            with open(os.path.join(self.dist_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+                self.manifest: Dict[str, str] = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.manifest = {}
+        self._hashed = set(self.manifest.values())
+
+    def url(self, name: str) -> str:
+        """URL of an asset: its hashed copy if built, else its CDN or static URL."""
+        if name in self.manifest:
+            return f"{self.base_url}/{self.manifest[name]}"
+        return cdn_urls().get(name) or f"{self.static_url}/{name}"
+
+    def to_json(self) -> str:
+        """The manifest as JSON, for pages that resolve assets on the client."""
+        return json.dumps(self.manifest)
+
+    @staticmethod
+    def cdn_json() -> str:
+        """CDN URLs of the pinned libraries as JSON, the client's fallback."""
+        return json.dumps(cdn_urls())
+
+    def variant(self, filename: str, accept_encoding: str = '') -> Optional[Tuple[str, Optional[str]]]:
+        """(path, content encoding) of the best file to serve for a hashed name, or None.
+
+        Only names listed in the manifest are served, so nothing outside
+        static/dist can be reached.
+        """
+        if filename not in self._hashed:
+            return None
+        path = os.path.join(self.dist_dir, *filename.split('/'))
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
+
+    @staticmethod
+    def mimetype(filename: str) -> str:
+        return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Vendor and build the JavaScript viewers' assets.")
+    parser.add_argument('command', choices=('fetch', 'build', 'pin'),
+                        help="fetch: download pinned libraries into static/vendor; build: hash and pre-compress "
+                             "into static/dist; pin: print the sha256 of each library as published")
+    parser.add_argument('--static-dir', default=STATIC_DIR, help="Static assets directory")
+    parser.add_argument('--force', action='store_true', help="fetch: download again even if already vendored")
+    args = parser.parse_args(argv)
+
+    if args.command == 'pin':
+        for name, digest in pin_digests().items():
+            print(f"{name} {digest}")
+        return 0
+
+    if args.command == 'fetch':
+        try:
+            fetched = fetch_vendor(args.static_dir, force=args.force)
+        except VendorMismatch as e:
+            print(f"Refusing to vendor: {e}", file=sys.stderr)
+            return 1
+        print(f"Fetched {len(fetched)} of {len(VENDOR)} libraries into {os.path.join(args.static_dir, 'vendor')}")
+        return 0
+
+    manifest = build(args.static_dir)
+    vendored = sum(1 for name in VENDOR if name in manifest)
+    print(f"Built {len(manifest)} assets ({vendored} of {len(VENDOR)} vendored libraries) "
+          f"into {os.path.join(args.static_dir, 'dist')}{'' if brotli else ' (gzip only; install brotli for .br)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Benchmark DocumentPreviewer across formats and document sizes.
+
+Generates synthetic PDF, DOCX, PPTX and XLSX files of increasing size, then
+measures `get_page_count` and `preview_page` latency, peak RSS and
+throughput for each (format, size) case. Every case runs in a freshly
+spawned worker process (not forked from this one, which holds the generated
+documents), so peak RSS belongs to that case alone. Results are emitted
+as JSON so they can be compared across commits.
+
+    python benchmark.py --sizes 1 10 50 --repeat 3 --output bench.json
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+import multiprocessing
+from typing import Callable, Dict, List, Optional
+
+from docx import Document
+from pptx import Presentation
+from pptx.util import Inches, Pt
+import openpyxl
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from document_previewer import DocumentPreviewer
+from prerender import percentile
+
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+         "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat.")
+
+
+def generate_pdf(path: str, pages: int):
+    """Write a PDF with `pages` pages of text."""
+    c = canvas.Canvas(path, pagesize=letter)
+    for page in range(1, pages + 1):
+        c.setFont("Helvetica-Bold", 18)
+        c.drawString(72, 720, f"Benchmark PDF - Page {page}")
+        c.setFont("Helvetica", 11)
+        for line in range(40):
+            c.drawString(72, 690 - line * 15, f"{line + 1:02d}. {LOREM[:90]}")
+        c.showPage()
+    c.save()
+
+
+def generate_docx(path: str, pages: int):
+    """Write a DOCX with roughly `pages` pages (20 paragraphs per page)."""
+    doc = Document()
+    doc.add_heading("Benchmark DOCX", level=1)
+    for i in range(pages * 20):
+        doc.add_paragraph(f"{i + 1}. {LOREM}")
+    doc.save(path)
+
+
+def generate_pptx(path: str, slides: int):
+    """Write a PPTX with `slides` title-and-content slides."""
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(1, slides + 1):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Benchmark Slide {i}"
+        body = slide.placeholders[1].text_frame
+        body.text = LOREM[:80]
+        for bullet in range(4):
+            body.add_paragraph().text = f"Point {bullet + 1}: {LOREM[:60]}"
+        box = slide.shapes.add_textbox(Inches(1), Inches(6), Inches(8), Inches(1))
+        box.text_frame.text = f"Footer {i}"
+        box.text_frame.paragraphs[0].runs[0].font.size = Pt(12)
+    prs.save(path)
+
+
+def generate_xlsx(path: str, sheets: int, rows: int = 500):
+    """Write an XLSX with `sheets` sheets of `rows` rows each."""
+    wb = openpyxl.Workbook()
+    for s in range(sheets):
+        ws = wb.active if s == 0 else wb.create_sheet()
+        ws.title = f"Sheet{s + 1}"
+        ws.append(["ID", "Name", "Amount", "Ratio", "Region", "Notes"])
+        for r in range(rows):
+            ws.append([r, f"Item {r}", r * 3.5, r / (rows or 1), f"Region {r % 7}", LOREM[:40]])
+    wb.save(path)
+
+
+GENERATORS: Dict[str, Callable[[str, int], None]] = {
+    '.pdf': generate_pdf,
+    '.docx': generate_docx,
+    '.pptx': generate_pptx,
+    '.xlsx': generate_xlsx,
+}
+
+
+def _timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run_case(file_path: str, repeat: int) -> dict:
+    """Benchmark one document; runs inside a fresh worker process."""
+    previewer = DocumentPreviewer()
+
+    count_times = [_timed(previewer.get_page_count, file_path) for _ in range(repeat)]
+    page_count = previewer.get_page_count(file_path)
+
+    # First, middle and last page cover both cheap and seek-heavy paths
+    sample_pages = sorted({1, max(1, (page_count + 1) // 2), max(1, page_count)})
+    preview_times = []
+    errors = 0
+    for _ in range(repeat):
+        for page in sample_pages:
+            start = time.perf_counter()
+            try:
+                if previewer.render_page(file_path, page) is None:
+                    errors += 1
+            except Exception:
+                errors += 1
+            preview_times.append(time.perf_counter() - start)
+
+    count_times.sort()
+    preview_times.sort()
+    total_preview = sum(preview_times)
+    rendered = len(preview_times) - errors
+    return {
+        'page_count': page_count,
+        'file_bytes': os.path.getsize(file_path),
+        'get_page_count_ms': _summarise(count_times),
+        'preview_page_ms': _summarise(preview_times),
+        'pages_per_s': round(rendered / total_preview, 2) if total_preview > 0 else 0.0,
+        'errors': errors,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process.
+
+    Linux carries ru_maxrss over exec, so a spawned worker would report the
+    peak of the process it was forked from; VmHWM belongs to this process only.
+    """
+    try:
+        with open('/proc/self/status', 'r', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                 / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _summarise(sorted_values: List[float]) -> dict:
+    return {
+        'p50': round(percentile(sorted_values, 50) * 1000, 2),
+        'p90': round(percentile(sorted_values, 90) * 1000, 2),
+        'max': round(sorted_values[-1] * 1000, 2) if sorted_values else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes: List[int], formats: List[str], repeat: int, work_dir: str) -> dict:
+    """Generate the synthetic corpus and benchmark every (format, size) case."""
+    results = []
+    for ext in formats:
+        for size in sizes:
+            file_path = os.path.join(work_dir, f"bench_{size}{ext}")
+            if not os.path.exists(file_path):
+                GENERATORS[ext](file_path, size)
+
+            # A spawned process starts empty; a forked one would inherit the generator's memory
+            with multiprocessing.get_context('spawn').Pool(processes=1, maxtasksperchild=1) as pool:
+                try:
+                    stats = pool.apply(run_case, (file_path, repeat))
+                except Exception as e:
+                    stats = {'error': str(e)}
+
+            stats.update({'format': ext, 'size': size})
+            results.append(stats)
+            print(f"{ext:6} size={size:<5} " + (
+                f"count p50 {stats['get_page_count_ms']['p50']}ms | "
+                f"preview p50 {stats['preview_page_ms']['p50']}ms | "
+                f"{stats['pages_per_s']} pages/s | peak RSS {stats['peak_rss_mb']}MB"
+                if 'error' not in stats else f"error: {stats['error']}"), file=sys.stderr)
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark DocumentPreviewer across formats and sizes.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50],
+                        help="Document sizes in pages/slides/sheets")
+    parser.add_argument('--formats', nargs='+', default=list(GENERATORS),
+                        choices=list(GENERATORS), help="Formats to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetitions per measurement")
+    parser.add_argument('--work-dir', help="Where to keep generated documents (default: temp dir)")
+    parser.add_argument('--output', help="Write JSON results to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    if args.work_dir:
+        os.makedirs(args.work_dir, exist_ok=True)
+        report = run_benchmark(args.sizes, args.formats, args.repeat, args.work_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix='docpreview-bench-') as work_dir:
+            report = run_benchmark(args.sizes, args.formats, args.repeat, work_dir)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,91 @@
 import os
 import io
+import re
+import html
+import subprocess
 import base64
-from typing import List, Tuple, Optional
+from typing import Iterable, List, Tuple, Optional
 from PIL import Image, ImageDraw, ImageFont
 import pdf2image
+from pypdf import PdfReader
 from docx import Document
-from pptx import Presentation
 import openpyxl
 from openpyxl.drawing.image import Image as ExcelImage
 import tempfile
+import time
+import math
+import threading
+from collections import OrderedDict
+from functools import lru_cache, partial
+from render_cache import RenderCache, THUMBNAIL_SIZE, file_sha256
+from render_limits import RenderLimits, RenderLimitExceeded, DocumentQuarantined, DEFAULT_MAX_PIXELS
+from metrics import registry as metrics
+from profiler import SlowRenderProfiler
+from singleflight import SingleFlight
+from pptx_slides import SlideDeck, EMU_PER_POINT
+from image_parts import ImageParts
+from page_sizes import PageSizes, pdf_page_sizes, slide_page_sizes, docx_page_sizes
+from workspace import MemoryBudget
+from fork_safety import renew_locks_after_fork
+
+FONT_REGULAR = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+FONT_BOLD = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+
+_BBOX_PAGE = re.compile(r'<page width="([\d.]+)" height="([\d.]+)"')
+_BBOX_WORD = re.compile(r'<word xMin="([\d.]+)" yMin="([\d.]+)" xMax="([\d.]+)" yMax="([\d.]+)">(.*?)</word>')
+
+
+class PageNotFound(LookupError):
+    """The requested page, slide or sheet is past the end of the document."""
+
+
+@lru_cache(maxsize=64)
+def _truetype(path: str, size: int):
+    return ImageFont.truetype(path, size)
+
+
+def parse_pdftotext_bbox(output: str) -> List[list]:
+    """Parse `pdftotext -bbox` output (one page) into normalised word boxes."""
+    page = _BBOX_PAGE.search(output)
+    if page is None:
+        return []
+    width, height = float(page.group(1)), float(page.group(2))
+    return [
+        [html.unescape(word), round(float(x0) / width, 5), round(float(y0) / height, 5),
+         round(float(x1) / width, 5), round(float(y1) / height, 5)]
+        for x0, y0, x1, y1, word in _BBOX_WORD.findall(output)
+    ]
+
 
 class DocumentPreviewer:
-    def __init__(self):
+    # DOCX has no stored layout; pages are fixed-size runs of paragraphs
+    DOCX_PARAGRAPHS_PER_PAGE = 20
+    # Word places pictures at 96 DPI; the page render is drawn at about the same scale
+    DOCX_EMU_PER_PIXEL = 9525
+    # Cell window shown in sheet previews
+    EXCEL_MAX_ROWS, EXCEL_MAX_COLS = 20, 6
+    # Slides are drawn at this width, keeping the deck's aspect ratio
+    PPTX_WIDTH = 1280
+    # Decks kept open so slide XML, layouts and decoded media are reused across slides.
+    # Only without render limits: a limited render runs in a forked child that exits
+    # afterwards, taking the decks it opened with it.
+    MAX_OPEN_DECKS = 8
+    
+    def __init__(self, cache: Optional[RenderCache] = None, profiler: Optional[SlowRenderProfiler] = None,
+                 limits: Optional[RenderLimits] = None, memory: Optional[MemoryBudget] = None):
         self.supported_formats = ['.pdf', '.docx', '.pptx', '.xlsx']
+        self.cache = cache
+        self.profiler = profiler
+        self.limits = limits
+        # Rendered pages (and open decks) held in memory, within a budget shared with other sessions
+        self.memory = memory
+        # Concurrent requests for the same page share one render
+        self._flights = SingleFlight(on_coalesced=lambda key: metrics.inc(metrics.coalesced_renders, format=key[2]))
+        # Embedded pictures decoded at display size, shared by every document
+        self.images = ImageParts(cache)
+        self._decks: 'OrderedDict[tuple, SlideDeck]' = OrderedDict()
+        self._decks_lock = threading.Lock()
+        renew_locks_after_fork(self, '_decks_lock')
     
     def is_supported(self, file_path: str) -> bool:
         """Check if the file format is supported."""
@@ -24,47 +97,329 @@ class DocumentPreviewer:
         _, ext = os.path.splitext(file_path.lower())
         
         try:
-            if ext == '.pdf':
-                return self._get_pdf_page_count(file_path)
-            elif ext == '.docx':
-                return self._get_docx_page_count(file_path)
-            elif ext == '.pptx':
-                return self._get_pptx_slide_count(file_path)
-            elif ext == '.xlsx':
-                return self._get_excel_sheet_count(file_path)
-            else:
-                return 0
+            if self.cache is None:
+                with metrics.span('page_count', format=ext):
+                    return self.run_limited(file_path, self._count_pages, file_path, ext)
+            
+            # Known documents (e.g. re-uploads) reuse their cached metadata
+            doc_key = self.cache.document_key(file_path)
+            meta = self.cache.get_meta(doc_key)
+            if meta is not None and 'page_count' in meta:
+                return meta['page_count']
+            with metrics.span('page_count', format=ext):
+                page_count = self.run_limited(file_path, self._count_pages, file_path, ext)
+            if page_count > 0:
+                meta = dict(meta or {}, page_count=page_count, format=ext)
+                self.cache.put_meta(doc_key, meta)
+            return page_count
         except Exception as e:
             print(f"Error getting page count for {file_path}: {e}")
+            metrics.log_event('page_count_error', file=file_path, format=ext, error=str(e))
             return 0
     
-    def preview_page(self, file_path: str, page_number: int) -> Optional[Image.Image]:
-        """Generate a preview image for a specific page/slide/sheet."""
+    def get_page_sizes(self, file_path: str) -> Optional[PageSizes]:
+        """Size of every page in points, read without rendering; None for sheets or on error."""
         _, ext = os.path.splitext(file_path.lower())
+        if ext not in ('.pdf', '.docx', '.pptx'):
+            return None
         
         try:
-            if ext == '.pdf':
-                return self._preview_pdf_page(file_path, page_number)
-            elif ext == '.docx':
-                return self._preview_docx_page(file_path, page_number)
-            elif ext == '.pptx':
-                return self._preview_pptx_slide(file_path, page_number)
-            elif ext == '.xlsx':
-                return self._preview_excel_sheet(file_path, page_number)
-            else:
-                return None
+            meta = None
+            if self.cache is not None:
+                doc_key = self.cache.document_key(file_path)
+                meta = self.cache.get_meta(doc_key)
+                if meta is not None and 'page_sizes' in meta:
+                    return PageSizes.from_runs(meta['page_sizes'])
+            with metrics.span('page_sizes', format=ext):
+                sizes = self.run_limited(file_path, self._read_page_sizes, file_path, ext)
+            if self.cache is not None and len(sizes) > 0:
+                meta = dict(meta or {}, page_sizes=sizes.to_runs(), format=ext)
+                # The same pass counted the pages
+                meta.setdefault('page_count', len(sizes))
+                self.cache.put_meta(doc_key, meta)
+            return sizes
+        except Exception as e:
+            print(f"Error reading page sizes of {file_path}: {e}")
+            metrics.log_event('page_sizes_error', file=file_path, format=ext, error=str(e))
+            return None
+    
+    def _read_page_sizes(self, file_path: str, ext: str) -> PageSizes:
+        """Dispatch to the format-specific page size reader."""
+        if ext == '.pdf':
+            return pdf_page_sizes(file_path)
+        elif ext == '.pptx':
+            deck = self._pptx_deck(file_path)
+            return slide_page_sizes(deck.slide_count, deck.slide_size)
+        else:
+            doc = Document(file_path)
+            return docx_page_sizes(doc, self._count_docx_pages(doc), self.DOCX_PARAGRAPHS_PER_PAGE)
+    
+    def _count_pages(self, file_path: str, ext: str) -> int:
+        """Dispatch to the format-specific page counter."""
+        if ext == '.pdf':
+            return self._get_pdf_page_count(file_path)
+        elif ext == '.docx':
+            return self._get_docx_page_count(file_path)
+        elif ext == '.pptx':
+            return self._get_pptx_slide_count(file_path)
+        elif ext == '.xlsx':
+            return self._get_excel_sheet_count(file_path)
+        else:
+            return 0
+    
+    def preview_page(self, file_path: str, page_number: int, highlight: Iterable[str] = ()) -> Optional[Image.Image]:
+        """Generate a preview image for a specific page/slide/sheet.
+        
+        Words matching any of the `highlight` terms are marked on the preview.
+        """
+        try:
+            image = self.render_page(file_path, page_number)
+            if highlight and image is not None:
+                image = self._highlighted(image, file_path, page_number, highlight)
+            return image
+        except DocumentQuarantined:
+            return self._create_error_image("Document quarantined: it repeatedly exceeded render limits")
+        except PageNotFound as e:
+            return self._create_error_image(str(e))
+        except RenderLimitExceeded as e:
+            print(f"Render limit exceeded for page {page_number} of {file_path}: {e}")
+            metrics.log_event('render_limit_exceeded', file=file_path, page=page_number, error=str(e))
+            return self._create_error_image(f"Page {page_number} exceeded render limits")
         except Exception as e:
             print(f"Error previewing page {page_number} of {file_path}: {e}")
+            metrics.log_event('render_error', file=file_path, page=page_number, error=str(e))
             return self._create_error_image(f"Error loading page {page_number}")
     
+    def render_page(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Render a page through the cache (if any), raising on failure.
+        
+        Identical requests arriving while a render is in flight wait for it and
+        receive the same image, so callers must not mutate the result.
+        """
+        key = self._render_key(file_path, page_number)
+        if self.memory is None:
+            return self._flights.do(key, self._render_profiled, file_path, page_number)
+        
+        image = self.memory.get(key)
+        if image is not None:
+            metrics.inc(metrics.cache_requests, result='memory', kind='page')
+        else:
+            image = self._flights.do(key, self._render_profiled, file_path, page_number)
+            if image is not None:
+                self.memory.put(key, image, image.width * image.height * len(image.getbands()), owner=key[0])
+        return image
+    
+    def release(self, file_path: str) -> None:
+        """Drop the pages and parsed deck held in memory for a document (its disk cache stays)."""
+        if self.memory is not None:
+            self.memory.release(self._document_id(file_path))
+        path = os.path.abspath(file_path)
+        with self._decks_lock:
+            for key in [key for key in self._decks if key[0] == path]:
+                del self._decks[key]
+    
+    def _document_id(self, file_path: str):
+        """Identity of a document's content: its cache key, or path, size and mtime without a cache."""
+        if self.cache is not None:
+            return self.cache.document_key(file_path)
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+    
+    def _render_key(self, file_path: str, page_number: int) -> tuple:
+        """Identity of a render: document, page and render parameters."""
+        _, ext = os.path.splitext(file_path.lower())
+        return (self._document_id(file_path), page_number, ext, 'page')
+    
+    def _render_profiled(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        if self.profiler is None:
+            return self._render_cached(file_path, page_number)
+        
+        doc_key = self.cache.document_key(file_path) if self.cache is not None else None
+        with self.profiler.profile(file_path, page_number, doc_key=doc_key):
+            return self._render_cached(file_path, page_number)
+    
+    def _render_cached(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Look the page up in the cache, rendering and storing it on a miss."""
+        if self.cache is None:
+            return self._timed_render(file_path, page_number)
+        
+        with metrics.span('cache_lookup'):
+            doc_key = self.cache.document_key(file_path)
+            image = self.cache.get(doc_key, page_number)
+        metrics.inc(metrics.cache_requests, result='hit' if image is not None else 'miss', kind='page')
+        if image is None:
+            image = self._timed_render(file_path, page_number)
+            if image is not None:
+                with metrics.span('encode', format='png'):
+                    self.cache.put(doc_key, page_number, image)
+        return image
+    
+    def _timed_render(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Render a page, recording latency and render/error counters."""
+        if not metrics.enabled:
+            return self._render_limited(file_path, page_number)
+        
+        _, ext = os.path.splitext(file_path.lower())
+        start = time.perf_counter()
+        try:
+            image = self._render_limited(file_path, page_number)
+        except Exception:
+            metrics.inc(metrics.render_errors, format=ext)
+            raise
+        metrics.observe(metrics.render_seconds, time.perf_counter() - start, format=ext)
+        metrics.inc(metrics.renders, format=ext)
+        return image
+    
+    def _render_limited(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Render under the configured time/memory/pixel limits, if any."""
+        return self.run_limited(file_path, self._render_page, file_path, page_number)
+    
+    def run_limited(self, file_path: str, fn, *args):
+        """Run work that parses `file_path` under the render limits, if any.
+        
+        All parsing of document content goes through here, so with isolation
+        enabled it happens in forked children only. Besides bounding untrusted
+        input, this keeps parser state (lxml locks) out of the parent's threads,
+        where a concurrent fork could inherit it locked and deadlock the child.
+        """
+        if self.limits is None:
+            return fn(*args)
+        
+        doc_key = self.cache.document_key(file_path) if self.cache is not None else file_sha256(file_path)
+        if self.profiler is not None and self.limits.can_isolate:
+            # This thread only waits for the child; the child profiles the render itself
+            return self.profiler.run_isolated(partial(self.limits.run, doc_key), fn, *args)
+        return self.limits.run(doc_key, fn, *args)
+    
+    def get_thumbnail(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Return a cached thumbnail, rendering the page first if needed."""
+        if self.cache is None:
+            image = self._render_limited(file_path, page_number)
+            if image is not None:
+                image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+            return image
+        
+        doc_key = self.cache.document_key(file_path)
+        thumb = self.cache.get(doc_key, page_number, kind='thumb')
+        metrics.inc(metrics.cache_requests, result='hit' if thumb is not None else 'miss', kind='thumb')
+        if thumb is None:
+            image = self.render_page(file_path, page_number)
+            if image is None:
+                return None
+            thumb = self.cache.make_thumbnail(image)
+            self.cache.put(doc_key, page_number, thumb, kind='thumb')
+        return thumb
+    
+    def get_word_boxes(self, file_path: str, page_number: int) -> List[list]:
+        """Word positions on a page as [word, x0, y0, x1, y1] fractions of the page size.
+        
+        Boxes come from the page layout (pdftotext for PDFs), not from a render,
+        and are cached next to the page images. Being resolution independent
+        they apply to any render of the page, server or client side.
+        """
+        if self.cache is None:
+            return self.run_limited(file_path, self._extract_word_boxes, file_path, page_number)
+        
+        doc_key = self.cache.document_key(file_path)
+        boxes = self.cache.get_words(doc_key, page_number)
+        metrics.inc(metrics.cache_requests, result='hit' if boxes is not None else 'miss', kind='words')
+        if boxes is None:
+            boxes = self.run_limited(file_path, self._extract_word_boxes, file_path, page_number)
+            self.cache.put_words(doc_key, page_number, boxes)
+        return boxes
+    
+    def highlight_words(self, image: Image.Image, file_path: str, page_number: int,
+                        terms: Iterable[str]) -> Image.Image:
+        """Return a copy of a page image with words matching `terms` highlighted."""
+        terms = {term.lower() for term in terms}
+        width, height = image.size
+        overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(overlay)
+        for word, x0, y0, x1, y1 in self.get_word_boxes(file_path, page_number):
+            if terms.intersection(re.findall(r'\w+', word.lower())):
+                draw.rectangle([x0 * width - 2, y0 * height - 2, x1 * width + 2, y1 * height + 2],
+                               fill=(255, 230, 0, 110), outline=(255, 160, 0, 255))
+        return Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+    
+    def _highlighted(self, image: Image.Image, file_path: str, page_number: int, terms: Iterable[str]) -> Image.Image:
+        """Highlight search terms, falling back to the plain page if word boxes are unavailable."""
+        try:
+            with metrics.span('highlight'):
+                return self.highlight_words(image, file_path, page_number, terms)
+        except Exception as e:
+            print(f"Error highlighting page {page_number} of {file_path}: {e}")
+            metrics.log_event('highlight_error', file=file_path, page=page_number, error=str(e))
+            return image
+    
+    def _extract_word_boxes(self, file_path: str, page_number: int) -> List[list]:
+        """Dispatch to the format-specific word box extraction."""
+        _, ext = os.path.splitext(file_path.lower())
+        
+        if ext == '.pdf':
+            return self._pdf_word_boxes(file_path, page_number)
+        elif ext == '.docx':
+            size, items, _ = self._layout_docx_page(Document(file_path), page_number)
+        elif ext == '.pptx':
+            deck = self._pptx_deck(file_path)
+            if page_number > deck.slide_count:
+                return []
+            size, items, _ = self._layout_pptx_slide(deck, page_number)
+        elif ext == '.xlsx':
+            sheet = self._read_excel_window(file_path, page_number)
+            if sheet is None:
+                return []
+            size, items, _ = self._layout_excel_sheet(*sheet)
+        else:
+            return []
+        return self._layout_word_boxes(size, items)
+    
+    def _layout_word_boxes(self, size: Tuple[int, int], items: List[tuple]) -> List[list]:
+        """Measure the words of laid-out text items without drawing them."""
+        width, height = size
+        boxes = []
+        for x, y, text, font, _ in items:
+            # One box height per line, so highlights line up
+            _, top, _, bottom = font.getbbox(text)
+            for match in re.finditer(r'\S+', text):
+                x0 = x + font.getlength(text[:match.start()])
+                x1 = x + font.getlength(text[:match.end()])
+                boxes.append([match.group(), round(x0 / width, 5), round((y + top) / height, 5),
+                              round(x1 / width, 5), round((y + bottom) / height, 5)])
+        return boxes
+    
+    def _pdf_word_boxes(self, file_path: str, page_number: int) -> List[list]:
+        """Word boxes of a PDF page from poppler's pdftotext (installed alongside pdftoppm)."""
+        result = subprocess.run(
+            ['pdftotext', '-f', str(page_number), '-l', str(page_number), '-bbox', file_path, '-'],
+            capture_output=True, text=True, check=True, timeout=60
+        )
+        return parse_pdftotext_bbox(result.stdout)
+    
+    def _render_page(self, file_path: str, page_number: int) -> Optional[Image.Image]:
+        """Dispatch to the format-specific renderer."""
+        _, ext = os.path.splitext(file_path.lower())
+        
+        if ext == '.pdf':
+            return self._preview_pdf_page(file_path, page_number)
+        elif ext == '.docx':
+            return self._preview_docx_page(file_path, page_number)
+        elif ext == '.pptx':
+            return self._preview_pptx_slide(file_path, page_number)
+        elif ext == '.xlsx':
+            return self._preview_excel_sheet(file_path, page_number)
+        else:
+            return None
+    
     def _get_pdf_page_count(self, file_path: str) -> int:
         """Get the number of pages in a PDF."""
-        images = pdf2image.convert_from_path(file_path)
-        return len(images)
+        # Read the page tree instead of rasterising every page just to count them
+        return len(PdfReader(file_path).pages)
     
     def _get_docx_page_count(self, file_path: str) -> int:
         """Estimate the number of pages in a DOCX (simplified approach)."""
-        doc = Document(file_path)
+        return self._count_docx_pages(Document(file_path))
+    
+    def _count_docx_pages(self, doc) -> int:
         # This is a rough estimation - DOCX doesn't have explicit page breaks
         # We'll count page breaks and estimate based on content
         page_breaks = 0
@@ -77,57 +432,80 @@ class DocumentPreviewer:
         # If no explicit page breaks found, estimate based on content length
         if page_breaks == 0:
             total_paragraphs = len(doc.paragraphs)
-            estimated_pages = max(1, (total_paragraphs + 19) // 20)  # Roughly 20 paragraphs per page
-            return min(estimated_pages, 5)  # Cap at 5 for our sample
+            per_page = self.DOCX_PARAGRAPHS_PER_PAGE
+            return max(1, (total_paragraphs + per_page - 1) // per_page)
         
         return page_breaks + 1
     
     def _get_pptx_slide_count(self, file_path: str) -> int:
         """Get the number of slides in a PPTX."""
-        prs = Presentation(file_path)
-        return len(prs.slides)
+        return self._pptx_deck(file_path).slide_count
     
     def _get_excel_sheet_count(self, file_path: str) -> int:
         """Get the number of sheets in an Excel file."""
-        wb = openpyxl.load_workbook(file_path)
-        return len(wb.worksheets)
+        # read_only streams sheets lazily instead of loading every cell
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return len(wb.sheetnames)
+        finally:
+            wb.close()
     
     def _preview_pdf_page(self, file_path: str, page_number: int) -> Image.Image:
         """Generate preview for a PDF page."""
-        images = pdf2image.convert_from_path(file_path, first_page=page_number, last_page=page_number, dpi=150)
+        dpi = self._pdf_render_dpi(file_path, page_number)
+        with metrics.span('rasterise', format='.pdf'):
+            images = pdf2image.convert_from_path(file_path, first_page=page_number, last_page=page_number, dpi=dpi)
         if images:
             return images[0]
-        return self._create_error_image(f"PDF page {page_number} not found")
+        raise PageNotFound(f"PDF page {page_number} not found")
+    
+    def _pdf_render_dpi(self, file_path: str, page_number: int, dpi: int = 150) -> int:
+        """Lower the render DPI so oversized pages stay within the pixel budget."""
+        max_pixels = self.limits.max_pixels if self.limits is not None else DEFAULT_MAX_PIXELS
+        reader = PdfReader(file_path)
+        if page_number > len(reader.pages):
+            return dpi
+        box = reader.pages[page_number - 1].mediabox
+        pixels = (float(box.width) / 72 * dpi) * (float(box.height) / 72 * dpi)
+        if pixels > max_pixels:
+            dpi = int(dpi * math.sqrt(max_pixels / pixels))
+        return max(dpi, 1)
     
     def _preview_docx_page(self, file_path: str, page_number: int) -> Image.Image:
         """Generate preview for a DOCX page (simplified text rendering)."""
-        doc = Document(file_path)
+        with metrics.span('open', format='.docx'):
+            doc = Document(file_path)
+        if page_number > self._count_docx_pages(doc):
+            raise PageNotFound(f"Page {page_number} not found")
         
-        # Create a white background image
-        img_width, img_height = 800, 1000
-        img = Image.new('RGB', (img_width, img_height), 'white')
-        draw = ImageDraw.Draw(img)
+        with metrics.span('layout', format='.docx'):
+            size, items, pictures = self._layout_docx_page(doc, page_number)
         
-        try:
-            # Try to use a default font, fallback to default if not available
-            font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
-            font_text = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 16)
-        except:
-            font_title = ImageFont.load_default()
-            font_text = ImageFont.load_default()
+        related = doc.part.related_parts
+        return self._paint(size, items, shapes=pictures,
+                           load_image=lambda r_id, box_size: self.images.get(related[r_id].blob, box_size))
+    
+    def _layout_docx_page(self, doc, page_number: int) -> Tuple[Tuple[int, int], List[tuple], List[tuple]]:
+        """Position the text lines and inline pictures of a DOCX page.
+        
+        Returns (size, text items, picture drawing ops); pictures refer to their
+        image part by relationship id.
+        """
+        img_width, img_height = 800, 1000
+        font_title, font_text = self._load_fonts(24, 16)
         
+        # Add page header
+        items = [(50, 20, f"DOCX Document - Page {page_number}", font_title, 'black')]
+        pictures = []
         y_position = 50
         
         # Calculate which paragraphs belong to this page
-        paragraphs_per_page = 20
+        paragraphs_per_page = self.DOCX_PARAGRAPHS_PER_PAGE
         start_para = (page_number - 1) * paragraphs_per_page
         end_para = start_para + paragraphs_per_page
         
-        # Add page header
-        draw.text((50, 20), f"DOCX Document - Page {page_number}", fill='black', font=font_title)
-        
-        # Render paragraphs for this page
-        for i, paragraph in enumerate(doc.paragraphs[start_para:end_para], start=start_para):
+        # Lay out paragraphs for this page
+        for paragraph in doc.paragraphs[start_para:end_para]:
             if y_position > img_height - 100:
                 break
             
@@ -138,112 +516,253 @@ class DocumentPreviewer:
                 for line in wrapped_text:
                     if y_position > img_height - 50:
                         break
-                    draw.text((50, y_position), line, fill='black', font=font_text)
+                    items.append((50, y_position, line, font_text, 'black'))
                     y_position += 25
                 y_position += 10  # Extra space between paragraphs
-        
-        return img
+            
+            # Pictures follow the paragraph's text, shrunk to the page width and the space left
+            for drawing in paragraph._element.xpath('.//wp:inline | .//wp:anchor'):
+                extent = drawing.xpath('./wp:extent')
+                r_ids = drawing.xpath('.//a:blip/@r:embed')
+                if not extent or not r_ids:
+                    continue
+                width = int(extent[0].get('cx')) / self.DOCX_EMU_PER_PIXEL
+                height = int(extent[0].get('cy')) / self.DOCX_EMU_PER_PIXEL
+                fit = min(1.0, (img_width - 100) / max(width, 1), (img_height - 50 - y_position) / max(height, 1))
+                if height * fit < 20:
+                    break
+                width, height = max(1, round(width * fit)), round(height * fit)
+                pictures.append(('image', (50, y_position, 50 + width, y_position + height), r_ids[0]))
+                y_position += height + 10
+        
+        return (img_width, img_height), items, pictures
     
     def _preview_pptx_slide(self, file_path: str, page_number: int) -> Image.Image:
         """Generate preview for a PPTX slide."""
-        prs = Presentation(file_path)
+        with metrics.span('open', format='.pptx'):
+            deck = self._pptx_deck(file_path)
         
-        if page_number > len(prs.slides):
-            return self._create_error_image(f"Slide {page_number} not found")
+        if page_number > deck.slide_count:
+            raise PageNotFound(f"Slide {page_number} not found")
         
-        slide = prs.slides[page_number - 1]
+        with metrics.span('layout', format='.pptx'):
+            size, items, shapes = self._layout_pptx_slide(deck, page_number)
         
-        # Create a white background image
-        img_width, img_height = 800, 600
-        img = Image.new('RGB', (img_width, img_height), 'white')
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            font_title = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 32)
-            font_text = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 18)
-        except:
-            font_title = ImageFont.load_default()
-            font_text = ImageFont.load_default()
-        
-        y_position = 50
-        
-        # Extract and render slide content
-        for shape in slide.shapes:
-            if hasattr(shape, "text") and shape.text.strip():
-                text = shape.text.strip()
-                
-                # Determine if this is likely a title (first text or larger)
-                is_title = y_position == 50 or len(text) < 100
-                current_font = font_title if is_title else font_text
-                
-                # Wrap and draw text
-                wrapped_text = self._wrap_text(text, current_font, img_width - 100)
-                for line in wrapped_text:
-                    if y_position > img_height - 50:
-                        break
-                    draw.text((50, y_position), line, fill='black', font=current_font)
-                    y_position += 40 if is_title else 25
-                
-                y_position += 20  # Extra space between text blocks
+        return self._paint(size, items, shapes=shapes,
+                           load_image=lambda part, box_size: self.images.get(deck.media(part), box_size))
+    
+    def _pptx_deck(self, file_path: str) -> SlideDeck:
+        """Open (or reuse) the deck of a PPTX; a changed file is reopened.
+        
+        Under render limits every render opens the deck afresh in its own child,
+        parsing presentation.xml and the slide's layout, master and theme again.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if self.memory is not None:
+            # Counted against the shared budget, sized by the XML it will parse
+            deck = self.memory.get(('deck',) + key)
+            if deck is None:
+                deck = SlideDeck(file_path)
+                self.memory.put(('deck',) + key, deck, deck.xml_size(), owner=self._document_id(file_path))
+            return deck
+        
+        with self._decks_lock:
+            deck = self._decks.get(key)
+            if deck is not None:
+                self._decks.move_to_end(key)
+                return deck
+        
+        deck = SlideDeck(file_path)
+        with self._decks_lock:
+            self._decks[key] = deck
+            # Evicted decks close their zip once the last render using them lets go
+            while len(self._decks) > self.MAX_OPEN_DECKS:
+                self._decks.popitem(last=False)
+        return deck
+    
+    def _layout_pptx_slide(self, deck: SlideDeck, page_number: int) -> Tuple[Tuple[int, int], List[tuple], List[tuple]]:
+        """Place a slide's shapes at their EMU positions; returns (size, text items, shape drawing ops)."""
+        slide_width, slide_height = deck.slide_size
+        scale = self.PPTX_WIDTH / slide_width
+        img_width, img_height = self.PPTX_WIDTH, max(1, round(slide_height * scale))
+        background, slide_shapes = deck.slide_shapes(page_number)
+        
+        items = []
+        shapes = [('shape', (0, 0, img_width, img_height), 'rect', background, None, 0)] if background else []
+        for shape in slide_shapes:
+            x, y, cx, cy = (round(v * scale) for v in shape.box)
+            box = (x, y, x + cx, y + cy)
+            outline_width = max(1, round(shape.outline_width * scale))
+            if shape.kind == 'picture':
+                shapes.append(('image', box, shape.image))
+            elif shape.kind == 'line':
+                shapes.append(('line', box, shape.outline or 'black', outline_width, shape.flip))
+            else:
+                if shape.fill or shape.outline:
+                    shapes.append(('shape', box, shape.geometry, shape.fill, shape.outline, outline_width))
+                items.extend(self._layout_shape_text(shape, box, scale))
         
-        return img
+        return (img_width, img_height), items, shapes
+    
+    def _layout_shape_text(self, shape, box: Tuple[int, int, int, int], scale: float) -> List[tuple]:
+        """Wrap a shape's paragraphs inside its insets and anchor them vertically."""
+        left, top, right, bottom = (box[0] + shape.insets[0] * scale, box[1] + shape.insets[1] * scale,
+                                    box[2] - shape.insets[2] * scale, box[3] - shape.insets[3] * scale)
+        max_width = max(1, int(right - left))
+        
+        lines = []  # (text, font, line height, colour, alignment)
+        for para in shape.paragraphs:
+            font_size = max(6, round(para.size * EMU_PER_POINT * scale))
+            font = self._font(font_size, para.bold)
+            for line in self._wrap_text(para.text, font, max_width) or ['']:
+                lines.append((line, font, font_size * 1.2, para.color, para.align))
+        
+        text_height = sum(line[2] for line in lines)
+        if shape.anchor == 'ctr':
+            y = top + (bottom - top - text_height) / 2
+        elif shape.anchor == 'b':
+            y = bottom - text_height
+        else:
+            y = top
+        
+        items = []
+        for text, font, line_height, fill, align in lines:
+            if text:
+                x = left
+                if align == 'ctr':
+                    x = left + (max_width - font.getlength(text)) / 2
+                elif align == 'r':
+                    x = right - font.getlength(text)
+                items.append((round(x), round(y), text, font, fill))
+            y += line_height
+        return items
     
     def _preview_excel_sheet(self, file_path: str, page_number: int) -> Image.Image:
         """Generate preview for an Excel sheet."""
-        wb = openpyxl.load_workbook(file_path)
-        
-        if page_number > len(wb.worksheets):
-            return self._create_error_image(f"Sheet {page_number} not found")
+        with metrics.span('open', format='.xlsx'):
+            sheet = self._read_excel_window(file_path, page_number)
+        if sheet is None:
+            raise PageNotFound(f"Sheet {page_number} not found")
         
-        ws = wb.worksheets[page_number - 1]
-        
-        # Create a white background image
-        img_width, img_height = 1000, 800
-        img = Image.new('RGB', (img_width, img_height), 'white')
-        draw = ImageDraw.Draw(img)
+        with metrics.span('layout', format='.xlsx'):
+            size, items, cells = self._layout_excel_sheet(*sheet)
         
+        return self._paint(size, items, rects=cells)
+    
+    def _read_excel_window(self, file_path: str, page_number: int) -> Optional[Tuple[str, list]]:
+        """Read the title and visible cell window of a sheet, or None if it does not exist."""
+        # Stream only the visible window instead of materialising the whole workbook
+        wb = openpyxl.load_workbook(file_path, read_only=True)
         try:
-            font_header = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 16)
-            font_cell = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-        except:
-            font_header = ImageFont.load_default()
-            font_cell = ImageFont.load_default()
+            if page_number > len(wb.worksheets):
+                return None
+            
+            ws = wb.worksheets[page_number - 1]
+            rows = list(ws.iter_rows(min_row=1, max_row=self.EXCEL_MAX_ROWS, max_col=self.EXCEL_MAX_COLS,
+                                     values_only=True))
+            return ws.title, rows
+        finally:
+            wb.close()
+    
+    def _layout_excel_sheet(self, sheet_title: str, rows: list) -> Tuple[Tuple[int, int], List[tuple], List[tuple]]:
+        """Position the grid and cell texts of a sheet; returns (size, text items, cell rectangles)."""
+        max_rows, max_cols = self.EXCEL_MAX_ROWS, self.EXCEL_MAX_COLS
+        img_width, img_height = 1000, 800
+        font_header, font_cell = self._load_fonts(16, 12)
         
-        # Draw sheet name
-        draw.text((20, 20), f"Excel Sheet: {ws.title}", fill='black', font=font_header)
+        # Sheet name
+        items = [(20, 20, f"Excel Sheet: {sheet_title}", font_header, 'black')]
+        cells = []
         
-        # Draw grid and content
+        # Grid and content
         start_x, start_y = 20, 60
         cell_width, cell_height = 150, 30
-        max_rows, max_cols = 20, 6
         
-        # Draw headers and grid
         for row in range(max_rows):
             for col in range(max_cols):
                 x = start_x + col * cell_width
                 y = start_y + row * cell_height
-                
-                # Draw cell border
-                draw.rectangle([x, y, x + cell_width, y + cell_height], outline='black', width=1)
+                cells.append((x, y, x + cell_width, y + cell_height))
                 
                 # Get cell value
-                excel_row = row + 1
-                excel_col = col + 1
-                cell = ws.cell(row=excel_row, column=excel_col)
-                cell_value = str(cell.value) if cell.value is not None else ""
+                row_values = rows[row] if row < len(rows) else ()
+                value = row_values[col] if col < len(row_values) else None
+                cell_value = str(value) if value is not None else ""
                 
                 # Truncate long text
                 if len(cell_value) > 15:
                     cell_value = cell_value[:12] + "..."
                 
-                # Draw cell content
-                text_x = x + 5
-                text_y = y + 8
-                current_font = font_header if row == 0 else font_cell
-                draw.text((text_x, text_y), cell_value, fill='black', font=current_font)
+                if cell_value:
+                    current_font = font_header if row == 0 else font_cell
+                    items.append((x + 5, y + 8, cell_value, current_font, 'black'))
         
+        return (img_width, img_height), items, cells
+    
+    def _load_fonts(self, heading_size: int, text_size: int) -> tuple:
+        """Load the (bold heading, regular text) fonts, falling back to PIL's default."""
+        try:
+            return _truetype(FONT_BOLD, heading_size), _truetype(FONT_REGULAR, text_size)
+        except OSError:
+            return ImageFont.load_default(), ImageFont.load_default()
+    
+    def _font(self, size: int, bold: bool = False):
+        """DejaVu at `size` pixels (cached), falling back to PIL's default."""
+        try:
+            return _truetype(FONT_BOLD if bold else FONT_REGULAR, size)
+        except OSError:
+            return ImageFont.load_default()
+    
+    def _paint(self, size: Tuple[int, int], items: List[tuple], rects: List[tuple] = (),
+               shapes: List[tuple] = (), load_image=None) -> Image.Image:
+        """Rasterise shapes, cell outlines and laid-out text items onto a white page.
+        
+        `load_image(ref, size)` supplies the picture of an ('image', box, ref) shape.
+        """
+        img = Image.new('RGB', size, 'white')
+        draw = ImageDraw.Draw(img)
+        for shape in shapes:
+            self._paint_shape(img, draw, shape, load_image)
+        for box in rects:
+            draw.rectangle(box, outline='black', width=1)
+        for x, y, text, font, fill in items:
+            draw.text((x, y), text, fill=fill, font=font)
         return img
     
+    def _paint_shape(self, img: Image.Image, draw, shape: tuple, load_image) -> None:
+        """Draw one ('image' | 'shape' | 'line', box, ...) op from _layout_pptx_slide."""
+        kind, (x0, y0, x1, y1) = shape[0], shape[1]
+        if kind == 'line':
+            _, _, fill, width, (flip_h, flip_v) = shape
+            if flip_h:
+                x0, x1 = x1, x0
+            if flip_v:
+                y0, y1 = y1, y0
+            draw.line((x0, y0, x1, y1), fill=fill, width=width)
+            return
+        
+        box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        if kind == 'image':
+            width, height = box[2] - box[0], box[3] - box[1]
+            if load_image is None or width <= 0 or height <= 0:
+                return
+            # Decoded (once) near this size; the final resize is from a small image
+            picture = load_image(shape[2], (width, height))
+            if picture is None:
+                return
+            picture = picture.resize((width, height), Image.BILINEAR)
+            img.paste(picture, box[:2], picture if picture.mode == 'RGBA' else None)
+        else:
+            _, _, geometry, fill, outline, width = shape
+            if geometry == 'ellipse':
+                draw.ellipse(box, fill=fill, outline=outline, width=width)
+            elif geometry == 'roundRect':
+                radius = min(box[2] - box[0], box[3] - box[1]) // 6
+                draw.rounded_rectangle(box, radius=radius, fill=fill, outline=outline, width=width)
+            else:
+                draw.rectangle(box, fill=fill, outline=outline, width=width)
+    
     def _wrap_text(self, text: str, font, max_width: int) -> List[str]:
         """Wrap text to fit within specified width."""
         words = text.split()
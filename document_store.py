@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from render_cache import CHUNK_SIZE
+
+
+class StoredDocument:
+    """A document held in the DocumentStore."""
+
+    def __init__(self, doc_key: str, path: str, filename: str, size: int, is_new: bool):
+        self.doc_key = doc_key
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.is_new = is_new
+
+
+class DocumentStore:
+    """Content-addressed store for uploaded documents.
+
+    Uploads are streamed to disk in chunks while their SHA-256 is computed, so
+    they are never held in memory. A document that is already known (same
+    content) is not stored twice, whatever it is called: its existing path and
+    key are returned, so renders cached under that key are reused immediately.
+    The stored file keeps the (lower-cased) extension of its first upload,
+    which the previewer dispatches on.
+    """
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+
+    def _document_path(self, doc_key: str, ext: str) -> str:
+        return os.path.join(self.store_dir, doc_key[:2], doc_key + ext)
+
+    def _meta_path(self, doc_key: str) -> str:
+        return os.path.join(self.store_dir, doc_key[:2], doc_key + '.json')
+
+    def _stored_path(self, doc_key: str) -> Optional[str]:
+        """Path of the stored copy of a document, under whichever extension it was first uploaded."""
+        shard_dir = os.path.join(self.store_dir, doc_key[:2])
+        try:
+            names = os.listdir(shard_dir)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            if stem == doc_key and ext not in ('.json', '.tmp'):
+                return os.path.join(shard_dir, name)
+        return None
+
+    def ingest(self, source: Union[str, BinaryIO], filename: Optional[str] = None) -> StoredDocument:
+        """Stream a file (path or binary file object) into the store."""
+        if isinstance(source, str):
+            filename = filename or os.path.basename(source)
+            with open(source, 'rb') as f:
+                return self._ingest_stream(f, filename)
+        return self._ingest_stream(source, filename or 'upload')
+
+    def _ingest_stream(self, stream: BinaryIO, filename: str) -> StoredDocument:
+        ext = os.path.splitext(filename)[1].lower()
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+
+            doc_key = digest.hexdigest()
+            with self._lock:
+                # Deduplicated by content alone: a renamed copy maps to the stored one
+                path = self._stored_path(doc_key)
+                is_new = path is None
+                if is_new:
+                    path = self._document_path(doc_key, ext)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                self._record_upload(doc_key, filename, size)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        return StoredDocument(doc_key, path, filename, size, is_new)
+
+    def _record_upload(self, doc_key: str, filename: str, size: int):
+        meta = self.get(doc_key) or {'doc_key': doc_key, 'size': size, 'names': [], 'uploads': 0,
+                                     'first_seen': round(time.time(), 3)}
+        if filename not in meta['names']:
+            meta['names'].append(filename)
+        meta['uploads'] += 1
+        meta['last_seen'] = round(time.time(), 3)
+        tmp_path = self._meta_path(doc_key) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(doc_key))
+
+    def get(self, doc_key: str) -> Optional[Dict]:
+        """Load the upload metadata of a stored document."""
+        try:
+            with open(self._meta_path(doc_key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def list(self) -> List[Dict]:
+        """Metadata of every stored document, most recently uploaded first."""
+        documents = []
+        for shard in sorted(os.listdir(self.store_dir)):
+            shard_dir = os.path.join(self.store_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith('.json'):
+                    meta = self.get(name[:-len('.json')])
+                    if meta:
+                        documents.append(meta)
+        documents.sort(key=lambda meta: meta.get('last_seen', 0), reverse=True)
+        return documents
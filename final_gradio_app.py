@@ -1,15 +1,25 @@
 import gradio as gr
 import os
+import hashlib
+from assets import build as build_assets
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VIEWER_PATH = os.path.join(BASE_DIR, 'demo_viewer.html')
+
+# The viewer page and the scripts it loads from static/ are served as files, so
+# each session's config carries a small frame instead of the whole page
+gr.set_static_paths(paths=[VIEWER_PATH, os.path.join(BASE_DIR, 'static')])
+
+def viewer_frame():
+    """An iframe loading the viewer; the version query changes whenever the page does."""
+    with open(VIEWER_PATH, 'rb') as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:10]
+    return (f'<iframe src="/gradio_api/file={VIEWER_PATH}?v={version}" title="JavaScript Document Viewer" '
+            f'style="width: 100%; height: 900px; border: 0;"></iframe>')
 
 def create_document_viewer_interface():
     """Create the main Gradio interface with embedded JavaScript document viewer."""
     
-    # Read the demo viewer HTML content
-    demo_viewer_path = os.path.join(os.path.dirname(__file__), 'demo_viewer.html')
-    
-    with open(demo_viewer_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    
     # Create the Gradio interface
     with gr.Blocks(
         title="📄 JavaScript Document Previewer",
@@ -36,9 +46,9 @@ def create_document_viewer_interface():
         - Work entirely client-side without server processing
         """)
         
-        # Embed the JavaScript document viewer
+        # Embed the JavaScript document viewer by reference
         viewer_component = gr.HTML(
-            value=html_content,
+            value=viewer_frame(),
             label="JavaScript Document Viewer",
             elem_classes=["main-content"]
         )
@@ -114,6 +124,9 @@ def create_document_viewer_interface():
 def main():
     """Main function to launch the Gradio application."""
     
+    # Build the viewer's vendored libraries (static/dist/manifest.js); any not vendored load from their CDN
+    build_assets()
+    
     # Create and launch the interface
     interface = create_document_viewer_interface()
     
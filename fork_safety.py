@@ -0,0 +1,32 @@
+"""Fresh locks for forked render children.
+
+Limited renders (see render_limits) fork a child from a multithreaded
+server. A lock some other thread held at that instant is copied into the
+child still held, and nothing in the child will ever release it: a render
+that reached it would hang until the render timeout and count as a
+quarantine strike. Objects whose locks a render can reach register here and
+get new, unlocked locks in every forked child.
+"""
+
+import os
+import threading
+import weakref
+from typing import Tuple
+
+# object -> names of its lock attributes; weak, so registering never keeps an object alive
+_registered: 'weakref.WeakKeyDictionary[object, Tuple[str, ...]]' = weakref.WeakKeyDictionary()
+
+
+def renew_locks_after_fork(obj, *attrs: str) -> None:
+    """Replace `obj`'s lock attributes (default `_lock`) with fresh locks in forked children."""
+    _registered[obj] = attrs or ('_lock',)
+
+
+def _renew_locks() -> None:
+    for obj, attrs in list(_registered.items()):
+        for attr in attrs:
+            setattr(obj, attr, threading.Lock())
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_renew_locks)
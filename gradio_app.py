@@ -1,8 +1,20 @@
 import gradio as gr
 import os
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, send_file, request, jsonify, abort, redirect
+from werkzeug.utils import safe_join
 import threading
 import time
+import io
+import hashlib
+from functools import lru_cache
+from document_previewer import DocumentPreviewer, PageNotFound
+from metrics import registry as metrics
+from render_cache import RenderCache
+from render_limits import RenderLimits, RenderLimitExceeded
+from render_mode import ClientHints, RenderModePolicy, SERVER, CLIENT
+from render_scheduler import RenderScheduler, Priority, SchedulerRejected
+from sheet_windows import SheetWindows, MAX_WINDOW_ROWS
+from assets import AssetManifest, IMMUTABLE_CACHE_CONTROL, HASH_LENGTH, build as build_assets
 
 # Flask app for serving documents
 flask_app = Flask(__name__)
@@ -12,7 +24,185 @@ DOC_DIR = os.path.join(os.path.dirname(__file__), 'sample_docs')
 
 @flask_app.route('/docs/<filename>')
 def serve_doc(filename):
-    return send_from_directory(DOC_DIR, filename)
+    response = send_from_directory(DOC_DIR, filename)
+    if response.status_code == 200 and response.content_length:
+        metrics.inc(metrics.delivered_bytes, response.content_length, mode=CLIENT,
+                    format=os.path.splitext(filename.lower())[1])
+    return response
+
+render_cache = RenderCache(os.environ.get('DOCPREVIEW_CACHE_DIR', '.render_cache'))
+# Every parse of a document in this process runs in a limited child, so no request
+# thread holds parser (lxml) state when another forks; see DocumentPreviewer.run_limited
+render_limits = RenderLimits.from_env()
+
+# Cell windows of the sample workbooks, so the viewer never downloads a whole .xlsx
+sheet_windows = SheetWindows(render_cache, limits=render_limits)
+
+# Page images for clients that are better served by server-side rendering
+previewer = DocumentPreviewer(cache=render_cache, limits=render_limits)
+scheduler = RenderScheduler(workers=int(os.environ.get('DOCPREVIEW_RENDER_WORKERS', 4)))
+render_mode = RenderModePolicy.from_env()
+
+def uncacheable_error(status, message):
+    """An error response no browser or proxy keeps: the cause may be gone on the next request."""
+    response = flask_app.response_class(message, status=status, mimetype='text/plain')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@flask_app.errorhandler(RenderLimitExceeded)
+def render_limit_exceeded(error):
+    # Temporary (timeout, busy machine) or until the quarantine is lifted
+    return uncacheable_error(503, str(error))
+
+def document_path(filename):
+    path = safe_join(DOC_DIR, filename)
+    if path is None or not previewer.is_supported(filename) or not os.path.isfile(path):
+        abort(404)
+    return path
+
+def document_info(path):
+    """Page count and page sizes (runs of [count, width, height, rotation] in points), read without rendering."""
+    sizes = previewer.get_page_sizes(path)
+    return {
+        'format': os.path.splitext(path.lower())[1],
+        'pages': len(sizes) if sizes else previewer.get_page_count(path),
+        'page_sizes': sizes.to_runs() if sizes else None,
+    }
+
+@flask_app.route('/info/<filename>')
+def serve_document_info(filename):
+    return jsonify(document_info(document_path(filename)))
+
+@flask_app.route('/render-mode/<filename>')
+def choose_render_mode(filename):
+    """Whether the viewer should render the document itself or show server-rendered pages,
+    with the document's info so it can lay pages out before any is rendered."""
+    path = document_path(filename)
+    mode, reason = render_mode.decide(path, ClientHints.from_request(request.headers, request.args),
+                                      queue_depth=sum(scheduler.queue_depths().values()))
+    decision = dict(document_info(path), mode=mode, reason=reason)
+    if mode == SERVER:
+        decision['pages_url'] = f"/pages/{filename}"
+    response = jsonify(decision)
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['Accept-CH'] = RenderModePolicy.ACCEPT_CH
+    return response
+
+@flask_app.route('/pages/<filename>/<int:page>')
+def page_image(filename, page):
+    path = document_path(filename)
+    if not 1 <= page <= previewer.get_page_count(path):
+        abort(404)
+    try:
+        # Someone is waiting on this page, ahead of any background work; per-user caps go by
+        # client address. render_page raises on failure, so an error is never cached as the page.
+        image = scheduler.submit(previewer.render_page, path, page, priority=Priority.VISIBLE,
+                                 user=request.remote_addr).result()
+    except PageNotFound:
+        abort(404)
+    except SchedulerRejected:
+        return uncacheable_error(503, 'render request rejected under load')
+    except RenderLimitExceeded as e:
+        return uncacheable_error(503, str(e))
+    except Exception as e:
+        metrics.log_event('render_error', file=path, page=page, error=str(e))
+        return uncacheable_error(500, f"could not render page {page}")
+    if image is None:
+        abort(404)
+
+    buffer = io.BytesIO()
+    webp = 'image/webp' in request.headers.get('Accept', '')
+    if webp:
+        image.save(buffer, 'WEBP', quality=80)
+    else:
+        image.save(buffer, 'PNG')
+    data = buffer.getvalue()
+    metrics.inc(metrics.delivered_bytes, len(data), mode=SERVER, format=os.path.splitext(filename.lower())[1])
+    response = flask_app.response_class(data, mimetype='image/webp' if webp else 'image/png')
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    response.headers['Vary'] = 'Accept'
+    return response
+
+@flask_app.route('/client-metrics', methods=['POST'])
+def client_metrics():
+    """Display times reported by the viewer: { mode, format, event, seconds }."""
+    report = request.get_json(force=True, silent=True) or {}
+    seconds = report.get('seconds')
+    if (report.get('mode') in (SERVER, CLIENT) and report.get('event') in ('first_page', 'page')
+            and isinstance(seconds, (int, float)) and 0 <= seconds < 600
+            and previewer.is_supported(f".{report.get('format')}")):
+        metrics.observe(metrics.client_display_seconds, seconds, mode=report['mode'],
+                        format=f".{report['format']}", event=report['event'])
+    return '', 204
+
+@flask_app.route('/metrics')
+def serve_metrics():
+    if not metrics.enabled:
+        abort(404)
+    return flask_app.response_class(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def workbook_path(filename):
+    path = safe_join(DOC_DIR, filename)
+    if path is None or not filename.lower().endswith('.xlsx') or not os.path.isfile(path):
+        abort(404)
+    return path
+
+@flask_app.route('/sheets/<filename>')
+def list_sheets(filename):
+    return jsonify(sheets=sheet_windows.sheet_names(workbook_path(filename)))
+
+@flask_app.route('/sheets/<filename>/<int:sheet>')
+def sheet_info(filename, sheet):
+    path = workbook_path(filename)
+    try:
+        return jsonify(sheet_windows.sheet_info(path, sheet))
+    except IndexError:
+        abort(404)
+
+@flask_app.route('/sheets/<filename>/<int:sheet>/cells')
+def sheet_cells(filename, sheet):
+    """Cells of a window: ?r0=&r1= rows and ?c0=&c1= columns, 0-based, end exclusive."""
+    path = workbook_path(filename)
+    row_start = request.args.get('r0', 0, type=int)
+    col_start = request.args.get('c0', 0, type=int)
+    try:
+        return jsonify(sheet_windows.window(
+            path, sheet, row_start, request.args.get('r1', row_start + MAX_WINDOW_ROWS, type=int),
+            col_start, request.args.get('c1', col_start + 50, type=int)
+        ))
+    except IndexError:
+        abort(404)
+
+# Viewer scripts and libraries, content-hashed and pre-compressed by `python assets.py build`.
+# The viewer page is served from this app too, so root-relative URLs reach them.
+# Startup builds what is already vendored (`python assets.py fetch` is a separate step).
+build_assets()
+assets = AssetManifest(base_url='/assets', static_url='/static')
+
+@flask_app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    found = assets.variant(filename, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        abort(404)
+    path, encoding = found
+    response = send_file(path, mimetype=assets.mimetype(filename), conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+@flask_app.route('/viewer/<digest>.html')
+def serve_viewer(digest):
+    page, current = viewer_page()
+    if digest != current:
+        # A page loaded before a restart; the template may have changed since
+        return redirect(viewer_url())
+    response = flask_app.response_class(page, mimetype='text/html')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    # Ask for device and network hints on the viewer's later requests (see render_mode.py)
+    response.headers['Accept-CH'] = RenderModePolicy.ACCEPT_CH
+    return response
 
 def start_flask():
     flask_app.run(host='0.0.0.0', port=5001, debug=False)
@@ -43,17 +233,15 @@ def create_document_viewer():
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>Document Previewer</title>
         
-        <!-- PDF.js -->
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.min.js"></script>
-        
-        <!-- Mammoth.js for DOCX -->
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/mammoth/1.6.0/mammoth.browser.min.js"></script>
-        
-        <!-- SheetJS for Excel -->
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.18.5/xlsx.full.min.js"></script>
-        
-        <!-- JSZip for PPTX -->
-        <script src="https://cdnjs.cloudflare.com/ajax/libs/jszip/3.10.1/jszip.min.js"></script>
+        <!-- Each format's libraries are loaded when a document of that format is opened,
+             from the hashed, pre-compressed copies `python assets.py build` writes -->
+        <script>
+            window.ASSET_MANIFEST = {assets.to_json()};
+            window.ASSET_CDN = {assets.cdn_json()};
+            window.ASSET_BASE = '{assets.base_url}';
+            window.ASSET_STATIC = '{assets.static_url}';
+        </script>
+        <script src="{assets.url('asset_loader.js')}"></script>
         
         <style>
             body {{
@@ -121,6 +309,14 @@ def create_document_viewer():
                 box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
             }}
             
+            .server-page {{
+                max-width: 100%;
+                height: auto;
+                display: block;
+                margin: 0 auto;
+                box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
+            }}
+            
             .docx-content {{
                 max-width: 100%;
                 font-family: 'Times New Roman', serif;
@@ -145,17 +341,6 @@ def create_document_viewer():
                 font-weight: bold;
             }}
             
-            .pptx-slide {{
-                background: white;
-                border: 1px solid #dee2e6;
-                border-radius: 8px;
-                padding: 20px;
-                margin: 10px auto;
-                max-width: 800px;
-                min-height: 400px;
-                box-shadow: 0 2px 4px rgba(0, 0, 0, 0.1);
-            }}
-            
             .loading {{
                 text-align: center;
                 padding: 50px;
@@ -237,6 +422,10 @@ def create_document_viewer():
                 <button id="goBtn" class="btn btn-primary" disabled>Go</button>
             </div>
             
+            <div style="margin-bottom: 10px;">
+                <label><input type="checkbox" id="scrollModeToggle" disabled> Continuous scroll (PDF)</label>
+            </div>
+            
             <div id="pageLinks" class="page-links" style="display: none;">
                 <!-- Page links will be generated here -->
             </div>
@@ -262,16 +451,20 @@ def create_document_viewer():
                     this.totalPages = 0;
                     this.documentType = null;
                     this.pdfDoc = null;
+                    this.scrollView = null;
                     this.excelWorkbook = null;
-                    this.pptxSlides = [];
+                    this.excelGrid = null;
+                    this.excelSheetsUrl = null;
+                    this.docxDocument = null;
+                    this.pptxDeck = null;
+                    // 'server' while showing server-rendered page images, else the format rendering in-page
+                    this.renderer = null;
+                    this.serverDocument = null;
+                    this.serverRenderToken = 0;
+                    // [{{ width, height }}] in points from the server's page table, when it has the document
+                    this.pageSizes = null;
                     
                     this.initializeEventListeners();
-                    this.setupPDFJS();
-                }}
-                
-                setupPDFJS() {{
-                    // Set PDF.js worker
-                    pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.worker.min.js';
                 }}
                 
                 initializeEventListeners() {{
@@ -289,6 +482,11 @@ def create_document_viewer():
                         }}
                     }});
                     
+                    // Continuous scroll (PDF only)
+                    document.getElementById('scrollModeToggle').addEventListener('change', (e) => {{
+                        this.setScrollMode(e.target.checked);
+                    }});
+                    
                     // Navigation buttons
                     document.getElementById('prevBtn').addEventListener('click', () => {{
                         this.navigateToPage(this.currentPage - 1);
@@ -330,7 +528,11 @@ def create_document_viewer():
                         const fileName = docFiles[docName];
                         const url = `http://localhost:5001/docs/${{fileName}}`;
                         
-                        await this.loadDocumentFromURL(url, docName);
+                        const started = performance.now();
+                        // The server decides whether this device renders the file or is sent page images
+                        const plan = await this.chooseRenderMode(fileName);
+                        await this.loadDocumentFromURL(url, docName, plan);
+                        this.reportTiming('first_page', started);
                         
                     }} catch (error) {{
                         this.showError('Failed to load document: ' + error.message);
@@ -351,14 +553,53 @@ def create_document_viewer():
                     }}
                 }}
                 
-                async loadDocumentFromURL(url, fileName) {{
+                async loadDocumentFromURL(url, fileName, plan = {{ mode: 'client' }}) {{
                     const fileExtension = fileName.split('.').pop().toLowerCase();
+                    const renderer = plan.mode === 'server' ? 'server' : fileExtension;
                     
                     this.currentDocument = url;
                     this.documentType = fileExtension;
+                    this.renderer = renderer;
+                    this.serverDocument = renderer === 'server' ? plan : null;
+                    this.pageSizes = plan.page_sizes ? this.expandPageSizes(plan.page_sizes) : null;
+                    // Drop the previous document's cached pages and stop any render still in flight
+                    if (this.docxDocument) {{
+                        this.docxDocument.destroy();
+                        this.docxDocument = null;
+                    }}
+                    if (this.pptxDeck) {{
+                        // Also revokes the object URLs of its media
+                        this.pptxDeck.destroy();
+                        this.pptxDeck = null;
+                    }}
+                    if (this.scrollView) {{
+                        this.scrollView.destroy();
+                        this.scrollView = null;
+                    }}
+                    if (this.pdfView) {{
+                        this.pdfView.destroy();
+                        this.pdfView = null;
+                    }}
+                    if (this.excelGrid) {{
+                        this.excelGrid.destroy();
+                        this.excelGrid = null;
+                    }}
+                    if (this.excelWorkbook) {{
+                        // Also stops the worker holding the parsed workbook
+                        this.excelWorkbook.close();
+                        this.excelWorkbook = null;
+                    }}
+                    this.excelSheetsUrl = null;
                     this.currentPage = 1;
                     
-                    switch (fileExtension) {{
+                    // Only the first document of each format downloads its libraries; page images need none
+                    await AssetLoader.loadFormat(renderer);
+                    
+                    switch (renderer) {{
+                        case 'server':
+                            this.totalPages = plan.pages;
+                            await this.renderServerPage(1);
+                            break;
                         case 'pdf':
                             await this.loadPDF(url);
                             break;
@@ -382,11 +623,93 @@ def create_document_viewer():
                     this.showStatus('Document loaded successfully!');
                 }}
                 
+                // Server-rendered pages are plain images; the next one is fetched ahead into the HTTP cache
+                async renderServerPage(pageNum) {{
+                    const token = ++this.serverRenderToken;
+                    const image = new Image();
+                    image.className = 'server-page';
+                    image.alt = `${{this.getPageTypeName()}} ${{pageNum}}`;
+                    image.src = `${{this.serverDocument.pages_url}}/${{pageNum}}`;
+                    try {{
+                        await image.decode();
+                    }} catch (error) {{
+                        throw new Error(`Failed to load ${{image.alt}}`);
+                    }}
+                    if (token !== this.serverRenderToken || this.renderer !== 'server') {{
+                        return;
+                    }}
+                    document.getElementById('viewerContainer').replaceChildren(image);
+                    this.currentPage = pageNum;
+                    if (pageNum < this.totalPages) {{
+                        new Image().src = `${{this.serverDocument.pages_url}}/${{pageNum + 1}}`;
+                    }}
+                }}
+                
+                // Runs of identical pages, [count, width, height, rotation], into one entry per page
+                expandPageSizes(runs) {{
+                    const sizes = [];
+                    for (const [count, width, height] of runs) {{
+                        const size = {{ width, height }};
+                        for (let i = 0; i < count; i++) {{
+                            sizes.push(size);
+                        }}
+                    }}
+                    return sizes;
+                }}
+                
+                async chooseRenderMode(fileName) {{
+                    // Browsers without client hint headers (Firefox, Safari) report what they can here
+                    const connection = navigator.connection || {{}};
+                    const hints = new URLSearchParams();
+                    if (navigator.deviceMemory) {{
+                        hints.set('memory', navigator.deviceMemory);
+                    }}
+                    if (connection.downlink) {{
+                        hints.set('downlink', connection.downlink);
+                    }}
+                    if (connection.effectiveType) {{
+                        hints.set('ect', connection.effectiveType);
+                    }}
+                    if (connection.saveData) {{
+                        hints.set('save_data', '1');
+                    }}
+                    if (navigator.userAgentData && navigator.userAgentData.mobile) {{
+                        hints.set('mobile', '1');
+                    }}
+                    try {{
+                        const response = await fetch(`/render-mode/${{encodeURIComponent(fileName)}}?${{hints}}`);
+                        if (response.ok) {{
+                            return await response.json();
+                        }}
+                    }} catch (error) {{
+                        console.warn('Render mode unavailable, rendering in the browser:', error);
+                    }}
+                    return {{ mode: 'client' }};
+                }}
+                
+                // Display times per rendering mode, for comparing the two paths (docpreview_client_display_seconds)
+                reportTiming(event, started) {{
+                    const report = {{
+                        mode: this.renderer === 'server' ? 'server' : 'client',
+                        format: this.documentType,
+                        event,
+                        seconds: (performance.now() - started) / 1000
+                    }};
+                    if (navigator.sendBeacon) {{
+                        navigator.sendBeacon('/client-metrics', JSON.stringify(report));
+                    }}
+                }}
+                
                 async loadPDF(url) {{
                     try {{
-                        this.pdfDoc = await pdfjsLib.getDocument(url).promise;
+                        this.pdfDoc = await pdfjsLib.getDocument({{ url, worker: PdfPageView.worker() }}).promise;
                         this.totalPages = this.pdfDoc.numPages;
-                        await this.renderPDFPage(1);
+                        this.pdfView = new PdfPageView(this.pdfDoc, document.getElementById('viewerContainer'));
+                        if (document.getElementById('scrollModeToggle').checked) {{
+                            await this.setScrollMode(true);
+                        }} else {{
+                            await this.renderPDFPage(1);
+                        }}
                     }} catch (error) {{
                         throw new Error('Failed to load PDF: ' + error.message);
                     }}
@@ -394,46 +717,67 @@ def create_document_viewer():
                 
                 async renderPDFPage(pageNum) {{
                     try {{
-                        const page = await this.pdfDoc.getPage(pageNum);
-                        const scale = 1.5;
-                        const viewport = page.getViewport({{ scale }});
-                        
-                        // Create canvas
-                        const canvas = document.createElement('canvas');
-                        const context = canvas.getContext('2d');
-                        canvas.height = viewport.height;
-                        canvas.width = viewport.width;
-                        canvas.className = 'pdf-canvas';
-                        
-                        // Render page
-                        await page.render({{
-                            canvasContext: context,
-                            viewport: viewport
-                        }}).promise;
-                        
-                        // Update viewer
-                        const container = document.getElementById('viewerContainer');
-                        container.innerHTML = '';
-                        container.appendChild(canvas);
-                        
-                        this.currentPage = pageNum;
-                        
+                        if (this.scrollView) {{
+                            this.scrollView.scrollToPage(pageNum);
+                            this.currentPage = pageNum;
+                            return;
+                        }}
+                        // Cached pages show immediately; a render still running for another page is cancelled
+                        if (await this.pdfView.show(pageNum)) {{
+                            this.currentPage = pageNum;
+                        }}
                     }} catch (error) {{
                         throw new Error('Failed to render PDF page: ' + error.message);
                     }}
                 }}
                 
+                // Continuous scroll lays out every page up front and only renders those near the viewport
+                async setScrollMode(enabled) {{
+                    if (!this.pdfView || enabled === !!this.scrollView) {{
+                        return;
+                    }}
+                    try {{
+                        if (enabled) {{
+                            this.pdfView.cancel();
+                            this.scrollView = new PdfScrollView(this.pdfDoc, document.getElementById('viewerContainer'), {{
+                                // Known sizes lay out every page without asking PDF.js for any
+                                pageSizes: this.pageSizes,
+                                onPageChange: (pageNum) => {{
+                                    this.currentPage = pageNum;
+                                    this.updateNavigationControls();
+                                    this.updatePageLinks();
+                                }}
+                            }});
+                            await this.scrollView.init(this.currentPage);
+                        }} else {{
+                            this.scrollView.destroy();
+                            this.scrollView = null;
+                            await this.renderPDFPage(this.currentPage);
+                        }}
+                    }} catch (error) {{
+                        this.showError('Failed to switch view: ' + error.message);
+                    }}
+                }}
+                
                 async loadDOCX(url) {{
                     try {{
                         const response = await fetch(url);
                         const arrayBuffer = await response.arrayBuffer();
                         
-                        const result = await mammoth.convertToHtml({{ arrayBuffer }});
-                        
-                        const container = document.getElementById('viewerContainer');
-                        container.innerHTML = `<div class="docx-content">${{result.value}}</div>`;
-                        
-                        this.totalPages = 1;
+                        // Converted in a worker and paginated in the background; only the visible page is in the DOM
+                        this.docxDocument = new DocxDocument(document.getElementById('viewerContainer'), {{
+                            // The document's own page proportions rather than A4
+                            pageRatio: this.pageSizes ? this.pageSizes[0].height / this.pageSizes[0].width : undefined,
+                            onProgress: (pages, done) => {{
+                                this.totalPages = pages;
+                                this.updateNavigationControls();
+                                if (done) {{
+                                    this.generatePageLinks();
+                                }}
+                            }}
+                        }});
+                        this.totalPages = await this.docxDocument.open(arrayBuffer);
+                        this.docxDocument.show(1);
                         this.currentPage = 1;
                         
                     }} catch (error) {{
@@ -446,38 +790,27 @@ def create_document_viewer():
                         const response = await fetch(url);
                         const arrayBuffer = await response.arrayBuffer();
                         
-                        const zip = await JSZip.loadAsync(arrayBuffer);
-                        
-                        const slideFiles = Object.keys(zip.files).filter(name => 
-                            name.startsWith('ppt/slides/slide') && name.endsWith('.xml')
-                        );
-                        
-                        this.totalPages = slideFiles.length || 5; // Default to 5 for demo
-                        this.pptxSlides = slideFiles;
+                        // Only presentation.xml is read here; each slide is parsed when it is shown
+                        this.pptxDeck = await PptxDeck.open(arrayBuffer);
+                        this.totalPages = this.pptxDeck.slideCount;
+                        if (!this.totalPages) {{
+                            throw new Error('the presentation has no slides');
+                        }}
                         
                         await this.renderPPTXSlide(1);
                         
                     }} catch (error) {{
-                        // Fallback for demo
-                        this.totalPages = 5;
-                        await this.renderPPTXSlide(1);
+                        throw new Error('Failed to load PPTX: ' + error.message);
                     }}
                 }}
                 
                 async renderPPTXSlide(slideNum) {{
                     try {{
                         const container = document.getElementById('viewerContainer');
-                        container.innerHTML = `
-                            <div class="pptx-slide">
-                                <h3>Slide ${{slideNum}}</h3>
-                                <p>This is a JavaScript-based PPTX viewer. Slide ${{slideNum}} of ${{this.totalPages}}.</p>
-                                <p style="color: #666;">✅ No server-side image conversion required!</p>
-                                <p style="color: #666;">✅ Direct JavaScript parsing and rendering</p>
-                                <p style="color: #666;">✅ Clickable navigation between slides</p>
-                            </div>
-                        `;
-                        
-                        this.currentPage = slideNum;
+                        // Null when a later navigation overtook this slide
+                        if (await this.pptxDeck.renderSlide(slideNum, container)) {{
+                            this.currentPage = slideNum;
+                        }}
                         
                     }} catch (error) {{
                         throw new Error('Failed to render PPTX slide: ' + error.message);
@@ -486,34 +819,49 @@ def create_document_viewer():
                 
                 async loadExcel(url) {{
                     try {{
-                        const response = await fetch(url);
-                        const arrayBuffer = await response.arrayBuffer();
+                        // Workbooks on the document server are read window by window, never downloaded whole
+                        const sheetsUrl = url.includes('/docs/') ? url.replace('/docs/', '/sheets/') : null;
+                        if (sheetsUrl) {{
+                            try {{
+                                this.totalPages = (await SheetWindowSource.sheetNames(sheetsUrl)).length;
+                                this.excelSheetsUrl = sheetsUrl;
+                            }} catch (error) {{
+                                console.warn('Sheet window API unavailable, downloading the workbook:', error);
+                            }}
+                        }}
                         
-                        this.excelWorkbook = XLSX.read(arrayBuffer, {{ type: 'array' }});
-                        this.totalPages = this.excelWorkbook.SheetNames.length;
+                        if (!this.excelSheetsUrl) {{
+                            const response = await fetch(url);
+                            const arrayBuffer = await response.arrayBuffer();
+                            
+                            // Parsed in a worker; only the cells on screen ever reach the page
+                            this.excelWorkbook = new XlsxWorkbook();
+                            this.totalPages = (await this.excelWorkbook.open(arrayBuffer)).length;
+                        }}
                         
-                        this.renderExcelSheet(1);
+                        await this.renderExcelSheet(1);
                         
                     }} catch (error) {{
                         throw new Error('Failed to load Excel: ' + error.message);
                     }}
                 }}
                 
-                renderExcelSheet(sheetNum) {{
+                async renderExcelSheet(sheetNum) {{
                     try {{
-                        const sheetName = this.excelWorkbook.SheetNames[sheetNum - 1];
-                        const worksheet = this.excelWorkbook.Sheets[sheetName];
-                        
-                        const htmlTable = XLSX.utils.sheet_to_html(worksheet, {{
-                            table: true,
-                            tableClass: 'excel-table'
-                        }});
+                        const sheet = this.excelSheetsUrl
+                            ? await SheetWindowSource.open(this.excelSheetsUrl, sheetNum)
+                            : await this.excelWorkbook.sheet(sheetNum);
+                        const sheetName = sheet.name;
                         
+                        if (this.excelGrid) {{
+                            this.excelGrid.destroy();
+                        }}
                         const container = document.getElementById('viewerContainer');
                         container.innerHTML = `
                             <h5>Sheet: ${{sheetName}}</h5>
-                            ${{htmlTable}}
+                            <div class="excel-grid-host"></div>
                         `;
+                        this.excelGrid = new ExcelGrid(container.querySelector('.excel-grid-host'), sheet);
                         
                         this.currentPage = sheetNum;
                         
@@ -528,20 +876,27 @@ def create_document_viewer():
                     }}
                     
                     try {{
-                        switch (this.documentType) {{
+                        const started = performance.now();
+                        switch (this.renderer) {{
+                            case 'server':
+                                await this.renderServerPage(pageNum);
+                                break;
                             case 'pdf':
                                 await this.renderPDFPage(pageNum);
                                 break;
                             case 'docx':
-                                this.currentPage = 1;
+                                if (this.docxDocument.show(pageNum)) {{
+                                    this.currentPage = pageNum;
+                                }}
                                 break;
                             case 'pptx':
                                 await this.renderPPTXSlide(pageNum);
                                 break;
                             case 'xlsx':
-                                this.renderExcelSheet(pageNum);
+                                await this.renderExcelSheet(pageNum);
                                 break;
                         }}
+                        this.reportTiming('page', started);
                         
                         this.updateNavigationControls();
                         this.updatePageLinks();
@@ -587,6 +942,7 @@ def create_document_viewer():
                     nextBtn.disabled = !hasDocument || this.currentPage >= this.totalPages;
                     pageInput.disabled = !hasDocument;
                     goBtn.disabled = !hasDocument;
+                    document.getElementById('scrollModeToggle').disabled = !this.pdfView;
                     
                     if (hasDocument) {{
                         pageInput.max = this.totalPages;
@@ -674,6 +1030,15 @@ def create_document_viewer():
     
     return html_content
 
+@lru_cache(maxsize=1)
+def viewer_page():
+    """The viewer HTML, rendered once per process, and its content hash."""
+    page = create_document_viewer().encode('utf-8')
+    return page, hashlib.sha256(page).hexdigest()[:HASH_LENGTH]
+
+def viewer_url():
+    return f"http://localhost:5001/viewer/{viewer_page()[1]}.html"
+
 def create_gradio_interface():
     """Create the main Gradio interface."""
     
@@ -690,9 +1055,11 @@ def create_gradio_interface():
         - **SheetJS** for Excel files
         """)
         
-        # Embed the document viewer
+        # Embed the document viewer by reference: sessions receive this small frame,
+        # and browsers cache the page itself under its content-hashed URL
         viewer_html = gr.HTML(
-            value=create_document_viewer(),
+            value=f'<iframe src="{viewer_url()}" title="Document Viewer" '
+                  f'style="width: 100%; height: 900px; border: 0;"></iframe>',
             label="Document Viewer"
         )
         
@@ -0,0 +1,113 @@
+"""Embedded pictures of DOCX and PPTX documents, decoded once at display size.
+
+Photos embedded in documents are often 20 MP camera images, while a page
+render draws them a few hundred pixels wide. Each part is decoded straight to
+about the size it is drawn at: JPEG uses PIL's draft mode, which lets libjpeg
+scale by 1/2, 1/4 or 1/8 while decoding, and other formats are shrunk with
+`reduce` before the final resample. Decoded versions are kept per content
+hash and size bucket, in memory and (given a render cache) on disk, so a logo
+repeated on every slide, or the same photo in two documents, is decoded once
+and forked render children share what earlier renders decoded.
+"""
+
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from fork_safety import renew_locks_after_fork
+from metrics import registry as metrics
+from render_cache import RenderCache
+
+MIN_BUCKET = 64
+MAX_BUCKET = 4096
+# Decoded pixels kept in memory
+MAX_MEMORY_BYTES = 64 * 1024 * 1024
+
+
+def size_bucket(size: Tuple[int, int]) -> int:
+    """Longest side of `size` rounded up to a power of two, so nearby sizes share a decode."""
+    longest = max(size)
+    bucket = MIN_BUCKET
+    while bucket < longest and bucket < MAX_BUCKET:
+        bucket *= 2
+    return bucket
+
+
+def decode_scaled(data: bytes, bucket: int) -> Image.Image:
+    """Decode an image with its longest side at most `bucket` pixels, as RGB or RGBA."""
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        scale = bucket / max(width, height)
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        if scale < 1:
+            # JPEG only: pick the largest DCT scaling that stays >= target
+            img.draft(None, target)
+        img.load()
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        picture = img.convert('RGBA' if has_alpha else 'RGB')
+
+    if scale < 1:
+        factor = min(picture.width // target[0], picture.height // target[1])
+        if factor >= 2:
+            picture = picture.reduce(factor)
+        if picture.size != target:
+            picture = picture.resize(target, Image.LANCZOS)
+    return picture
+
+
+class ImageParts:
+    """Cache of embedded images decoded at (roughly) the size they are drawn."""
+
+    def __init__(self, cache: Optional[RenderCache] = None, max_bytes: int = MAX_MEMORY_BYTES):
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+        self._images: 'OrderedDict[tuple, Image.Image]' = OrderedDict()
+        self._bytes = 0
+
+    def get(self, data: bytes, size: Tuple[int, int]) -> Optional[Image.Image]:
+        """The image in `data`, decoded to at least `size` (unless it is smaller), or None if unreadable."""
+        if size[0] <= 0 or size[1] <= 0:
+            return None
+        bucket = size_bucket(size)
+        key = (hashlib.sha256(data).hexdigest(), bucket)
+
+        with self._lock:
+            picture = self._images.get(key)
+            if picture is not None:
+                self._images.move_to_end(key)
+                metrics.inc(metrics.image_part_requests, result='memory')
+                return picture
+
+        picture = self.cache.get_media(*key) if self.cache is not None else None
+        if picture is not None:
+            metrics.inc(metrics.image_part_requests, result='disk')
+        else:
+            metrics.inc(metrics.image_part_requests, result='decode')
+            try:
+                with metrics.span('image_decode'):
+                    picture = decode_scaled(data, bucket)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                # EMF/WMF and other formats PIL cannot rasterise
+                return None
+            if self.cache is not None:
+                self.cache.put_media(*key, picture)
+
+        self._remember(key, picture)
+        return picture
+
+    def _remember(self, key: tuple, picture: Image.Image) -> None:
+        size = picture.width * picture.height * len(picture.getbands())
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = picture
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._bytes -= evicted.width * evicted.height * len(evicted.getbands())
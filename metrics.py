@@ -0,0 +1,294 @@
+"""Lightweight instrumentation for the preview pipeline.
+
+Provides per-stage timing spans, counters and latency histograms, a
+Prometheus text-format `/metrics` endpoint and optional JSON event logs.
+
+Everything is off unless enabled (``DOCPREVIEW_METRICS=1`` or
+``registry.enabled = True``); when disabled, `span()` hands back a shared
+no-op context manager and counters return immediately, so instrumented
+code pays only an attribute check.
+
+Environment variables:
+    DOCPREVIEW_METRICS=1        record metrics
+    DOCPREVIEW_METRICS_PORT=N   serve /metrics on port N (implies metrics on)
+    DOCPREVIEW_JSON_LOGS=1      emit one JSON log line per span and event
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fork_safety import renew_locks_after_fork
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger('docpreview')
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    inner = ','.join(f'{k}="{v}"' for k, v in pairs)
+    return '{' + inner + '}'
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down (queue depths, in-flight work)."""
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram with labels."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0.0
+                for bound, bucket_count in zip(self.buckets, series):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                cumulative += series[len(self.buckets)]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-1]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class _NullSpan:
+    """Shared no-op span handed out when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, registry: 'MetricsRegistry', stage: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.registry.stage_seconds.observe(elapsed, stage=self.stage, **self.labels)
+        if self.registry.json_logs:
+            self.registry.log_event('span', stage=self.stage, seconds=round(elapsed, 6),
+                                    error=exc_type.__name__ if exc_type else None, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them for scraping."""
+
+    def __init__(self, enabled: bool = False, json_logs: bool = False):
+        self.enabled = enabled
+        self.json_logs = json_logs
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+
+        self.stage_seconds = self.histogram(
+            'docpreview_stage_seconds', 'Time spent per preview pipeline stage')
+        self.render_seconds = self.histogram(
+            'docpreview_render_seconds', 'End-to-end page render latency')
+        self.renders = self.counter(
+            'docpreview_renders_total', 'Pages rendered (cache misses) per format')
+        self.render_errors = self.counter(
+            'docpreview_render_errors_total', 'Failed renders per format')
+        self.cache_requests = self.counter(
+            'docpreview_cache_requests_total', 'Render cache lookups by result')
+        self.coalesced_renders = self.counter(
+            'docpreview_coalesced_renders_total', 'Requests that joined an identical in-flight render')
+        self.image_part_requests = self.counter(
+            'docpreview_image_part_requests_total', 'Embedded image lookups by where they were found')
+        self.render_mode_decisions = self.counter(
+            'docpreview_render_mode_decisions_total', 'Documents assigned to server or client rendering, by reason')
+        self.delivered_bytes = self.counter(
+            'docpreview_delivered_bytes_total', 'Bytes sent to viewers per rendering mode and format')
+        self.client_display_seconds = self.histogram(
+            'docpreview_client_display_seconds', 'Viewer-reported time to show a page, per rendering mode')
+
+    def _register(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(name, lambda: Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(name, lambda: Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(name, help_text, buckets))
+
+    def span(self, stage: str, **labels):
+        """Time a block of code as one pipeline stage."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, labels)
+
+    def inc(self, counter: Counter, amount: float = 1.0, **labels):
+        """Increment a counter if metrics are enabled."""
+        if self.enabled:
+            counter.inc(amount, **labels)
+
+    def observe(self, histogram: Histogram, value: float, **labels):
+        """Record a histogram observation if metrics are enabled."""
+        if self.enabled:
+            histogram.observe(value, **labels)
+
+    def log_event(self, event: str, **fields):
+        """Emit a structured JSON log line (only when JSON logs are on)."""
+        if not self.json_logs:
+            return
+        record = {'ts': round(time.time(), 3), 'event': event}
+        record.update({k: v for k, v in fields.items() if v is not None})
+        logger.info(json.dumps(record, default=str))
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _env_flag(name: str) -> bool:
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+registry = MetricsRegistry(
+    enabled=_env_flag('DOCPREVIEW_METRICS') or bool(os.environ.get('DOCPREVIEW_METRICS_PORT')),
+    json_logs=_env_flag('DOCPREVIEW_JSON_LOGS'),
+)
+
+if registry.json_logs and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def span(stage: str, **labels):
+    """Module-level shortcut for `registry.span`."""
+    return registry.span(stage, **labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would otherwise flood stderr
+        pass
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread and enable recording."""
+    registry.enabled = True
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def maybe_start_metrics_server() -> Optional[ThreadingHTTPServer]:
+    """Start the /metrics server if DOCPREVIEW_METRICS_PORT is set."""
+    port = os.environ.get('DOCPREVIEW_METRICS_PORT')
+    if port:
+        return start_metrics_server(int(port))
+    return None
@@ -0,0 +1,75 @@
+"""Quick-navigation panel shared by the Gradio apps.
+
+The server sends a few hundred bytes describing the document (page count,
+current page, label); static/page_navigator.js builds the page buttons in the
+browser, only for the visible range, styled by static/page_navigator.css.
+Both are injected once into the page head.
+"""
+
+import os
+import html
+from typing import Callable, List, Optional
+
+import gradio as gr
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+
+def _read_static(name: str) -> str:
+    with open(os.path.join(STATIC_DIR, name), 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+NAVIGATOR_HEAD = (
+    f"<style>{_read_static('page_navigator.css')}</style>\n"
+    f"<script>{_read_static('page_navigator.js')}</script>"
+)
+
+JUMP_ELEM_ID = 'docnav-jump'
+
+# Runs in the browser before the event is sent; its result replaces the page input
+_JUMP_JS = "(page) => window.docnavRequestedPage"
+
+# Gradio 6 takes head assets in launch(), Gradio 5 in Blocks()
+_HEAD_IN_LAUNCH = int(gr.__version__.split('.')[0]) >= 6
+
+
+def blocks_kwargs() -> dict:
+    """Extra gr.Blocks() arguments that install the navigator assets."""
+    return {} if _HEAD_IN_LAUNCH else {'head': NAVIGATOR_HEAD}
+
+
+def launch_kwargs() -> dict:
+    """Extra launch() arguments that install the navigator assets."""
+    return {'head': NAVIGATOR_HEAD} if _HEAD_IN_LAUNCH else {}
+
+
+def navigator_html(total_pages: int, current_page: int, page_type: str = "Page",
+                   title: Optional[str] = None, tip: Optional[str] = None) -> str:
+    """Placeholder markup for the navigation panel; its size does not depend on the page count."""
+    if total_pages <= 0:
+        return ""
+
+    title = title or "Quick Navigation"
+    parts = [
+        f'<div class="docnav" data-total="{int(total_pages)}" data-current="{int(current_page)}" '
+        f'data-label="{html.escape(page_type)}">',
+        f'<h3 class="docnav-title">{html.escape(title)}</h3>',
+        '<div class="docnav-pages"></div>',
+    ]
+    if tip:
+        parts.append(f'<p class="docnav-tip">{tip}</p>')
+    parts.append('</div>')
+    return ''.join(parts)
+
+
+def add_page_jump(fn: Callable, outputs: List[gr.components.Component]) -> gr.Button:
+    """Wire navigator clicks to `fn(page_number)` as a regular Gradio event.
+
+    Must be called inside the Blocks context. A click sends exactly one event
+    with the page number as payload; rapid clicks only run the last one.
+    """
+    page = gr.Number(visible=False, precision=0)
+    trigger = gr.Button("Jump to page", elem_id=JUMP_ELEM_ID, elem_classes=["docnav-hidden"])
+    trigger.click(fn=fn, inputs=[page], outputs=outputs, js=_JUMP_JS, trigger_mode="always_last")
+    return trigger
@@ -0,0 +1,127 @@
+"""Page dimensions of whole documents, read without rendering anything.
+
+Viewers need every page's size before showing it: to reserve space for pages
+not rendered yet, to pick a render scale and to lay out continuous scrolling.
+Rendering a page (or calling PDF.js getPage) only to learn its size is
+wasteful, so sizes are read from the document structure in one pass:
+
+- PDF: each page's CropBox clipped to its MediaBox, and /Rotate, from the
+  page tree only (no content stream is parsed);
+- PPTX: the presentation's slide size;
+- DOCX: the page size (w:pgSz) of the section each page starts in.
+
+Sizes are in points, as displayed (width and height swapped for pages rotated
+by 90 or 270 degrees). A table keeps them in parallel arrays and serialises
+them as runs of identical pages, so a 2000-page document of one paper size is
+a single entry in the cache metadata and in the JSON sent to viewers.
+"""
+
+from array import array
+from typing import List, Tuple
+
+from pypdf import PdfReader
+
+from pptx_slides import EMU_PER_POINT
+
+# US Letter, Word's default when a section does not say
+DEFAULT_DOCX_PAGE = (612.0, 792.0)
+
+
+class PageSizes:
+    """Width, height (points, as displayed) and rotation of each page."""
+
+    def __init__(self):
+        self.widths = array('f')
+        self.heights = array('f')
+        self.rotations = array('H')
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def append(self, width: float, height: float, rotation: int = 0) -> None:
+        self.widths.append(width)
+        self.heights.append(height)
+        self.rotations.append(rotation)
+
+    def size(self, page_number: int) -> Tuple[float, float]:
+        """(width, height) of a 1-based page."""
+        return self.widths[page_number - 1], self.heights[page_number - 1]
+
+    def to_runs(self) -> List[list]:
+        """[[count, width, height, rotation], ...] for consecutive identical pages."""
+        runs = []
+        for width, height, rotation in zip(self.widths, self.heights, self.rotations):
+            page = [round(width, 2), round(height, 2), rotation]
+            if runs and runs[-1][1:] == page:
+                runs[-1][0] += 1
+            else:
+                runs.append([1] + page)
+        return runs
+
+    @classmethod
+    def from_runs(cls, runs: List[list]) -> 'PageSizes':
+        sizes = cls()
+        for count, width, height, rotation in runs:
+            for _ in range(count):
+                sizes.append(width, height, rotation)
+        return sizes
+
+    @classmethod
+    def uniform(cls, count: int, width: float, height: float) -> 'PageSizes':
+        sizes = cls()
+        sizes.widths = array('f', [width]) * count
+        sizes.heights = array('f', [height]) * count
+        sizes.rotations = array('H', [0]) * count
+        return sizes
+
+
+def pdf_page_sizes(file_path: str) -> PageSizes:
+    """Visible area of every PDF page, like PDF.js's viewport at scale 1."""
+    sizes = PageSizes()
+    for page in PdfReader(file_path).pages:
+        media, crop = page.mediabox, page.cropbox
+        width = min(float(media.right), float(crop.right)) - max(float(media.left), float(crop.left))
+        height = min(float(media.top), float(crop.top)) - max(float(media.bottom), float(crop.bottom))
+        if width <= 0 or height <= 0:
+            # A crop box outside the media box is ignored by viewers
+            width, height = float(media.width), float(media.height)
+        rotation = (page.rotation or 0) % 360
+        if rotation in (90, 270):
+            width, height = height, width
+        sizes.append(abs(width), abs(height), rotation)
+    return sizes
+
+
+def slide_page_sizes(slide_count: int, slide_size: Tuple[int, int]) -> PageSizes:
+    """Every slide has the presentation's size (given in EMU)."""
+    return PageSizes.uniform(slide_count, slide_size[0] / EMU_PER_POINT, slide_size[1] / EMU_PER_POINT)
+
+
+def docx_page_sizes(doc, page_count: int, paragraphs_per_page: int) -> PageSizes:
+    """Page size of the section each page starts in.
+
+    DOCX files store no pages; like the previewer's layout, a page is a run
+    of `paragraphs_per_page` body paragraphs.
+    """
+    section_sizes = []
+    for section in doc.sections:
+        if section.page_width and section.page_height:
+            section_sizes.append((section.page_width / EMU_PER_POINT, section.page_height / EMU_PER_POINT))
+        else:
+            section_sizes.append(DEFAULT_DOCX_PAGE)
+
+    # A paragraph carrying w:sectPr ends its section; the body's own sectPr is the last one
+    section_ends = []
+    for index, paragraph in enumerate(doc.paragraphs):
+        properties = paragraph._p.pPr
+        if properties is not None and properties.sectPr is not None:
+            section_ends.append(index)
+
+    sizes = PageSizes()
+    section = 0
+    for page_number in range(1, page_count + 1):
+        first_paragraph = (page_number - 1) * paragraphs_per_page
+        while section < len(section_ends) and section_ends[section] < first_paragraph:
+            section += 1
+        sizes.append(*section_sizes[min(section, len(section_sizes) - 1)])
+    return sizes
@@ -0,0 +1,409 @@
+"""Slide geometry read straight from PPTX XML, one slide at a time.
+
+python-pptx parses every part of a package when it is opened, which makes the
+first render of a large deck pay for all of its slides. SlideDeck only reads
+presentation.xml up front; a slide's XML (and the layout, master and theme it
+inherits from) is parsed when that slide is asked for, and embedded media is
+read only when a picture using it is drawn (decoding is left to image_parts).
+
+Shapes come back positioned in EMU (914400 per inch) with their fill, outline,
+text and picture, ready to be scaled onto a canvas. Placeholders without their
+own position inherit it from the layout or master, and text sizes fall back to
+the master's text styles. Rotation, effects and theme colour modifiers are
+ignored.
+"""
+
+import posixpath
+import threading
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from fork_safety import renew_locks_after_fork
+
+NS = {
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+}
+R_ID = '{%s}id' % NS['r']
+R_EMBED = '{%s}embed' % NS['r']
+
+EMU_PER_POINT = 12700
+# Default text insets of a:bodyPr (left, top, right, bottom)
+DEFAULT_INSETS = (91440, 45720, 91440, 45720)
+DEFAULT_TEXT_SIZES = {'title': 44.0, 'body': 28.0, 'other': 18.0}
+# Theme colour names used by a:schemeClr, through the master's default colour map
+SCHEME_ALIASES = {'tx1': 'dk1', 'bg1': 'lt1', 'tx2': 'dk2', 'bg2': 'lt2'}
+
+_PARSER = etree.XMLParser(resolve_entities=False, no_network=True, huge_tree=True)
+
+
+class TextParagraph:
+    """One paragraph of shape text, with the style of its first run."""
+
+    def __init__(self, text: str, size: float, bold: bool, color: str, align: str):
+        self.text = text
+        self.size = size        # points
+        self.bold = bold
+        self.color = color      # '#RRGGBB'
+        self.align = align      # 'l', 'ctr' or 'r'
+
+
+class SlideShape:
+    """A shape of a slide, positioned in EMU."""
+
+    def __init__(self, kind: str, box: Tuple[int, int, int, int], geometry: str = 'rect',
+                 fill: Optional[str] = None, outline: Optional[str] = None, outline_width: int = 0,
+                 paragraphs: Optional[List[TextParagraph]] = None, anchor: str = 't',
+                 insets: Tuple[int, int, int, int] = DEFAULT_INSETS, image: Optional[str] = None,
+                 flip: Tuple[bool, bool] = (False, False)):
+        self.kind = kind                    # 'shape', 'picture' or 'line'
+        self.box = box                      # (x, y, cx, cy)
+        self.geometry = geometry            # preset geometry: 'rect', 'roundRect', 'ellipse'...
+        self.fill = fill
+        self.outline = outline
+        self.outline_width = outline_width  # EMU
+        self.paragraphs = paragraphs or []
+        self.anchor = anchor                # vertical text anchor: 't', 'ctr' or 'b'
+        self.insets = insets
+        self.image = image                  # media part name, for pictures
+        self.flip = flip                    # (horizontal, vertical), for lines
+
+
+def _attr_int(element, name: str, default: int = 0) -> int:
+    value = element.get(name) if element is not None else None
+    return int(value) if value is not None else default
+
+
+class SlideDeck:
+    """Lazily parsed view of a .pptx file."""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._zip = zipfile.ZipFile(file_path)
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+        self._parts: Dict[str, etree._Element] = {}     # parsed layouts, masters and themes
+
+        presentation = self._xml('ppt/presentation.xml')
+        size = presentation.find('p:sldSz', NS)
+        self.slide_size = (_attr_int(size, 'cx', 9144000), _attr_int(size, 'cy', 6858000))
+        rels = self._rels('ppt/presentation.xml')
+        self._slide_parts = [rels[sld.get(R_ID)] for sld in presentation.findall('p:sldIdLst/p:sldId', NS)
+                             if sld.get(R_ID) in rels]
+
+    @property
+    def slide_count(self) -> int:
+        return len(self._slide_parts)
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def xml_size(self) -> int:
+        """Uncompressed bytes of the deck's XML parts, a measure of what parsing it holds."""
+        return sum(info.file_size for info in self._zip.infolist() if info.filename.endswith(('.xml', '.rels')))
+
+    def _xml(self, part_name: str) -> etree._Element:
+        with self._lock:
+            data = self._zip.read(part_name)
+        return etree.fromstring(data, _PARSER)
+
+    def _shared_xml(self, part_name: str) -> etree._Element:
+        """Parse a part shared between slides (layout, master, theme) once."""
+        element = self._parts.get(part_name)
+        if element is None:
+            element = self._parts[part_name] = self._xml(part_name)
+        return element
+
+    def _rels(self, part_name: str) -> Dict[str, str]:
+        """Map relationship ids of a part to the part names they target."""
+        directory, name = posixpath.split(part_name)
+        rels_name = posixpath.join(directory, '_rels', name + '.rels')
+        try:
+            root = self._xml(rels_name)
+        except KeyError:
+            return {}
+        targets = {}
+        for rel in root:
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = rel.get('Target')
+            targets[rel.get('Id')] = (target.lstrip('/') if target.startswith('/')
+                                      else posixpath.normpath(posixpath.join(directory, target)))
+        return targets
+
+    def _related(self, part_name: str, kind: str) -> Optional[str]:
+        """The first part related to `part_name` whose name contains `kind` (slideLayout, theme...)."""
+        for target in self._rels(part_name).values():
+            if f'/{kind}' in target:
+                return target
+        return None
+
+    def media(self, part_name: str) -> bytes:
+        """Raw bytes of a media part (an embedded picture)."""
+        with self._lock:
+            return self._zip.read(part_name)
+
+    def slide_shapes(self, slide_number: int) -> Tuple[Optional[str], List[SlideShape]]:
+        """Background colour and shapes (in z-order) of a slide, numbered from 1."""
+        part = self._slide_parts[slide_number - 1]
+        slide = self._xml(part)
+        rels = self._rels(part)
+        layout = self._related(part, 'slideLayout')
+        master = self._related(layout, 'slideMaster') if layout else None
+        theme = self._related(master, 'theme') if master else None
+        context = _SlideContext(self, rels, layout, master, theme)
+
+        background = None
+        for source in (slide, layout, master):
+            if source is None:
+                continue
+            root = source if isinstance(source, etree._Element) else self._shared_xml(source)
+            fill = root.find('p:cSld/p:bg/p:bgPr/a:solidFill', NS)
+            if fill is not None:
+                background = context.color(fill)
+                break
+
+        shapes: List[SlideShape] = []
+        tree = slide.find('p:cSld/p:spTree', NS)
+        if tree is not None:
+            context.collect(tree, _identity, shapes)
+        return background, shapes
+
+
+def _identity(x: int, y: int, cx: int, cy: int) -> Tuple[int, int, int, int]:
+    return x, y, cx, cy
+
+
+class _SlideContext:
+    """What a slide inherits: relationships, placeholder positions, text styles and theme colours."""
+
+    def __init__(self, deck: SlideDeck, rels: Dict[str, str], layout: Optional[str],
+                 master: Optional[str], theme: Optional[str]):
+        self.deck = deck
+        self.rels = rels
+        self.inherited = [deck._shared_xml(p) for p in (layout, master) if p]
+        self.master = deck._shared_xml(master) if master else None
+        self.theme = deck._shared_xml(theme) if theme else None
+
+    def collect(self, tree, transform, shapes: List[SlideShape]) -> None:
+        for child in tree:
+            tag = etree.QName(child).localname
+            if tag == 'sp':
+                self.add_shape(child, transform, shapes)
+            elif tag == 'pic':
+                box = self.box(child.find('p:spPr/a:xfrm', NS), transform)
+                blip = child.find('p:blipFill/a:blip', NS)
+                target = self.rels.get(blip.get(R_EMBED)) if blip is not None else None
+                if box and target:
+                    shapes.append(SlideShape('picture', box, image=target))
+            elif tag == 'cxnSp':
+                xfrm = child.find('p:spPr/a:xfrm', NS)
+                box = self.box(xfrm, transform)
+                line = child.find('p:spPr/a:ln', NS)
+                if box:
+                    shapes.append(SlideShape(
+                        'line', box, outline=self.color(line.find('a:solidFill', NS)) if line is not None else None,
+                        outline_width=_attr_int(line, 'w', 12700),
+                        flip=(xfrm.get('flipH') == '1', xfrm.get('flipV') == '1')
+                    ))
+            elif tag == 'graphicFrame':
+                self.add_table(child, transform, shapes)
+            elif tag == 'grpSp':
+                self.collect(child, self.group_transform(child, transform), shapes)
+
+    def group_transform(self, group, transform):
+        """Map child coordinates of a group through its chOff/chExt into the parent's space."""
+        xfrm = group.find('p:grpSpPr/a:xfrm', NS)
+        if xfrm is None:
+            return transform
+        off, ext = xfrm.find('a:off', NS), xfrm.find('a:ext', NS)
+        ch_off, ch_ext = xfrm.find('a:chOff', NS), xfrm.find('a:chExt', NS)
+        if off is None or ext is None or ch_off is None or ch_ext is None:
+            return transform
+        sx = _attr_int(ext, 'cx') / (_attr_int(ch_ext, 'cx') or 1)
+        sy = _attr_int(ext, 'cy') / (_attr_int(ch_ext, 'cy') or 1)
+
+        def child_transform(x, y, cx, cy):
+            return transform(round(_attr_int(off, 'x') + (x - _attr_int(ch_off, 'x')) * sx),
+                             round(_attr_int(off, 'y') + (y - _attr_int(ch_off, 'y')) * sy),
+                             round(cx * sx), round(cy * sy))
+        return child_transform
+
+    def box(self, xfrm, transform) -> Optional[Tuple[int, int, int, int]]:
+        if xfrm is None:
+            return None
+        off, ext = xfrm.find('a:off', NS), xfrm.find('a:ext', NS)
+        if off is None or ext is None:
+            return None
+        return transform(_attr_int(off, 'x'), _attr_int(off, 'y'), _attr_int(ext, 'cx'), _attr_int(ext, 'cy'))
+
+    def placeholder(self, shape):
+        """(type, idx) of a placeholder shape, or None."""
+        ph = shape.find('p:nvSpPr/p:nvPr/p:ph', NS)
+        if ph is None:
+            return None
+        return ph.get('type', 'body'), ph.get('idx')
+
+    def inherited_xfrm(self, ph):
+        """Position of a placeholder from the layout, then the master."""
+        ph_type, ph_idx = ph
+        for root in self.inherited:
+            by_type = None
+            for candidate in root.iterfind('p:cSld/p:spTree/p:sp', NS):
+                other = self.placeholder(candidate)
+                xfrm = candidate.find('p:spPr/a:xfrm', NS)
+                if other is None or xfrm is None:
+                    continue
+                if ph_idx is not None and other[1] == ph_idx:
+                    return xfrm
+                if by_type is None and _placeholder_style(other[0]) == _placeholder_style(ph_type):
+                    by_type = xfrm
+            if by_type is not None:
+                return by_type
+        return None
+
+    def text_defaults(self, ph, style=None) -> dict:
+        """Level-1 size, alignment and colour of the master text style a shape follows.
+
+        `style` is the shape's p:style, whose font reference can set the text colour.
+        """
+        level = None
+        style_name = _placeholder_style(ph[0]) if ph else 'other'
+        if self.master is not None:
+            level = self.master.find(f'p:txStyles/p:{style_name}Style/a:lvl1pPr', NS)
+        defaults = {'size': DEFAULT_TEXT_SIZES[style_name], 'align': 'l', 'color': '#000000'}
+        self._apply_level(defaults, level)
+        font_ref = style.find('a:fontRef', NS) if style is not None else None
+        defaults['color'] = self.color(font_ref) or defaults['color']
+        return defaults
+
+    def _apply_level(self, defaults: dict, level) -> None:
+        """Override `defaults` with what an a:lvl1pPr (or a:pPr) sets."""
+        if level is None:
+            return
+        defaults['align'] = level.get('algn', defaults['align'])
+        props = level.find('a:defRPr', NS)
+        if props is not None:
+            defaults['size'] = _attr_int(props, 'sz', 0) / 100 or defaults['size']
+            defaults['color'] = self.color(props.find('a:solidFill', NS)) or defaults['color']
+
+    def add_shape(self, shape, transform, shapes: List[SlideShape]) -> None:
+        ph = self.placeholder(shape)
+        xfrm = shape.find('p:spPr/a:xfrm', NS)
+        if xfrm is None and ph is not None:
+            xfrm = self.inherited_xfrm(ph)
+        box = self.box(xfrm, transform)
+        if box is None:
+            return
+
+        sp_pr = shape.find('p:spPr', NS)
+        style = shape.find('p:style', NS)
+        geometry = sp_pr.find('a:prstGeom', NS) if sp_pr is not None else None
+        # Explicit fills and lines win over the theme references of p:style
+        fill = sp_pr.find('a:solidFill', NS) if sp_pr is not None else None
+        if fill is None and style is not None and (sp_pr is None or sp_pr.find('a:noFill', NS) is None):
+            fill_ref = style.find('a:fillRef', NS)
+            if fill_ref is not None and fill_ref.get('idx') != '0':
+                fill = fill_ref
+        line = sp_pr.find('a:ln', NS) if sp_pr is not None else None
+        outline = None
+        if line is None or line.find('a:noFill', NS) is None:
+            outline = self.color(line.find('a:solidFill', NS)) if line is not None else None
+            line_ref = style.find('a:lnRef', NS) if style is not None else None
+            if outline is None and line_ref is not None and line_ref.get('idx') != '0':
+                outline = self.color(line_ref)
+        paragraphs, anchor, insets = self.text(shape.find('p:txBody', NS), self.text_defaults(ph, style))
+        shapes.append(SlideShape(
+            'shape', box,
+            geometry=geometry.get('prst', 'rect') if geometry is not None else 'rect',
+            fill=self.color(fill), outline=outline, outline_width=_attr_int(line, 'w', 12700),
+            paragraphs=paragraphs, anchor=anchor, insets=insets
+        ))
+
+    def add_table(self, frame, transform, shapes: List[SlideShape]) -> None:
+        """Tables become one outlined shape per cell."""
+        table = frame.find('a:graphic/a:graphicData/a:tbl', NS)
+        off = frame.find('p:xfrm/a:off', NS)
+        if table is None or off is None:
+            return
+        widths = [_attr_int(col, 'w') for col in table.findall('a:tblGrid/a:gridCol', NS)]
+        y = _attr_int(off, 'y')
+        for row in table.findall('a:tr', NS):
+            height = _attr_int(row, 'h')
+            x, column = _attr_int(off, 'x'), 0
+            for cell in row.findall('a:tc', NS):
+                span = _attr_int(cell, 'gridSpan', 1)
+                width = sum(widths[column:column + span])
+                if cell.get('hMerge') != '1' and cell.get('vMerge') != '1':
+                    paragraphs, anchor, insets = self.text(cell.find('a:txBody', NS), self.text_defaults(None))
+                    fill = cell.find('a:tcPr/a:solidFill', NS)
+                    shapes.append(SlideShape(
+                        'shape', transform(x, y, width, height), fill=self.color(fill),
+                        outline='#000000', outline_width=EMU_PER_POINT,
+                        paragraphs=paragraphs, anchor=anchor, insets=insets
+                    ))
+                x += width
+                column += span
+            y += height
+
+    def text(self, body, defaults: dict):
+        """Paragraphs, vertical anchor and insets of a text body."""
+        if body is None:
+            return [], 't', DEFAULT_INSETS
+        body_pr = body.find('a:bodyPr', NS)
+        insets = tuple(_attr_int(body_pr, name, default)
+                       for name, default in zip(('lIns', 'tIns', 'rIns', 'bIns'), DEFAULT_INSETS))
+        anchor = body_pr.get('anchor', 't') if body_pr is not None else 't'
+        autofit = body.find('a:bodyPr/a:normAutofit', NS)
+        # Shrink-on-overflow text records the scale PowerPoint applied
+        font_scale = _attr_int(autofit, 'fontScale', 100000) / 100000
+        defaults = dict(defaults)
+        self._apply_level(defaults, body.find('a:lstStyle/a:lvl1pPr', NS))
+
+        paragraphs = []
+        for para in body.findall('a:p', NS):
+            style = dict(defaults)
+            self._apply_level(style, para.find('a:pPr', NS))
+            runs = para.findall('.//a:r', NS) + para.findall('.//a:fld', NS)
+            text = ''.join(t.text or '' for t in para.iterfind('.//a:t', NS))
+            props = runs[0].find('a:rPr', NS) if runs else para.find('a:endParaRPr', NS)
+            paragraphs.append(TextParagraph(
+                text=text,
+                size=(_attr_int(props, 'sz', 0) / 100 or style['size']) * font_scale,
+                bold=props is not None and props.get('b') == '1',
+                color=(self.color(props.find('a:solidFill', NS)) if props is not None else None) or style['color'],
+                align=style['align']
+            ))
+        return paragraphs, anchor, insets
+
+    def color(self, fill) -> Optional[str]:
+        """'#RRGGBB' of the colour inside `fill` (an a:solidFill or style reference), or None."""
+        if fill is None:
+            return None
+        srgb = fill.find('a:srgbClr', NS)
+        if srgb is not None:
+            return '#' + srgb.get('val', '000000')
+        scheme = fill.find('a:schemeClr', NS)
+        if scheme is not None and self.theme is not None:
+            name = SCHEME_ALIASES.get(scheme.get('val'), scheme.get('val'))
+            entry = self.theme.find(f'a:themeElements/a:clrScheme/a:{name}', NS)
+            if entry is not None:
+                srgb = entry.find('a:srgbClr', NS)
+                if srgb is not None:
+                    return '#' + srgb.get('val', '000000')
+                system = entry.find('a:sysClr', NS)
+                if system is not None:
+                    return '#' + system.get('lastClr', '000000')
+        return None
+
+
+def _placeholder_style(ph_type: str) -> str:
+    """Master text style ('title', 'body' or 'other') a placeholder type follows."""
+    if ph_type in ('title', 'ctrTitle'):
+        return 'title'
+    if ph_type in ('body', 'subTitle', 'obj'):
+        return 'body'
+    return 'other'
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Pre-render a document corpus into the derivative cache.
+
+Walks a directory tree, renders every page (and its thumbnail) of every
+supported document across a process pool and stores the results in a
+RenderCache. Pages already in the cache are skipped, so an interrupted run
+can simply be started again.
+
+    python prerender.py /srv/documents --cache-dir /var/cache/previews --workers 8
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from document_previewer import DocumentPreviewer
+from render_cache import RenderCache
+
+# Per-process previewer, created once by the pool initializer
+_worker_previewer: Optional[DocumentPreviewer] = None
+
+
+def _init_worker(cache_dir: str):
+    global _worker_previewer
+    _worker_previewer = DocumentPreviewer(cache=RenderCache(cache_dir))
+
+
+def _count_pages(file_path: str) -> Tuple[str, str, int]:
+    """Hash a document and count its pages, reusing cached metadata."""
+    doc_key = _worker_previewer.cache.document_key(file_path)
+    return file_path, doc_key, _worker_previewer.get_page_count(file_path)
+
+
+def _render_page(file_path: str, page_number: int, thumbnails: bool) -> float:
+    """Render one page (and optionally its thumbnail) into the cache."""
+    start = time.perf_counter()
+    image = _worker_previewer.render_page(file_path, page_number)
+    if image is None:
+        raise ValueError("renderer returned no image")
+    if thumbnails:
+        _worker_previewer.get_thumbnail(file_path, page_number)
+    return time.perf_counter() - start
+
+
+def find_documents(root: str, previewer: DocumentPreviewer) -> List[str]:
+    """Recursively collect supported documents under `root`."""
+    documents = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if previewer.is_supported(path):
+                documents.append(path)
+    return documents
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def prerender(root: str, cache_dir: str, workers: int, thumbnails: bool = True) -> dict:
+    """Render every page under `root` into the cache and return a report."""
+    cache = RenderCache(cache_dir)
+    documents = find_documents(root, DocumentPreviewer())
+    timings: Dict[str, List[float]] = defaultdict(list)
+    failures = []
+    skipped = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cache_dir,)) as pool:
+        # Page counts first, so the render phase can be balanced page by page
+        counted = []
+        counting = {pool.submit(_count_pages, path): path for path in documents}
+        for future in as_completed(counting):
+            try:
+                file_path, doc_key, page_count = future.result()
+            except Exception as e:
+                failures.append({'file': counting[future], 'page': None, 'error': str(e)})
+                continue
+            if page_count == 0:
+                failures.append({'file': file_path, 'page': None, 'error': 'could not read page count'})
+                continue
+            counted.append((file_path, doc_key, page_count))
+
+        pending = {}
+        for file_path, doc_key, page_count in counted:
+            for page_number in range(1, page_count + 1):
+                done = cache.has(doc_key, page_number) and (
+                    not thumbnails or cache.has(doc_key, page_number, kind='thumb'))
+                if done:
+                    skipped += 1
+                    continue
+                future = pool.submit(_render_page, file_path, page_number, thumbnails)
+                pending[future] = (file_path, page_number)
+
+        for future in as_completed(pending):
+            file_path, page_number = pending[future]
+            ext = os.path.splitext(file_path)[1].lower()
+            try:
+                elapsed_page = future.result()
+            except Exception as e:
+                failures.append({'file': file_path, 'page': page_number, 'error': str(e)})
+                continue
+            timings[ext].append(elapsed_page)
+
+    elapsed = time.perf_counter() - start
+    rendered = sum(len(values) for values in timings.values())
+    per_format = {}
+    for ext, values in sorted(timings.items()):
+        values.sort()
+        per_format[ext] = {
+            'pages': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 1),
+            'p90_ms': round(percentile(values, 90) * 1000, 1),
+            'p99_ms': round(percentile(values, 99) * 1000, 1),
+            'max_ms': round(values[-1] * 1000, 1),
+        }
+
+    return {
+        'documents': len(documents),
+        'pages_rendered': rendered,
+        'pages_skipped': skipped,
+        'elapsed_s': round(elapsed, 2),
+        'pages_per_s': round(rendered / elapsed, 2) if elapsed > 0 else 0.0,
+        'formats': per_format,
+        'failures': failures,
+    }
+
+
+def print_report(report: dict):
+    """Print a human-readable summary of a pre-render run."""
+    print(f"Documents: {report['documents']}")
+    print(f"Pages rendered: {report['pages_rendered']} (skipped {report['pages_skipped']} already cached)")
+    print(f"Elapsed: {report['elapsed_s']}s | Throughput: {report['pages_per_s']} pages/s")
+    for ext, stats in report['formats'].items():
+        print(f"  {ext:6} {stats['pages']:6} pages | p50 {stats['p50_ms']}ms | "
+              f"p90 {stats['p90_ms']}ms | p99 {stats['p99_ms']}ms | max {stats['max_ms']}ms")
+    if report['failures']:
+        print(f"Failures: {len(report['failures'])}")
+        for failure in report['failures']:
+            print(f"  {failure['file']} page {failure['page']}: {failure['error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-render document pages and thumbnails into the render cache.")
+    parser.add_argument('root', help="Directory tree to scan for documents")
+    parser.add_argument('--cache-dir', default='.render_cache', help="Render cache directory")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument('--no-thumbnails', action='store_true', help="Skip thumbnail generation")
+    parser.add_argument('--json', dest='json_path', help="Also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    report = prerender(args.root, args.cache_dir, args.workers, thumbnails=not args.no_thumbnails)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report['failures'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
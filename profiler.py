@@ -0,0 +1,231 @@
+"""Opt-in profiling of slow preview requests.
+
+When enabled, every render runs under a profiler; if the request exceeds
+the latency threshold the profile is kept on disk next to the document's
+hash, page and format, otherwise it is discarded. Two modes are available:
+
+- ``cprofile``: deterministic cProfile, saved as a pstats ``.prof`` file
+  (open with ``python -m pstats`` or snakeviz).
+- ``sample``: a statistical stack sampler on a side thread, saved as
+  collapsed stacks (``.folded``) ready for flamegraph tools. Much lower
+  overhead, so it is the better choice for production.
+
+With render limits on, the render itself runs in a forked child while the
+request thread waits. The child profiles its part in the same mode and sends
+it back with the result, to be merged into the request's profile. A child
+that is killed (timeout, memory) sends nothing: only the wait is profiled.
+
+Environment variables:
+    DOCPREVIEW_PROFILE_DIR=path         enable profiling, store profiles here
+    DOCPREVIEW_PROFILE_THRESHOLD_MS=N   keep profiles slower than N ms (default 1000)
+    DOCPREVIEW_PROFILE_MODE=sample      "sample" (default) or "cprofile"
+"""
+
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+from render_cache import file_sha256
+
+DEFAULT_THRESHOLD_S = 1.0
+SAMPLE_INTERVAL_S = 0.005
+
+
+class _StackSampler:
+    """Samples one thread's stack at a fixed interval from a side thread."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _ChildStats:
+    """cProfile stats sent back by a render child, in the shape `pstats.Stats` loads."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class SlowRenderProfiler:
+    """Keeps profiles of renders slower than a latency threshold."""
+
+    def __init__(self, profile_dir: str, threshold_s: float = DEFAULT_THRESHOLD_S,
+                 mode: str = 'sample'):
+        if mode not in ('sample', 'cprofile'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.profile_dir = profile_dir
+        self.threshold_s = threshold_s
+        self.mode = mode
+        self.index_path = os.path.join(profile_dir, 'index.jsonl')
+        self._lock = threading.Lock()
+        # The collector of the profile running on each thread, and what its render children sent back
+        self._active = threading.local()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional['SlowRenderProfiler']:
+        """Build a profiler from DOCPREVIEW_PROFILE_* variables, if set."""
+        profile_dir = os.environ.get('DOCPREVIEW_PROFILE_DIR')
+        if not profile_dir:
+            return None
+        threshold_ms = float(os.environ.get('DOCPREVIEW_PROFILE_THRESHOLD_MS', DEFAULT_THRESHOLD_S * 1000))
+        mode = os.environ.get('DOCPREVIEW_PROFILE_MODE', 'sample')
+        return cls(profile_dir, threshold_ms / 1000.0, mode)
+
+    @contextmanager
+    def profile(self, file_path: str, page_number: int, doc_key: Optional[str] = None):
+        """Profile the enclosed render and keep the result if it was slow."""
+        if self.mode == 'cprofile':
+            collector = cProfile.Profile()
+            collector.enable()
+        else:
+            collector = _StackSampler(threading.get_ident())
+            collector.start()
+        self._active.collector = collector
+        self._active.child_stats = []
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if self.mode == 'cprofile':
+                collector.disable()
+            else:
+                collector.stop()
+            child_stats, self._active.collector = self._active.child_stats, None
+            if elapsed >= self.threshold_s:
+                try:
+                    self._save(collector, child_stats, file_path, page_number, doc_key, elapsed)
+                except OSError as e:
+                    print(f"Error saving profile for {file_path} page {page_number}: {e}")
+
+    def run_isolated(self, run: Callable, fn: Callable, *args):
+        """`run(fn, *args)`, where `run` calls `fn` in a forked child, with the child's part profiled.
+
+        Outside a profiled render this is just `run(fn, *args)`.
+        """
+        if getattr(self._active, 'collector', None) is None:
+            return run(fn, *args)
+        result, stats = run(self._profiled_child, fn, args)
+        if self.mode == 'cprofile':
+            self._active.child_stats.append(_ChildStats(stats))
+        else:
+            self._active.collector.stacks.update(stats)
+        return result
+
+    def _profiled_child(self, fn: Callable, args: tuple):
+        """Runs in the render child: profile `fn(*args)`, return its result and the profile."""
+        if self.mode == 'cprofile':
+            # Only one profiler can be active; the parent's was forked along with this thread
+            self._active.collector.disable()
+            collector = cProfile.Profile()
+            collector.enable()
+            try:
+                result = fn(*args)
+            finally:
+                collector.disable()
+            collector.create_stats()
+            return result, collector.stats
+
+        collector = _StackSampler(threading.get_ident())
+        collector.start()
+        try:
+            result = fn(*args)
+        finally:
+            collector.stop()
+        return result, dict(collector.stacks)
+
+    def _save(self, collector, child_stats: List[_ChildStats], file_path: str, page_number: int,
+              doc_key: Optional[str], elapsed: float):
+        # Hash only the slow documents, never on the fast path
+        doc_key = doc_key or file_sha256(file_path)
+        ext = os.path.splitext(file_path)[1].lower()
+        doc_dir = os.path.join(self.profile_dir, doc_key)
+        os.makedirs(doc_dir, exist_ok=True)
+
+        suffix = 'prof' if self.mode == 'cprofile' else 'folded'
+        name = f"{ext.lstrip('.')}-p{page_number:05d}-{int(time.time() * 1000)}.{suffix}"
+        path = os.path.join(doc_dir, name)
+        if self.mode == 'cprofile':
+            stats = pstats.Stats(collector)
+            if child_stats:
+                stats.add(*child_stats)
+            stats.dump_stats(path)
+        else:
+            collector.dump(path)
+
+        record = {
+            'doc_key': doc_key,
+            'file': os.path.basename(file_path),
+            'page': page_number,
+            'format': ext,
+            'seconds': round(elapsed, 4),
+            'mode': self.mode,
+            'profile': path,
+            'ts': round(time.time(), 3),
+        }
+        with self._lock:
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+
+    def records(self) -> List[dict]:
+        """Load every stored slow-request record."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def worst_offenders(self, limit: int = 20) -> List[dict]:
+        """Slowest (document, page) pairs, one row each, with their profile counts."""
+        worst = {}
+        occurrences = Counter()
+        for record in self.records():
+            key = (record['doc_key'], record['page'])
+            occurrences[key] += 1
+            if key not in worst or record['seconds'] > worst[key]['seconds']:
+                worst[key] = record
+        rows = []
+        for key, record in worst.items():
+            row = dict(record)
+            row['occurrences'] = occurrences[key]
+            rows.append(row)
+        rows.sort(key=lambda row: row['seconds'], reverse=True)
+        return rows[:limit]
@@ -0,0 +1,179 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from PIL import Image
+
+from fork_safety import renew_locks_after_fork
+
+CHUNK_SIZE = 1024 * 1024
+THUMBNAIL_SIZE = (200, 260)
+# Document hashes remembered by (path, size, mtime); each entry is a few hundred bytes
+MAX_KEY_MEMO = 4096
+
+
+def file_sha256(file_path: str) -> str:
+    """Compute the SHA-256 of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """On-disk cache of rendered page derivatives (pages and thumbnails).
+
+    Entries are keyed by the SHA-256 of the source document, so renamed or
+    re-uploaded copies of the same file share their renders.
+    """
+
+    def __init__(self, cache_dir: str, thumbnail_size: Tuple[int, int] = THUMBNAIL_SIZE):
+        self.cache_dir = cache_dir
+        self.thumbnail_size = thumbnail_size
+        # (path, size, mtime) -> sha256, so hot files are not re-hashed on every request;
+        # least recently used first out, as every revision of a file adds an entry
+        self._key_memo: 'OrderedDict[Tuple[str, int, float], str]' = OrderedDict()
+        self._memo_lock = threading.Lock()
+        renew_locks_after_fork(self, '_memo_lock')
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def document_key(self, file_path: str) -> str:
+        """Return the cache key (content hash) for a document."""
+        stat = os.stat(file_path)
+        memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        with self._memo_lock:
+            key = self._key_memo.get(memo_key)
+            if key is not None:
+                self._key_memo.move_to_end(memo_key)
+                return key
+        key = file_sha256(file_path)
+        self._memoise(memo_key, key)
+        return key
+
+    def remember(self, file_path: str, doc_key: str) -> None:
+        """Record a hash computed elsewhere (e.g. while streaming an upload)."""
+        stat = os.stat(file_path)
+        self._memoise((os.path.abspath(file_path), stat.st_size, stat.st_mtime), doc_key)
+
+    def _memoise(self, memo_key: Tuple[str, int, float], doc_key: str) -> None:
+        with self._memo_lock:
+            self._key_memo[memo_key] = doc_key
+            self._key_memo.move_to_end(memo_key)
+            while len(self._key_memo) > MAX_KEY_MEMO:
+                self._key_memo.popitem(last=False)
+
+    def document_dir(self, doc_key: str) -> str:
+        """Directory holding every derivative of one document."""
+        return os.path.join(self.cache_dir, doc_key[:2], doc_key)
+
+    def _entry_path(self, doc_key: str, page_number: int, kind: str, ext: str = 'png') -> str:
+        return os.path.join(self.document_dir(doc_key), f"{kind}-{page_number:05d}.{ext}")
+
+    def has(self, doc_key: str, page_number: int, kind: str = 'page') -> bool:
+        """Check whether a derivative is already cached."""
+        return os.path.exists(self._entry_path(doc_key, page_number, kind))
+
+    def get(self, doc_key: str, page_number: int, kind: str = 'page') -> Optional[Image.Image]:
+        """Load a cached derivative, or return None on a miss."""
+        path = self._entry_path(doc_key, page_number, kind)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                return img
+        except (FileNotFoundError, OSError):
+            return None
+
+    def put(self, doc_key: str, page_number: int, image: Image.Image, kind: str = 'page') -> str:
+        """Store a derivative and return its path."""
+        path = self._entry_path(doc_key, page_number, kind)
+        with self._atomic_writer(path) as f:
+            image.save(f, format='PNG')
+        return path
+
+    def make_thumbnail(self, image: Image.Image) -> Image.Image:
+        """Downscale a page render to thumbnail size."""
+        thumb = image.copy()
+        thumb.thumbnail(self.thumbnail_size, Image.LANCZOS)
+        return thumb
+
+    def _media_path(self, digest: str, bucket: int, ext: str) -> str:
+        # Keyed by the content of the embedded image, not of the document holding it
+        return os.path.join(self.cache_dir, 'media', digest[:2], f"{digest}-{bucket}.{ext}")
+
+    def get_media(self, digest: str, bucket: int) -> Optional[Image.Image]:
+        """Load a decoded embedded image, or return None on a miss."""
+        for ext in ('jpg', 'png'):
+            try:
+                with Image.open(self._media_path(digest, bucket, ext)) as img:
+                    img.load()
+                    return img
+            except (FileNotFoundError, OSError):
+                continue
+        return None
+
+    def put_media(self, digest: str, bucket: int, image: Image.Image) -> str:
+        """Store a decoded embedded image (JPEG unless it has transparency) and return its path."""
+        ext, fmt = ('png', 'PNG') if image.mode == 'RGBA' else ('jpg', 'JPEG')
+        path = self._media_path(digest, bucket, ext)
+        with self._atomic_writer(path) as f:
+            image.save(f, format=fmt, quality=90)
+        return path
+
+    def get_words(self, doc_key: str, page_number: int) -> Optional[list]:
+        """Load the cached word boxes of a page, or return None on a miss."""
+        try:
+            with open(self._entry_path(doc_key, page_number, 'words', 'json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_words(self, doc_key: str, page_number: int, boxes: list) -> None:
+        """Store the word boxes of a page."""
+        with self._atomic_writer(self._entry_path(doc_key, page_number, 'words', 'json'), mode='w') as f:
+            json.dump(boxes, f)
+
+    def get_meta(self, doc_key: str) -> Optional[dict]:
+        """Load the cached metadata for a document (page count, format...)."""
+        path = os.path.join(self.document_dir(doc_key), 'meta.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put_meta(self, doc_key: str, meta: dict) -> None:
+        """Store metadata for a document."""
+        path = os.path.join(self.document_dir(doc_key), 'meta.json')
+        with self._atomic_writer(path, mode='w') as f:
+            json.dump(meta, f)
+
+    def _atomic_writer(self, path: str, mode: str = 'wb'):
+        """Open a temp file that is renamed over `path` on close.
+
+        Interrupted writes never leave a truncated entry behind, which is what
+        lets batch jobs resume by simply skipping existing entries.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return _AtomicFile(path, mode)
+
+
+class _AtomicFile:
+    def __init__(self, path: str, mode: str):
+        self.path = path
+        fd, self.tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        self.file = os.fdopen(fd, mode)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.unlink(self.tmp_path)
+        return False
@@ -0,0 +1,220 @@
+"""Resource limits for renders of untrusted documents.
+
+Each limited render runs in a forked child process with an address-space cap
+(RLIMIT_AS) and a wall-clock timeout; the parent kills the child when either
+is exceeded. Decoded images are bounded by a pixel budget. Documents that
+blow a limit repeatedly are quarantined and refused without rendering.
+
+Hard memory caps and timeouts need `fork` (Linux/macOS). Where it is not
+available renders run in-process and only the pixel budget is enforced.
+
+Children are forked from a multithreaded server, so locks a render can reach
+are renewed in the child (see fork_safety) and the child records no metrics:
+its spans would die with it, and recording them takes the metric locks.
+"""
+
+import os
+import json
+import time
+import pickle
+import threading
+import multiprocessing
+from typing import Callable, Dict, Optional
+
+from PIL import Image
+
+from metrics import registry as metrics
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_TIMEOUT_S = 30.0
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_MAX_PIXELS = 40_000_000
+DEFAULT_QUARANTINE_AFTER = 3
+
+
+class RenderLimitExceeded(Exception):
+    """A render exceeded its time, memory or pixel budget."""
+
+
+class DocumentQuarantined(RenderLimitExceeded):
+    """The document has exceeded limits too often and is no longer rendered."""
+
+
+def _portable_error(e: BaseException) -> BaseException:
+    """`e` if it survives the pipe to the parent, else a RuntimeError with its type and message.
+
+    Parser errors may hold unpicklable state or take custom constructor
+    arguments, and a failed send would look like the child dying of OOM.
+    """
+    try:
+        pickle.loads(pickle.dumps(e))
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _limited_child(conn, fn: Callable, args: tuple, memory_mb: Optional[int], max_pixels: int):
+    """Child-process entry point: apply limits, render, send the result back."""
+    try:
+        metrics.enabled = False
+        metrics.json_logs = False
+        if memory_mb and resource is not None:
+            limit = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        Image.MAX_IMAGE_PIXELS = max_pixels
+        conn.send(('ok', fn(*args)))
+    except MemoryError:
+        conn.send(('limit', f"memory limit of {memory_mb} MB exceeded"))
+    except Image.DecompressionBombError as e:
+        conn.send(('limit', f"pixel budget exceeded: {e}"))
+    except BaseException as e:
+        conn.send(('error', _portable_error(e)))
+    finally:
+        conn.close()
+
+
+class _PixelBudgets:
+    """`Image.MAX_IMAGE_PIXELS` for in-process renders, which share it.
+
+    Setting and restoring the global around each render would let one render
+    restore the previous value while another is still running; instead the
+    smallest budget of the renders in flight applies, and the original value
+    comes back when the last of them finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Dict[int, int] = {}     # budget -> renders using it
+        self._original = None
+
+    def acquire(self, max_pixels: int) -> None:
+        with self._lock:
+            if not self._active:
+                self._original = Image.MAX_IMAGE_PIXELS
+            self._active[max_pixels] = self._active.get(max_pixels, 0) + 1
+            Image.MAX_IMAGE_PIXELS = min(self._active)
+
+    def release(self, max_pixels: int) -> None:
+        with self._lock:
+            self._active[max_pixels] -= 1
+            if not self._active[max_pixels]:
+                del self._active[max_pixels]
+            Image.MAX_IMAGE_PIXELS = min(self._active) if self._active else self._original
+
+
+_pixel_budgets = _PixelBudgets()
+
+
+class Quarantine:
+    """Persistent strike list of documents that repeatedly exceed limits."""
+
+    def __init__(self, path: Optional[str] = None, strikes_allowed: int = DEFAULT_QUARANTINE_AFTER):
+        self.path = path
+        self.strikes_allowed = strikes_allowed
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+
+    def is_quarantined(self, doc_key: str) -> bool:
+        entry = self._entries.get(doc_key)
+        return entry is not None and entry['strikes'] >= self.strikes_allowed
+
+    def record_strike(self, doc_key: str, reason: str):
+        """Count one limit violation against a document."""
+        with self._lock:
+            entry = self._entries.setdefault(doc_key, {'strikes': 0})
+            entry['strikes'] += 1
+            entry['last_reason'] = reason
+            entry['last_seen'] = round(time.time(), 3)
+            self._save()
+
+    def release(self, doc_key: str):
+        """Remove a document from the quarantine list."""
+        with self._lock:
+            self._entries.pop(doc_key, None)
+            self._save()
+
+    def entries(self) -> Dict[str, dict]:
+        return dict(self._entries)
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class RenderLimits:
+    """Per-render wall-clock, memory and pixel budgets plus quarantine."""
+
+    def __init__(self, timeout_s: float = DEFAULT_TIMEOUT_S, memory_mb: Optional[int] = DEFAULT_MEMORY_MB,
+                 max_pixels: int = DEFAULT_MAX_PIXELS, quarantine: Optional[Quarantine] = None):
+        self.timeout_s = timeout_s
+        self.memory_mb = memory_mb
+        self.max_pixels = max_pixels
+        self.quarantine = quarantine or Quarantine()
+        self.can_isolate = 'fork' in multiprocessing.get_all_start_methods()
+
+    @classmethod
+    def from_env(cls) -> 'RenderLimits':
+        """Build limits from DOCPREVIEW_RENDER_* variables (defaults otherwise)."""
+        return cls(
+            timeout_s=float(os.environ.get('DOCPREVIEW_RENDER_TIMEOUT_S', DEFAULT_TIMEOUT_S)),
+            memory_mb=int(os.environ.get('DOCPREVIEW_RENDER_MEMORY_MB', DEFAULT_MEMORY_MB)) or None,
+            max_pixels=int(os.environ.get('DOCPREVIEW_RENDER_MAX_PIXELS', DEFAULT_MAX_PIXELS)),
+            quarantine=Quarantine(os.environ.get('DOCPREVIEW_QUARANTINE_FILE')),
+        )
+
+    def run(self, doc_key: str, fn: Callable, *args):
+        """Run `fn(*args)` under the limits, recording strikes on violations."""
+        if self.quarantine.is_quarantined(doc_key):
+            raise DocumentQuarantined("document is quarantined after repeatedly exceeding render limits")
+        try:
+            return self._run_isolated(fn, args) if self.can_isolate else self._run_inline(fn, args)
+        except RenderLimitExceeded as e:
+            self.quarantine.record_strike(doc_key, str(e))
+            raise
+
+    def _run_inline(self, fn: Callable, args: tuple):
+        _pixel_budgets.acquire(self.max_pixels)
+        try:
+            return fn(*args)
+        except Image.DecompressionBombError as e:
+            raise RenderLimitExceeded(f"pixel budget exceeded: {e}")
+        finally:
+            _pixel_budgets.release(self.max_pixels)
+
+    def _run_isolated(self, fn: Callable, args: tuple):
+        context = multiprocessing.get_context('fork')
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_limited_child,
+                                  args=(child_conn, fn, args, self.memory_mb, self.max_pixels), daemon=True)
+        process.start()
+        child_conn.close()
+        try:
+            if not parent_conn.poll(self.timeout_s):
+                raise RenderLimitExceeded(f"render timed out after {self.timeout_s:g}s")
+            try:
+                status, payload = parent_conn.recv()
+            except EOFError:
+                # Killed without reporting back, typically by the OOM killer
+                raise RenderLimitExceeded("render process died (likely out of memory)")
+        finally:
+            if process.is_alive():
+                process.kill()
+            process.join()
+            parent_conn.close()
+
+        if status == 'ok':
+            return payload
+        if status == 'limit':
+            raise RenderLimitExceeded(payload)
+        raise payload
@@ -0,0 +1,147 @@
+"""Choosing between server-side and client-side rendering per document and device.
+
+The JS viewers can render a document in the browser (PDF.js, Mammoth, JSZip)
+or show page images rendered here by DocumentPreviewer. Client rendering
+costs the server nothing, but downloads the whole file and needs memory and
+CPU on the device. Server rendering sends only the pages looked at, as
+images, at the cost of render work on the server.
+
+`RenderModePolicy.decide` picks one per document open from:
+
+- the document: its size, and how much memory its format takes once parsed
+  in a browser (a DOCX becomes a DOM many times its zipped size);
+- the client: Device-Memory, ECT, Downlink, Save-Data and Sec-CH-UA-Mobile
+  client hints, or the same values sent by the viewer from
+  navigator.deviceMemory / navigator.connection where browsers lack them;
+- the server: the render queue depth. A busy server hands files to clients
+  that merely prefer page images, but not to those that cannot cope.
+
+Every decision is counted in `docpreview_render_mode_decisions_total`, with
+bytes sent and viewer-reported display times per mode alongside, so the two
+paths can be compared.
+
+Environment variables:
+    DOCPREVIEW_RENDER_MODE=auto|server|client   force one mode (default auto)
+    DOCPREVIEW_CLIENT_MAX_MB=N                  larger files always render on the server
+    DOCPREVIEW_SERVER_BUSY_QUEUE=N              queued renders at which the server counts as busy
+"""
+
+import os
+from typing import Mapping, Optional, Tuple
+
+from metrics import registry as metrics
+
+SERVER = 'server'
+CLIENT = 'client'
+
+# Formats the server can send as page images. Sheets are always shown in the
+# client grid, which reads them window by window (see sheet_windows.py).
+SERVER_FORMATS = ('.pdf', '.docx', '.pptx')
+
+# Rough browser memory per byte of file once parsed and laid out
+PARSED_EXPANSION = {'.pdf': 3, '.docx': 12, '.pptx': 6, '.xlsx': 20}
+# Share of the device's memory one document may take
+DEVICE_MEMORY_SHARE = 0.1
+# Assumed for mobiles that do not report their memory (GB)
+MOBILE_MEMORY_GB = 2.0
+
+DEFAULT_CLIENT_MAX_MB = 50
+# Files this small cost less to send whole than a page image
+SMALL_FILE_BYTES = 256 * 1024
+SLOW_CONNECTIONS = ('slow-2g', '2g')
+SLOW_DOWNLINK_MBPS = 1.0
+DEFAULT_SERVER_BUSY_QUEUE = 32
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _flag(value) -> bool:
+    return str(value or '').strip().strip('"').lower() in ('1', 'true', 'on', '?1')
+
+
+class ClientHints:
+    """What a browser reported about its device and network; None where unknown."""
+
+    def __init__(self, device_memory_gb: Optional[float] = None, downlink_mbps: Optional[float] = None,
+                 effective_type: Optional[str] = None, save_data: bool = False, mobile: bool = False):
+        self.device_memory_gb = device_memory_gb
+        self.downlink_mbps = downlink_mbps
+        self.effective_type = effective_type
+        self.save_data = save_data
+        self.mobile = mobile
+
+    @classmethod
+    def from_request(cls, headers: Mapping[str, str], args: Mapping[str, str]) -> 'ClientHints':
+        """Read client hint headers, overridden by the viewer's query parameters
+        (memory, downlink, ect, save_data, mobile)."""
+        return cls(
+            device_memory_gb=_float(args.get('memory') or headers.get('Sec-CH-Device-Memory') or headers.get('Device-Memory')),
+            downlink_mbps=_float(args.get('downlink') or headers.get('Downlink')),
+            effective_type=(args.get('ect') or headers.get('ECT') or '').lower() or None,
+            save_data=_flag(args.get('save_data')) or headers.get('Save-Data', '').lower() == 'on',
+            mobile=_flag(args.get('mobile') or headers.get('Sec-CH-UA-Mobile')),
+        )
+
+    @property
+    def slow_network(self) -> bool:
+        return (self.save_data or self.effective_type in SLOW_CONNECTIONS
+                or (self.downlink_mbps is not None and self.downlink_mbps < SLOW_DOWNLINK_MBPS))
+
+
+class RenderModePolicy:
+    """Decides whether a document is rendered on the server or in the browser."""
+
+    # Client hints to request from browsers (the Accept-CH response header)
+    ACCEPT_CH = 'Sec-CH-Device-Memory, Device-Memory, Downlink, ECT, Save-Data, Sec-CH-UA-Mobile'
+
+    def __init__(self, force: Optional[str] = None, client_max_bytes: int = DEFAULT_CLIENT_MAX_MB * 1024 * 1024,
+                 server_busy_queue: int = DEFAULT_SERVER_BUSY_QUEUE):
+        self.force = force if force in (SERVER, CLIENT) else None
+        self.client_max_bytes = client_max_bytes
+        self.server_busy_queue = server_busy_queue
+
+    @classmethod
+    def from_env(cls) -> 'RenderModePolicy':
+        """Build the policy from DOCPREVIEW_* variables (defaults otherwise)."""
+        return cls(
+            force=os.environ.get('DOCPREVIEW_RENDER_MODE', 'auto').lower(),
+            client_max_bytes=int(float(os.environ.get('DOCPREVIEW_CLIENT_MAX_MB', DEFAULT_CLIENT_MAX_MB)) * 1024 * 1024),
+            server_busy_queue=int(os.environ.get('DOCPREVIEW_SERVER_BUSY_QUEUE', DEFAULT_SERVER_BUSY_QUEUE)),
+        )
+
+    def decide(self, file_path: str, hints: ClientHints, queue_depth: int = 0) -> Tuple[str, str]:
+        """(mode, reason) for showing `file_path` to the client described by `hints`."""
+        _, ext = os.path.splitext(file_path.lower())
+        mode, reason = self._decide(ext, os.path.getsize(file_path), hints, queue_depth)
+        metrics.inc(metrics.render_mode_decisions, mode=mode, reason=reason, format=ext)
+        metrics.log_event('render_mode', file=os.path.basename(file_path), format=ext, mode=mode, reason=reason,
+                          device_memory_gb=hints.device_memory_gb, effective_type=hints.effective_type,
+                          queue_depth=queue_depth)
+        return mode, reason
+
+    def _decide(self, ext: str, size: int, hints: ClientHints, queue_depth: int) -> Tuple[str, str]:
+        if ext not in SERVER_FORMATS:
+            return CLIENT, 'format'
+        if self.force:
+            return self.force, 'forced'
+        if size <= SMALL_FILE_BYTES:
+            return CLIENT, 'small_file'
+
+        # The client cannot reasonably hold the document: render here however busy we are
+        if size > self.client_max_bytes:
+            return SERVER, 'large_file'
+        memory_gb = hints.device_memory_gb or (MOBILE_MEMORY_GB if hints.mobile else None)
+        if memory_gb is not None and size * PARSED_EXPANSION.get(ext, 1) > memory_gb * 1024 ** 3 * DEVICE_MEMORY_SHARE:
+            return SERVER, 'device_memory'
+
+        # The client would rather not download the file: only worth it while we have capacity
+        if hints.slow_network:
+            if queue_depth >= self.server_busy_queue:
+                return CLIENT, 'server_busy'
+            return SERVER, 'slow_network'
+        return CLIENT, 'capable_client'
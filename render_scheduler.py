@@ -0,0 +1,227 @@
+"""Priority scheduling and admission control for render work.
+
+Render jobs are queued per priority class and executed by a fixed pool of
+worker threads:
+
+    VISIBLE   the page a user is looking at right now
+    PREFETCH  neighbours of the visible page
+    THUMBNAIL navigation thumbnails
+    WARMUP    batch/background cache warm-up
+
+Workers always take the most urgent runnable job. On top of that:
+
+- each user may only have `per_user_limit` jobs running at once;
+- background classes (THUMBNAIL, WARMUP) may only occupy
+  `workers - reserved_interactive` workers, so interactive requests always
+  find a free worker;
+- every job has a deadline; jobs still queued past it are dropped;
+- a job submitted with `replaces=key` supersedes queued jobs with the same
+  key (e.g. a user flipping quickly through pages only needs the last one);
+- queues are bounded per class and reject new work when full.
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Callable, Deque, Dict, Hashable, Optional
+
+from metrics import registry as metrics
+
+
+class Priority(IntEnum):
+    VISIBLE = 0
+    PREFETCH = 1
+    THUMBNAIL = 2
+    WARMUP = 3
+
+
+BACKGROUND = (Priority.THUMBNAIL, Priority.WARMUP)
+
+# Seconds a job may wait in the queue before it is considered stale
+DEFAULT_DEADLINES: Dict[Priority, Optional[float]] = {
+    Priority.VISIBLE: 30.0,
+    Priority.PREFETCH: 10.0,
+    Priority.THUMBNAIL: 60.0,
+    Priority.WARMUP: None,
+}
+
+DEFAULT_MAX_QUEUE: Dict[Priority, int] = {
+    Priority.VISIBLE: 256,
+    Priority.PREFETCH: 512,
+    Priority.THUMBNAIL: 2048,
+    Priority.WARMUP: 100000,
+}
+
+
+class SchedulerRejected(Exception):
+    """Raised through a job's future when it is rejected or dropped."""
+
+
+class _Job:
+    __slots__ = ('fn', 'args', 'kwargs', 'priority', 'user', 'deadline', 'replaces', 'future', 'enqueued')
+
+    def __init__(self, fn, args, kwargs, priority, user, deadline, replaces):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.user = user
+        self.deadline = deadline
+        self.replaces = replaces
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+
+class RenderScheduler:
+    """Runs render jobs by priority with per-user caps and deadlines."""
+
+    def __init__(self, workers: int = 4, per_user_limit: int = 2, reserved_interactive: int = 1,
+                 deadlines: Optional[Dict[Priority, Optional[float]]] = None,
+                 max_queue: Optional[Dict[Priority, int]] = None):
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.background_limit = max(1, workers - reserved_interactive)
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self.max_queue = {**DEFAULT_MAX_QUEUE, **(max_queue or {})}
+
+        self._queues: Dict[Priority, Deque[_Job]] = {p: deque() for p in Priority}
+        self._running_by_user: Dict[Hashable, int] = {}
+        self._running_background = 0
+        self._running = {p: 0 for p in Priority}
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._queue_depth = metrics.gauge('docpreview_queue_depth', 'Queued render jobs per priority')
+        self._running_gauge = metrics.gauge('docpreview_running_jobs', 'Running render jobs per priority')
+        self._dropped = metrics.counter('docpreview_jobs_dropped_total', 'Render jobs dropped or rejected')
+        self._queue_wait = metrics.histogram('docpreview_queue_wait_seconds', 'Time render jobs spend queued')
+
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"render-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn: Callable, *args, priority: Priority = Priority.VISIBLE,
+               user: Optional[Hashable] = None, deadline: Optional[float] = None,
+               replaces: Optional[Hashable] = None, **kwargs) -> Future:
+        """Queue `fn(*args, **kwargs)` and return a Future for its result.
+
+        `deadline` is a queueing budget in seconds (defaults per priority).
+        """
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        job = _Job(fn, args, kwargs, priority, user, None, replaces)
+        if deadline is not None:
+            job.deadline = job.enqueued + deadline
+
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("RenderScheduler has been shut down")
+            queue = self._queues[priority]
+            if replaces is not None:
+                self._drop_matching(queue, replaces)
+            if len(queue) >= self.max_queue[priority]:
+                self._reject(job, 'queue_full')
+                return job.future
+            queue.append(job)
+            self._update_gauges()
+            self._cond.notify()
+        return job.future
+
+    def queue_depths(self) -> Dict[str, int]:
+        """Current number of queued jobs per priority class."""
+        with self._cond:
+            return {p.name.lower(): len(q) for p, q in self._queues.items()}
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers; queued jobs are cancelled."""
+        with self._cond:
+            self._shutdown = True
+            for queue in self._queues.values():
+                while queue:
+                    queue.popleft().future.cancel()
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _drop_matching(self, queue: Deque[_Job], replaces: Hashable):
+        stale = [job for job in queue if job.replaces == replaces]
+        for job in stale:
+            queue.remove(job)
+            self._reject(job, 'superseded')
+
+    def _reject(self, job: _Job, reason: str):
+        metrics.inc(self._dropped, priority=job.priority.name.lower(), reason=reason)
+        if job.future.set_running_or_notify_cancel():
+            job.future.set_exception(SchedulerRejected(f"{job.priority.name.lower()} job {reason}"))
+
+    def _next_job(self) -> Optional[_Job]:
+        """Pop the most urgent runnable job (caller holds the lock)."""
+        now = time.monotonic()
+        for priority in Priority:
+            if priority in BACKGROUND and self._running_background >= self.background_limit:
+                continue
+            queue = self._queues[priority]
+            for job in list(queue):
+                if job.future.cancelled():
+                    queue.remove(job)
+                    continue
+                if job.deadline is not None and now > job.deadline:
+                    queue.remove(job)
+                    self._reject(job, 'deadline')
+                    continue
+                if job.user is not None and self._running_by_user.get(job.user, 0) >= self.per_user_limit:
+                    continue
+                queue.remove(job)
+                return job
+        return None
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = None
+                while not self._shutdown:
+                    job = self._next_job()
+                    if job is not None:
+                        break
+                    # Wake up periodically so expired jobs are dropped promptly
+                    self._cond.wait(timeout=1.0)
+                if job is None:
+                    return
+                self._mark_running(job, 1)
+
+            metrics.observe(self._queue_wait, time.monotonic() - job.enqueued, priority=job.priority.name.lower())
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.fn(*job.args, **job.kwargs))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._mark_running(job, -1)
+                    self._cond.notify_all()
+
+    def _mark_running(self, job: _Job, delta: int):
+        self._running[job.priority] += delta
+        if job.priority in BACKGROUND:
+            self._running_background += delta
+        if job.user is not None:
+            count = self._running_by_user.get(job.user, 0) + delta
+            if count:
+                self._running_by_user[job.user] = count
+            else:
+                self._running_by_user.pop(job.user, None)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        if not metrics.enabled:
+            return
+        for priority, queue in self._queues.items():
+            self._queue_depth.set(len(queue), priority=priority.name.lower())
+            self._running_gauge.set(self._running[priority], priority=priority.name.lower())
@@ -0,0 +1,191 @@
+"""Per-page full-text extraction and search.
+
+Text is extracted page by page for every supported format and stored in a
+SQLite FTS5 index, so a query returns (document, page) hits ranked by BM25
+in a few milliseconds even across thousands of documents.
+
+Page numbering matches DocumentPreviewer: PDF pages, DOCX paragraph chunks,
+PPTX slides and XLSX sheets.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from typing import List, Optional, Sequence
+
+from pypdf import PdfReader
+from docx import Document
+from pptx import Presentation
+import openpyxl
+
+from document_previewer import DocumentPreviewer
+
+# Bound the text pulled out of huge sheets; search only needs the words
+MAX_CELLS_PER_SHEET = 200_000
+
+
+def extract_pdf_pages(file_path: str) -> List[str]:
+    return [page.extract_text() or '' for page in PdfReader(file_path).pages]
+
+
+def extract_docx_pages(file_path: str) -> List[str]:
+    paragraphs = [p.text for p in Document(file_path).paragraphs]
+    per_page = DocumentPreviewer.DOCX_PARAGRAPHS_PER_PAGE
+    return ['\n'.join(paragraphs[i:i + per_page]) for i in range(0, len(paragraphs), per_page)] or ['']
+
+
+def extract_pptx_pages(file_path: str) -> List[str]:
+    pages = []
+    for slide in Presentation(file_path).slides:
+        texts = [shape.text for shape in slide.shapes if hasattr(shape, "text") and shape.text.strip()]
+        pages.append('\n'.join(texts))
+    return pages
+
+
+def extract_xlsx_pages(file_path: str) -> List[str]:
+    wb = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        pages = []
+        for ws in wb.worksheets:
+            values = []
+            for row in ws.iter_rows(values_only=True):
+                values.extend(str(value) for value in row if value is not None)
+                if len(values) >= MAX_CELLS_PER_SHEET:
+                    break
+            pages.append(' '.join(values))
+        return pages
+    finally:
+        wb.close()
+
+
+EXTRACTORS = {
+    '.pdf': extract_pdf_pages,
+    '.docx': extract_docx_pages,
+    '.pptx': extract_pptx_pages,
+    '.xlsx': extract_xlsx_pages,
+}
+
+
+def extract_pages(file_path: str) -> List[str]:
+    """Extract the text of every page/slide/sheet of a document."""
+    _, ext = os.path.splitext(file_path.lower())
+    extractor = EXTRACTORS.get(ext)
+    return extractor(file_path) if extractor else []
+
+
+def query_terms(query: str) -> List[str]:
+    """Split a query into lowercase word terms (also used for highlighting)."""
+    return re.findall(r'\w+', query.lower())
+
+
+def to_fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every term must match.
+
+    Terms are quoted so user input can never be parsed as FTS5 syntax. No
+    prefix matching: short prefixes expand to thousands of terms and would
+    blow the latency budget on large indexes.
+    """
+    return ' '.join('"' + term + '"' for term in query_terms(query))
+
+
+class SearchIndex:
+    """SQLite FTS5 inverted index of document pages."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            doc_key TEXT PRIMARY KEY,
+            name TEXT,
+            page_count INTEGER,
+            indexed_at REAL
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS pages USING fts5(
+            body,
+            doc_key UNINDEXED,
+            page UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers run alongside the indexer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def is_indexed(self, doc_key: str) -> bool:
+        row = self._connection().execute(
+            'SELECT 1 FROM documents WHERE doc_key = ?', (doc_key,)).fetchone()
+        return row is not None
+
+    def index_document(self, file_path: str, doc_key: str, name: Optional[str] = None,
+                       page_count: Optional[int] = None, pages: Optional[Sequence[str]] = None) -> int:
+        """Index every page of a document; returns pages indexed.
+        
+        Page texts are extracted from `file_path` unless already given in `pages`.
+        """
+        if self.is_indexed(doc_key):
+            return 0
+        if pages is None:
+            pages = extract_pages(file_path)
+        if page_count is not None:
+            # Only index pages the viewer can actually navigate to
+            pages = pages[:page_count]
+
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM pages WHERE doc_key = ?', (doc_key,))
+                conn.executemany(
+                    'INSERT INTO pages (body, doc_key, page) VALUES (?, ?, ?)',
+                    [(text, doc_key, number) for number, text in enumerate(pages, start=1) if text.strip()])
+                conn.execute(
+                    'INSERT OR REPLACE INTO documents (doc_key, name, page_count, indexed_at) VALUES (?, ?, ?, ?)',
+                    (doc_key, name or os.path.basename(file_path), len(pages), time.time()))
+        return len(pages)
+
+    def remove_document(self, doc_key: str):
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM pages WHERE doc_key = ?', (doc_key,))
+                conn.execute('DELETE FROM documents WHERE doc_key = ?', (doc_key,))
+
+    def search(self, query: str, doc_key: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Return matching pages, best first, with a highlighted snippet."""
+        fts_query = to_fts_query(query)
+        if not fts_query:
+            return []
+        sql = """
+            SELECT pages.doc_key, documents.name, pages.page,
+                   snippet(pages, 0, '[', ']', ' … ', 12) AS snippet,
+                   bm25(pages) AS rank
+            FROM pages JOIN documents ON documents.doc_key = pages.doc_key
+            WHERE pages MATCH ?
+        """
+        params: list = [fts_query]
+        if doc_key is not None:
+            sql += ' AND pages.doc_key = ?'
+            params.append(doc_key)
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit)
+
+        rows = self._connection().execute(sql, params).fetchall()
+        return [
+            {'doc_key': row[0], 'name': row[1], 'page': int(row[2]), 'snippet': row[3], 'rank': row[4]}
+            for row in rows
+        ]
@@ -0,0 +1,228 @@
+"""Random access to spreadsheet cells for the client-side grid.
+
+The first request for a sheet streams it once with openpyxl's read-only
+reader and writes every row as a line of JSON, plus a row-offset index: the
+byte offset of every INDEX_STRIDE-th row. A window request then seeks to the
+nearest indexed row and decodes only the rows it needs, so a client can
+scroll through a 100 MB workbook while only the visible cells cross the wire.
+
+The files live next to the document's other derivatives in the render cache,
+so the index is built once per workbook content, not once per process.
+
+Workbooks are untrusted input: given RenderLimits, every parse (sheet names
+and index builds) runs in a limited child process, like page renders.
+"""
+
+import os
+import json
+import datetime
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+import openpyxl
+
+from metrics import registry as metrics
+from render_cache import RenderCache
+from render_limits import RenderLimits
+from singleflight import SingleFlight
+
+INDEX_STRIDE = 128
+MAX_WINDOW_ROWS = 1000
+MAX_WINDOW_COLS = 200
+# Row-offset indexes kept in memory; each is 8 bytes per INDEX_STRIDE rows
+MAX_LOADED_INDEXES = 32
+
+
+def _json_value(value):
+    """Cell value as a JSON-friendly primitive (dates become ISO 8601 strings)."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+class SheetIndex:
+    """Row file and row-offset index of one sheet."""
+
+    def __init__(self, rows_path: str, meta: dict, offsets: array):
+        self.rows_path = rows_path
+        self.meta = meta
+        self.offsets = offsets
+
+    def read_rows(self, row_start: int, row_end: int) -> List[list]:
+        """Decode rows [row_start, row_end) (0-based)."""
+        row_end = min(row_end, self.meta['rows'])
+        if row_start >= row_end:
+            return []
+        block = row_start // INDEX_STRIDE
+        rows = []
+        with open(self.rows_path, 'rb') as f:
+            f.seek(self.offsets[block])
+            for _ in range(row_start - block * INDEX_STRIDE):
+                f.readline()
+            for _ in range(row_end - row_start):
+                rows.append(json.loads(f.readline()))
+        return rows
+
+
+class SheetWindows:
+    """Serves rectangular cell windows of workbook sheets.
+
+    Cells are encoded compactly: a plain JSON value, or `[value, format]`
+    where `format` indexes the sheet's list of number formats when the cell
+    is not "General". Trailing empty cells of a row are omitted.
+    """
+
+    def __init__(self, cache: RenderCache, limits: Optional[RenderLimits] = None):
+        self.cache = cache
+        self.limits = limits
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._indexes: 'OrderedDict[tuple, SheetIndex]' = OrderedDict()
+
+    def sheet_names(self, file_path: str) -> List[str]:
+        """Names of the sheets in a workbook, in order."""
+        return self._run_limited(self.cache.document_key(file_path), self._read_sheet_names, file_path)
+
+    def sheet_info(self, file_path: str, sheet_number: int) -> dict:
+        """Name, row and column counts and number formats of a sheet (1-based)."""
+        return dict(self._index(file_path, sheet_number).meta)
+
+    def window(self, file_path: str, sheet_number: int, row_start: int, row_end: int,
+               col_start: int = 0, col_end: int = MAX_WINDOW_COLS) -> dict:
+        """Cells of rows [row_start, row_end) and columns [col_start, col_end), 0-based.
+
+        Windows larger than MAX_WINDOW_ROWS x MAX_WINDOW_COLS are clipped.
+        """
+        index = self._index(file_path, sheet_number)
+        row_start, col_start = max(row_start, 0), max(col_start, 0)
+        row_end = min(row_end, row_start + MAX_WINDOW_ROWS)
+        col_end = min(col_end, col_start + MAX_WINDOW_COLS)
+        rows = index.read_rows(row_start, row_end)
+        return {
+            'row_start': row_start,
+            'col_start': col_start,
+            'rows': index.meta['rows'],
+            'cols': index.meta['cols'],
+            'formats': index.meta['formats'],
+            'cells': [row[col_start:col_end] for row in rows],
+        }
+
+    def _paths(self, doc_key: str, sheet_number: int) -> tuple:
+        base = os.path.join(self.cache.document_dir(doc_key), f"sheet-{sheet_number:05d}")
+        return base + '.rows', base + '.idx', base + '.json'
+
+    def _index(self, file_path: str, sheet_number: int) -> SheetIndex:
+        doc_key = self.cache.document_key(file_path)
+        key = (doc_key, sheet_number)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = self._load(doc_key, sheet_number)
+        if index is None:
+            # Concurrent first requests for a sheet share one build
+            index = self._flight.do(key, self._run_limited, doc_key, self._build, file_path, doc_key, sheet_number)
+
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > MAX_LOADED_INDEXES:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _run_limited(self, doc_key: str, fn, *args):
+        """Run a parse of the workbook under the render limits, if any."""
+        if self.limits is None:
+            return fn(*args)
+        return self.limits.run(doc_key, fn, *args)
+
+    @staticmethod
+    def _read_sheet_names(file_path: str) -> List[str]:
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            return list(wb.sheetnames)
+        finally:
+            wb.close()
+
+    def _load(self, doc_key: str, sheet_number: int) -> Optional[SheetIndex]:
+        rows_path, idx_path, meta_path = self._paths(doc_key, sheet_number)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            offsets = array('Q')
+            with open(idx_path, 'rb') as f:
+                offsets.frombytes(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        return SheetIndex(rows_path, meta, offsets)
+
+    def _build(self, file_path: str, doc_key: str, sheet_number: int) -> SheetIndex:
+        """Stream the sheet once, writing the row file, the offset index and the metadata."""
+        rows_path, idx_path, meta_path = self._paths(doc_key, sheet_number)
+        directory = os.path.dirname(rows_path)
+        os.makedirs(directory, exist_ok=True)
+
+        wb = openpyxl.load_workbook(file_path, read_only=True)
+        try:
+            if not 1 <= sheet_number <= len(wb.worksheets):
+                raise IndexError(f"Sheet {sheet_number} does not exist")
+            ws = wb.worksheets[sheet_number - 1]
+            formats = {}
+            offsets = array('Q')
+            row_count = col_count = 0
+
+            with metrics.span('sheet_index'):
+                fd, tmp_rows = tempfile.mkstemp(dir=directory, suffix='.rows')
+                try:
+                    with os.fdopen(fd, 'wb') as out:
+                        for row_number, row in enumerate(ws.iter_rows()):
+                            if row_number % INDEX_STRIDE == 0:
+                                offsets.append(out.tell())
+                            cells = []
+                            for cell in row:
+                                value = _json_value(cell.value)
+                                number_format = cell.number_format
+                                if value is not None and number_format and number_format != 'General':
+                                    value = [value, formats.setdefault(number_format, len(formats))]
+                                cells.append(value)
+                            while cells and cells[-1] is None:
+                                cells.pop()
+                            if cells:
+                                row_count = row_number + 1
+                                col_count = max(col_count, len(cells))
+                            out.write(json.dumps(cells, separators=(',', ':')).encode('utf-8'))
+                            out.write(b'\n')
+                    os.replace(tmp_rows, rows_path)
+                finally:
+                    if os.path.exists(tmp_rows):
+                        os.unlink(tmp_rows)
+
+            meta = {
+                'name': ws.title,
+                'rows': row_count,
+                'cols': col_count,
+                'formats': sorted(formats, key=formats.get),
+            }
+        finally:
+            wb.close()
+
+        self._write_atomic(idx_path, offsets.tobytes())
+        # Written last: its presence marks a complete index
+        self._write_atomic(meta_path, json.dumps(meta).encode('utf-8'))
+        return SheetIndex(rows_path, meta, offsets)
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
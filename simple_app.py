@@ -1,6 +1,8 @@
 import gradio as gr
 import os
 from document_previewer import DocumentPreviewer
+from metrics import maybe_start_metrics_server
+from page_navigator import navigator_html, add_page_jump, blocks_kwargs, launch_kwargs
 
 # Initialize the previewer
 previewer = DocumentPreviewer()
@@ -52,10 +54,10 @@ def navigate_to_page(page_number):
     global current_page
     
     if not current_file:
-        return None, "No document loaded.", ""
+        return None, "No document loaded.", "", gr.update()
     
     if page_number < 1 or page_number > total_pages:
-        return None, f"Invalid page number. Please enter a number between 1 and {total_pages}.", ""
+        return None, f"Invalid page number. Please enter a number between 1 and {total_pages}.", "", gr.update()
     
     current_page = int(page_number)
     preview_image = previewer.preview_page(current_file, current_page)
@@ -63,72 +65,19 @@ def navigate_to_page(page_number):
     file_name = os.path.basename(current_file)
     nav_info = f"📄 {file_name} | Page {current_page} of {total_pages}"
     
-    return preview_image, f"Navigated to page {current_page}", nav_info
+    # Re-sent so the panel highlights the page shown
+    return preview_image, f"Navigated to page {current_page}", nav_info, gr.update(value=generate_page_links())
 
 def generate_page_links():
     if not current_file or total_pages == 0:
         return ""
     
-    html = f"""
-    <div style="padding: 15px; background-color: #f8f9fa; border-radius: 8px; margin: 10px 0;">
-        <h3 style="margin-top: 0; color: #333;">Quick Navigation</h3>
-        <p style="margin-bottom: 15px; color: #666;">Click on any page number to jump directly to it:</p>
-        <div style="display: flex; flex-wrap: wrap; gap: 8px;">
-    """
-    
-    for i in range(1, total_pages + 1):
-        if i == current_page:
-            # Current page - highlighted
-            html += f"""
-            <span style="
-                padding: 8px 12px; 
-                background-color: #007bff; 
-                color: white; 
-                border-radius: 4px; 
-                font-weight: bold;
-                min-width: 40px;
-                text-align: center;
-                display: inline-block;
-            ">Page {i}</span>
-            """
-        else:
-            # Other pages - clickable buttons
-            html += f"""
-            <button onclick="
-                document.querySelector('input[placeholder=\\"Enter page number\\"]').value = '{i}';
-                document.querySelector('input[placeholder=\\"Enter page number\\"]').dispatchEvent(new Event('input'));
-                setTimeout(() => {{
-                    const buttons = document.querySelectorAll('button');
-                    for(let btn of buttons) {{
-                        if(btn.textContent.trim() === 'Go to Page') {{
-                            btn.click();
-                            break;
-                        }}
-                    }}
-                }}, 100);
-            " style="
-                padding: 8px 12px; 
-                background-color: #e9ecef; 
-                color: #495057; 
-                border: 1px solid #ced4da; 
-                border-radius: 4px; 
-                cursor: pointer;
-                min-width: 40px;
-                text-align: center;
-                transition: all 0.2s;
-            " onmouseover="this.style.backgroundColor='#dee2e6'" 
-               onmouseout="this.style.backgroundColor='#e9ecef'">Page {i}</button>
-            """
-    
-    html += """
-        </div>
-    </div>
-    """
-    
-    return html
+    # The buttons themselves are built client-side, only for the visible range
+    return navigator_html(total_pages, current_page, "Page",
+                          tip="Click on any page number to jump directly to it.")
 
 # Create the Gradio interface
-with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft()) as demo:
+with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft(), **blocks_kwargs()) as demo:
     gr.Markdown("# 📄 Document Previewer")
     gr.Markdown("Select a sample document to preview its contents. Click on page numbers to navigate!")
     
@@ -174,6 +123,8 @@ with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft()) as demo:
     
     # Page navigation links
     page_links = gr.HTML(visible=False)
+    # Clicks in the navigation panel send the page number as one event
+    add_page_jump(navigate_to_page, [preview_image, status_msg, nav_info, page_links])
     
     # Event handlers
     sample_dropdown.change(
@@ -183,11 +134,12 @@ with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft()) as demo:
     )
     
     go_btn.click(
-        fn=lambda x: navigate_to_page(x) if x else (None, "Please enter a page number", ""),
+        fn=lambda x: navigate_to_page(x) if x else (None, "Please enter a page number", "", gr.update()),
         inputs=[page_input],
-        outputs=[preview_image, status_msg, nav_info]
+        outputs=[preview_image, status_msg, nav_info, page_links]
     )
 
 if __name__ == "__main__":
-    demo.launch(server_name="0.0.0.0", server_port=7861, share=False)
+    maybe_start_metrics_server()
+    demo.launch(server_name="0.0.0.0", server_port=7861, share=False, **launch_kwargs())
 
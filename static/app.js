@@ -111,6 +111,11 @@ class DocumentPreviewer {
         
         this.currentDocument = url;
         this.documentType = fileExtension;
+        // Drop the previous PDF's cached pages and stop any render still in flight
+        if (this.pdfView) {
+            this.pdfView.destroy();
+            this.pdfView = null;
+        }
         this.currentPage = 1;
         
         switch (fileExtension) {
@@ -139,8 +144,9 @@ class DocumentPreviewer {
     
     async loadPDF(url) {
         try {
-            this.pdfDoc = await pdfjsLib.getDocument(url).promise;
+            this.pdfDoc = await pdfjsLib.getDocument({ url, worker: PdfPageView.worker() }).promise;
             this.totalPages = this.pdfDoc.numPages;
+            this.pdfView = new PdfPageView(this.pdfDoc, document.getElementById('viewerContainer'));
             await this.renderPDFPage(1);
         } catch (error) {
             throw new Error('Failed to load PDF: ' + error.message);
@@ -149,30 +155,10 @@ class DocumentPreviewer {
     
     async renderPDFPage(pageNum) {
         try {
-            const page = await this.pdfDoc.getPage(pageNum);
-            const scale = 1.5;
-            const viewport = page.getViewport({ scale });
-            
-            // Create canvas
-            const canvas = document.createElement('canvas');
-            const context = canvas.getContext('2d');
-            canvas.height = viewport.height;
-            canvas.width = viewport.width;
-            canvas.className = 'pdf-canvas';
-            
-            // Render page
-            await page.render({
-                canvasContext: context,
-                viewport: viewport
-            }).promise;
-            
-            // Update viewer
-            const container = document.getElementById('viewerContainer');
-            container.innerHTML = '';
-            container.appendChild(canvas);
-            
-            this.currentPage = pageNum;
-            
+            // Cached pages show immediately; a render still running for another page is cancelled
+            if (await this.pdfView.show(pageNum)) {
+                this.currentPage = pageNum;
+            }
         } catch (error) {
             throw new Error('Failed to render PDF page: ' + error.message);
         }
@@ -0,0 +1,135 @@
+// On-demand loading of the viewers' scripts and stylesheets
+//
+// Each document format's libraries are loaded the first time a document of
+// that format is opened (AssetLoader.loadFormat('xlsx')), so opening a PDF
+// never downloads SheetJS. Names are resolved through the manifest written
+// by `python assets.py build` (window.ASSET_MANIFEST, from
+// static/dist/manifest.js or inlined by the server) to self-hosted,
+// content-hashed files. Without a build, our own files come from static/ and
+// third-party libraries from their CDN, which is also the fallback when a
+// self-hosted copy fails to load. CDN URLs come with the manifest
+// (window.ASSET_CDN), generated from the pinned versions in assets.py.
+
+class AssetLoader {
+    static MANIFEST = window.ASSET_MANIFEST || {};          // logical name -> hashed file name
+    static BASE = window.ASSET_BASE || 'static/dist';       // where the hashed files are served
+    static STATIC = window.ASSET_STATIC || 'static';        // our own files, when not built
+    static CDN = window.ASSET_CDN || {};                    // library name -> pinned CDN URL
+
+    // What each format needs in the page. Mammoth and SheetJS run in workers,
+    // so the page only loads them if it has to fall back to parsing in-page.
+    static FORMATS = {
+        pdf: {
+            scripts: ['vendor/pdf.min.js', 'pdf_page_view.js', 'pdf_scroll_view.js'],
+            setup: () => {
+                pdfjsLib.GlobalWorkerOptions.workerSrc = AssetLoader.url('vendor/pdf.worker.min.js');
+            }
+        },
+        docx: {
+            scripts: ['worker_client.js', 'docx_worker.js', 'docx_pages.js'],
+            setup: () => {
+                DocxDocument.WORKER_URL = AssetLoader.workerUrl('docx_worker.js', 'vendor/mammoth.browser.min.js');
+                DocxDocument.loadLibrary = () => AssetLoader.loadScript('vendor/mammoth.browser.min.js');
+            }
+        },
+        xlsx: {
+            scripts: ['worker_client.js', 'xlsx_worker.js', 'excel_grid.js'],
+            styles: ['excel_grid.css'],
+            setup: () => {
+                XlsxWorkbook.WORKER_URL = AssetLoader.workerUrl('xlsx_worker.js', 'vendor/xlsx.full.min.js');
+                XlsxWorkbook.loadLibrary = () => AssetLoader.loadScript('vendor/xlsx.full.min.js');
+            }
+        },
+        pptx: {
+            scripts: ['vendor/jszip.min.js', 'pptx_slides.js'],
+            styles: ['pptx_slides.css']
+        }
+    };
+
+    static loaded = new Map();      // URL -> promise of its load
+    static formats = new Map();     // format -> promise of its setup
+
+    static url(name) {
+        if (name in AssetLoader.MANIFEST) {
+            return `${AssetLoader.BASE}/${AssetLoader.MANIFEST[name]}`;
+        }
+        return AssetLoader.CDN[name] || `${AssetLoader.STATIC}/${name}`;
+    }
+
+    // Worker script URL whose fragment tells the worker where its own imports live
+    static workerUrl(name, library) {
+        const absolute = (url) => new URL(url, document.baseURI).href;
+        const scripts = { client: absolute(AssetLoader.url('worker_client.js')), library: absolute(AssetLoader.url(library)) };
+        return `${AssetLoader.url(name)}#${encodeURIComponent(JSON.stringify(scripts))}`;
+    }
+
+    static load(url, create) {
+        if (!AssetLoader.loaded.has(url)) {
+            AssetLoader.loaded.set(url, new Promise((resolve, reject) => {
+                const element = create(url);
+                element.onload = resolve;
+                element.onerror = () => {
+                    AssetLoader.loaded.delete(url);
+                    reject(new Error(`Failed to load ${url}`));
+                };
+                document.head.appendChild(element);
+            }));
+        }
+        return AssetLoader.loaded.get(url);
+    }
+
+    static async loadAsset(name, create) {
+        const url = AssetLoader.url(name);
+        try {
+            await AssetLoader.load(url, create);
+        } catch (error) {
+            const cdn = AssetLoader.CDN[name];
+            if (!cdn || cdn === url) {
+                throw error;
+            }
+            console.warn(`${error.message}, using ${cdn}`);
+            await AssetLoader.load(cdn, create);
+        }
+    }
+
+    static loadScript(name) {
+        return AssetLoader.loadAsset(name, (url) => {
+            const script = document.createElement('script');
+            script.src = url;
+            // Scripts requested together download in parallel but run in order
+            script.async = false;
+            return script;
+        });
+    }
+
+    static loadStyle(name) {
+        return AssetLoader.loadAsset(name, (url) => {
+            const link = document.createElement('link');
+            link.rel = 'stylesheet';
+            link.href = url;
+            return link;
+        });
+    }
+
+    // Load (once) everything documents of this format need; unknown formats need nothing
+    static loadFormat(format) {
+        const spec = AssetLoader.FORMATS[format];
+        if (!spec) {
+            return Promise.resolve();
+        }
+        if (!AssetLoader.formats.has(format)) {
+            const loading = Promise.all([
+                ...(spec.styles || []).map((name) => AssetLoader.loadStyle(name)),
+                ...spec.scripts.map((name) => AssetLoader.loadScript(name))
+            ]).then(() => {
+                if (spec.setup) {
+                    spec.setup();
+                }
+            });
+            // A failed load (e.g. offline) can be retried by opening the document again
+            loading.catch(() => AssetLoader.formats.delete(format));
+            AssetLoader.formats.set(format, loading);
+        }
+        return AssetLoader.formats.get(format);
+    }
+}
@@ -0,0 +1,162 @@
+// Paginated DOCX view shared by the JavaScript viewers
+//
+// The document is converted to HTML in a worker (static/docx_worker.js) and
+// cut into pages: at every explicit page break, and wherever the content laid
+// out at the viewer's width overflows a page (A4 proportions by default). The
+// layout pass measures a batch of elements at a time in a hidden box and
+// yields between batches, so the first page is shown while the rest of a long
+// document is still being paginated. Pages are kept as HTML strings; only the
+// visible page and its neighbours are ever built as DOM.
+
+class DocxDocument {
+    static WORKER_URL = 'static/docx_worker.js';
+    static BATCH_SIZE = 150;     // top-level elements measured per layout step
+    // Loads Mammoth into the page, for converting without a worker
+    static loadLibrary = () => Promise.resolve();
+
+    constructor(container, options = {}) {
+        this.container = container;
+        this.pageRatio = options.pageRatio || Math.SQRT2;
+        this.onProgress = options.onProgress || (() => {});
+
+        this.pages = [];            // HTML of each laid-out page
+        this.built = new Map();     // pageNum -> page element, for the visible page and its neighbours
+        this.currentPage = null;
+        this.idleHandle = null;
+        this.destroyed = false;
+        this.converter = new WorkerClient(DocxDocument.WORKER_URL, async () => {
+            await DocxDocument.loadLibrary();
+            return new DocxConverter();
+        });
+    }
+
+    // Resolves with the number of pages laid out so far, as soon as page 1 is ready;
+    // onProgress(pageCount, done) reports the rest. The buffer is transferred.
+    async open(arrayBuffer) {
+        const { sections } = await this.converter.call('convert', [arrayBuffer], [arrayBuffer]);
+        this.converter.close();
+
+        let firstPageReady;
+        const firstPage = new Promise((resolve) => { firstPageReady = resolve; });
+        this.done = this.layout(sections, firstPageReady);
+        await Promise.race([firstPage, this.done]);
+        return this.pages.length;
+    }
+
+    async layout(sections, firstPageReady) {
+        const style = getComputedStyle(this.container);
+        const width = (this.container.clientWidth || 800) - parseFloat(style.paddingLeft || 0) - parseFloat(style.paddingRight || 0);
+        const measure = document.createElement('div');
+        measure.className = 'docx-content';
+        Object.assign(measure.style, {
+            position: 'absolute',
+            left: '-100000px',
+            top: '0',
+            visibility: 'hidden',
+            width: `${width}px`,
+            boxSizing: 'border-box'
+        });
+        document.body.appendChild(measure);
+        const pageHeight = measure.clientWidth * this.pageRatio;
+
+        const addPage = (elements) => {
+            this.pages.push(elements.map((element) => element.outerHTML).join(''));
+            if (this.pages.length === 1) {
+                firstPageReady();
+            }
+        };
+
+        try {
+            for (const html of sections) {
+                const template = document.createElement('template');
+                template.innerHTML = html;
+                const elements = Array.from(template.content.children);
+                let page = [];
+                for (let i = 0; i < elements.length; i += DocxDocument.BATCH_SIZE) {
+                    // Keep the unfinished page in the box so offsets carry over between batches
+                    const batch = elements.slice(i, i + DocxDocument.BATCH_SIZE);
+                    measure.replaceChildren(...page, ...batch);
+                    // Images only have a height once decoded
+                    await Promise.all(Array.from(measure.querySelectorAll('img'), (img) => img.decode().catch(() => {})));
+                    let pageTop = page.length ? page[0].offsetTop : 0;
+                    for (const element of batch) {
+                        const bottom = element.offsetTop + element.offsetHeight;
+                        if (page.length && bottom - pageTop > pageHeight) {
+                            addPage(page);
+                            page = [];
+                            pageTop = element.offsetTop;
+                        }
+                        page.push(element);
+                    }
+                    this.onProgress(this.pages.length, false);
+                    await new Promise((resolve) => setTimeout(resolve));
+                    if (this.destroyed) {
+                        return;
+                    }
+                }
+                // An explicit page break always starts a new page
+                if (page.length) {
+                    addPage(page);
+                }
+            }
+        } finally {
+            measure.remove();
+        }
+
+        if (!this.pages.length) {
+            addPage([]);
+        }
+        this.onProgress(this.pages.length, true);
+    }
+
+    show(pageNum) {
+        if (pageNum < 1 || pageNum > this.pages.length) {
+            return false;
+        }
+        this.container.replaceChildren(this.build(pageNum));
+        this.currentPage = pageNum;
+
+        for (const built of this.built.keys()) {
+            if (Math.abs(built - pageNum) > 1) {
+                this.built.delete(built);
+            }
+        }
+        // Build the neighbours while idle so flipping pages is instant
+        const whenIdle = window.requestIdleCallback || ((callback) => setTimeout(callback, 50));
+        const cancelIdle = window.cancelIdleCallback || clearTimeout;
+        if (this.idleHandle !== null) {
+            cancelIdle(this.idleHandle);
+        }
+        this.idleHandle = whenIdle(() => {
+            this.idleHandle = null;
+            for (const neighbour of [pageNum + 1, pageNum - 1]) {
+                if (neighbour >= 1 && neighbour <= this.pages.length) {
+                    this.build(neighbour);
+                }
+            }
+        });
+        return true;
+    }
+
+    build(pageNum) {
+        let page = this.built.get(pageNum);
+        if (!page) {
+            page = document.createElement('div');
+            page.className = 'docx-content docx-page';
+            page.innerHTML = this.pages[pageNum - 1];
+            this.built.set(pageNum, page);
+        }
+        return page;
+    }
+
+    destroy() {
+        this.destroyed = true;
+        this.converter.close();
+        if (this.idleHandle !== null) {
+            (window.cancelIdleCallback || clearTimeout)(this.idleHandle);
+            this.idleHandle = null;
+        }
+        this.built.clear();
+        this.pages = [];
+    }
+}
@@ -0,0 +1,29 @@
+// DOCX to HTML conversion for the viewers
+//
+// Loaded as a Web Worker, this runs Mammoth off the main thread. Loaded with
+// a <script> tag it only defines DocxConverter, which DocxDocument
+// (static/docx_pages.js) uses in-page when workers are unavailable.
+
+const MAMMOTH_URL = 'https://cdnjs.cloudflare.com/ajax/libs/mammoth/1.6.0/mammoth.browser.min.js';
+
+// Explicit page breaks become markers the HTML is split on
+const DOCX_STYLE_MAP = ["br[type='page'] => hr.docx-page-break"];
+const DOCX_PAGE_BREAK = /<hr class="docx-page-break"\s*\/?>/;
+
+class DocxConverter {
+    // Resolves to { sections: [html, ...] split at page breaks, messages: [...] }
+    async convert(arrayBuffer) {
+        const result = await mammoth.convertToHtml({ arrayBuffer }, { styleMap: DOCX_STYLE_MAP });
+        return {
+            sections: result.value.split(DOCX_PAGE_BREAK),
+            messages: result.messages.map((message) => message.message)
+        };
+    }
+}
+
+if (typeof importScripts === 'function') {
+    // static/asset_loader.js passes the (hashed) script URLs in the fragment
+    const scripts = self.location.hash ? JSON.parse(decodeURIComponent(self.location.hash.slice(1))) : {};
+    importScripts(scripts.client || 'worker_client.js');
+    serveWorker(new DocxConverter(), [scripts.library || MAMMOTH_URL]);
+}
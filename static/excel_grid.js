@@ -0,0 +1,355 @@
+// Virtualised spreadsheet grid shared by the JavaScript viewers
+//
+// Only the cells in (and just around) the visible window exist in the DOM;
+// they are recycled as the grid scrolls, so a 200,000-row sheet costs a few
+// hundred elements rather than millions. Column letters and row numbers stay
+// frozen along the top and left edges.
+//
+// The grid reads cells from a source:
+//   { rowCount, colCount, fetchCells(rowStart, rowEnd, colStart, colEnd) }
+// where fetchCells resolves to an array of rows of cell text. Cells are
+// fetched in blocks and the most recently used blocks are kept. Sources are
+// XlsxWorkbook sheets (parsed in the browser) and SheetWindowSource (cells
+// served by the document server).
+
+class ExcelGrid {
+    static ROW_HEIGHT = 28;
+    static COL_WIDTH = 120;
+    static HEADER_WIDTH = 64;
+    static BLOCK_ROWS = 200;
+    static BLOCK_COLS = 50;
+    static MAX_BLOCKS = 40;
+    static OVERSCAN = 4;
+    // Browsers cap element heights (Firefox at about 17.9M px); taller sheets scroll proportionally
+    static MAX_SCROLL_HEIGHT = 15000000;
+
+    constructor(container, source, options = {}) {
+        this.container = container;
+        this.source = source;
+        this.height = options.height || '70vh';
+
+        this.blocks = new Map();    // "row:col" block key -> rows of cell text, oldest first
+        this.pending = new Map();   // block key -> in-flight fetch
+        this.cells = [];            // recycled cell elements
+        this.rowHeads = [];
+        this.colHeads = [];
+        this.frame = null;
+        this.destroyed = false;
+
+        this.build();
+        this.render();
+    }
+
+    build() {
+        const { ROW_HEIGHT, COL_WIDTH, HEADER_WIDTH } = ExcelGrid;
+        this.root = document.createElement('div');
+        this.root.className = 'excel-grid';
+        this.root.style.height = this.height;
+        this.root.style.setProperty('--excel-row-height', `${ROW_HEIGHT}px`);
+        this.root.style.setProperty('--excel-col-width', `${COL_WIDTH}px`);
+        this.root.style.setProperty('--excel-header-width', `${HEADER_WIDTH}px`);
+
+        const corner = document.createElement('div');
+        corner.className = 'excel-grid-corner';
+        this.colHeader = document.createElement('div');
+        this.colHeader.className = 'excel-grid-col-header';
+        this.colStrip = document.createElement('div');
+        this.colHeader.appendChild(this.colStrip);
+        this.rowHeader = document.createElement('div');
+        this.rowHeader.className = 'excel-grid-row-header';
+        this.rowStrip = document.createElement('div');
+        this.rowHeader.appendChild(this.rowStrip);
+
+        this.body = document.createElement('div');
+        this.body.className = 'excel-grid-body';
+        this.sizer = document.createElement('div');
+        this.sizer.className = 'excel-grid-sizer';
+        this.fullHeight = this.source.rowCount * ROW_HEIGHT;
+        this.sizer.style.width = `${this.source.colCount * COL_WIDTH}px`;
+        this.sizer.style.height = `${Math.min(this.fullHeight, ExcelGrid.MAX_SCROLL_HEIGHT)}px`;
+        this.body.appendChild(this.sizer);
+
+        this.root.append(corner, this.colHeader, this.rowHeader, this.body);
+        this.container.replaceChildren(this.root);
+
+        this.onScroll = () => this.render();
+        this.body.addEventListener('scroll', this.onScroll, { passive: true });
+        this.onResize = () => this.scheduleRender();
+        window.addEventListener('resize', this.onResize);
+    }
+
+    scheduleRender() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render();
+            });
+        }
+    }
+
+    // Row position (fractional) at the top of the viewport
+    firstVisibleRow() {
+        const { ROW_HEIGHT } = ExcelGrid;
+        const sizerHeight = parseFloat(this.sizer.style.height);
+        if (this.fullHeight <= sizerHeight) {
+            return this.body.scrollTop / ROW_HEIGHT;
+        }
+        const scrollable = Math.max(sizerHeight - this.body.clientHeight, 1);
+        const rows = this.source.rowCount - this.body.clientHeight / ROW_HEIGHT;
+        return (this.body.scrollTop / scrollable) * rows;
+    }
+
+    render() {
+        if (this.destroyed) {
+            return;
+        }
+        const { ROW_HEIGHT, COL_WIDTH, OVERSCAN } = ExcelGrid;
+        const { rowCount, colCount } = this.source;
+        const scrollTop = this.body.scrollTop;
+        const scrollLeft = this.body.scrollLeft;
+        const height = this.body.clientHeight || 600;
+        const width = this.body.clientWidth || 800;
+
+        const firstRow = this.firstVisibleRow();
+        const rowStart = Math.max(Math.floor(firstRow) - OVERSCAN, 0);
+        const rowEnd = Math.min(Math.ceil(firstRow + height / ROW_HEIGHT) + OVERSCAN, rowCount);
+        const colStart = Math.max(Math.floor(scrollLeft / COL_WIDTH) - 1, 0);
+        const colEnd = Math.min(Math.ceil((scrollLeft + width) / COL_WIDTH) + 1, colCount);
+        // Rows are placed relative to the viewport so proportional scrolling lines up
+        const rowTop = (r) => scrollTop + (r - firstRow) * ROW_HEIGHT;
+
+        let used = 0;
+        for (let r = rowStart; r < rowEnd; r++) {
+            for (let c = colStart; c < colEnd; c++) {
+                const cell = this.cell(this.cells, used++, this.sizer, 'excel-grid-cell');
+                this.place(cell, c * COL_WIDTH, rowTop(r), this.cellText(r, c));
+            }
+        }
+        this.trim(this.cells, used);
+
+        used = 0;
+        for (let c = colStart; c < colEnd; c++) {
+            this.place(this.cell(this.colHeads, used++, this.colStrip, 'excel-grid-head'), c * COL_WIDTH, 0, ExcelGrid.columnName(c));
+        }
+        this.trim(this.colHeads, used);
+        this.colStrip.style.transform = `translateX(${-scrollLeft}px)`;
+
+        used = 0;
+        for (let r = rowStart; r < rowEnd; r++) {
+            this.place(this.cell(this.rowHeads, used++, this.rowStrip, 'excel-grid-head'), 0, rowTop(r), String(r + 1));
+        }
+        this.trim(this.rowHeads, used);
+        this.rowStrip.style.transform = `translateY(${-scrollTop}px)`;
+
+        this.load(rowStart, rowEnd, colStart, colEnd);
+    }
+
+    cell(list, index, parent, className) {
+        if (index < list.length) {
+            return list[index];
+        }
+        const element = document.createElement('div');
+        element.className = className;
+        parent.appendChild(element);
+        list.push(element);
+        return element;
+    }
+
+    place(element, left, top, text) {
+        element.style.transform = `translate(${left}px, ${top}px)`;
+        if (element.textContent !== text) {
+            element.textContent = text;
+            element.title = text;
+        }
+    }
+
+    trim(list, used) {
+        for (const element of list.splice(used)) {
+            element.remove();
+        }
+    }
+
+    cellText(r, c) {
+        const { BLOCK_ROWS, BLOCK_COLS } = ExcelGrid;
+        const block = this.blocks.get(ExcelGrid.blockKey(r, c));
+        if (!block) {
+            return '';
+        }
+        const row = block[r % BLOCK_ROWS];
+        return (row && row[c % BLOCK_COLS]) || '';
+    }
+
+    // Fetch the blocks covering a window; render again as they arrive
+    load(rowStart, rowEnd, colStart, colEnd) {
+        const { BLOCK_ROWS, BLOCK_COLS } = ExcelGrid;
+        for (let br = Math.floor(rowStart / BLOCK_ROWS); br * BLOCK_ROWS < rowEnd; br++) {
+            for (let bc = Math.floor(colStart / BLOCK_COLS); bc * BLOCK_COLS < colEnd; bc++) {
+                const key = `${br}:${bc}`;
+                const block = this.blocks.get(key);
+                if (block) {
+                    // Refresh its LRU position
+                    this.blocks.delete(key);
+                    this.blocks.set(key, block);
+                    continue;
+                }
+                if (this.pending.has(key)) {
+                    continue;
+                }
+                const request = this.source.fetchCells(
+                    br * BLOCK_ROWS, (br + 1) * BLOCK_ROWS,
+                    bc * BLOCK_COLS, (bc + 1) * BLOCK_COLS
+                );
+                this.pending.set(key, request);
+                request.then((rows) => {
+                    this.pending.delete(key);
+                    if (this.destroyed) {
+                        return;
+                    }
+                    this.blocks.set(key, rows);
+                    for (const oldest of this.blocks.keys()) {
+                        if (this.blocks.size <= ExcelGrid.MAX_BLOCKS) {
+                            break;
+                        }
+                        this.blocks.delete(oldest);
+                    }
+                    this.scheduleRender();
+                }, (error) => {
+                    this.pending.delete(key);
+                    console.warn('Failed to load cells:', error);
+                });
+            }
+        }
+    }
+
+    destroy() {
+        this.destroyed = true;
+        this.body.removeEventListener('scroll', this.onScroll);
+        window.removeEventListener('resize', this.onResize);
+        if (this.frame !== null) {
+            cancelAnimationFrame(this.frame);
+        }
+        this.blocks.clear();
+        this.root.remove();
+    }
+
+    static blockKey(r, c) {
+        return `${Math.floor(r / ExcelGrid.BLOCK_ROWS)}:${Math.floor(c / ExcelGrid.BLOCK_COLS)}`;
+    }
+
+    // 0 -> A, 25 -> Z, 26 -> AA
+    static columnName(c) {
+        let name = '';
+        for (let n = c + 1; n > 0; n = Math.floor((n - 1) / 26)) {
+            name = String.fromCharCode(65 + ((n - 1) % 26)) + name;
+        }
+        return name;
+    }
+}
+
+// Sheet served by the document server's window API (sheet_windows.py), so
+// huge workbooks are never downloaded: only the blocks the grid shows.
+//
+// const names = await SheetWindowSource.sheetNames('http://host:5001/sheets/book.xlsx');
+// const source = await SheetWindowSource.open('http://host:5001/sheets/book.xlsx', 1);
+class SheetWindowSource {
+    static async sheetNames(url) {
+        return (await SheetWindowSource.getJSON(url)).sheets;
+    }
+
+    static async open(url, sheetNumber) {
+        const info = await SheetWindowSource.getJSON(`${url}/${sheetNumber}`);
+        return new SheetWindowSource(`${url}/${sheetNumber}/cells`, info);
+    }
+
+    static async getJSON(url) {
+        const response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`${response.status} ${response.statusText}`);
+        }
+        return response.json();
+    }
+
+    constructor(cellsUrl, info) {
+        this.cellsUrl = cellsUrl;
+        this.name = info.name;
+        this.rowCount = info.rows;
+        this.colCount = info.cols;
+        this.formats = info.formats;
+    }
+
+    async fetchCells(rowStart, rowEnd, colStart, colEnd) {
+        const data = await SheetWindowSource.getJSON(
+            `${this.cellsUrl}?r0=${rowStart}&r1=${rowEnd}&c0=${colStart}&c1=${colEnd}`
+        );
+        return data.cells.map((row) => row.map((cell) => {
+            // A cell is a value, or [value, index into the sheet's number formats]
+            const [value, format] = Array.isArray(cell) ? [cell[0], data.formats[cell[1]]] : [cell, null];
+            return SheetWindowSource.format(value, format);
+        }));
+    }
+
+    // Approximate Excel number formats for display: percentages, fixed decimals,
+    // thousands separators and dates (sent as ISO 8601 strings)
+    static format(value, format) {
+        if (value === null || value === undefined) {
+            return '';
+        }
+        if (typeof value === 'boolean') {
+            return value ? 'TRUE' : 'FALSE';
+        }
+        if (typeof value === 'string') {
+            if (format && /^\d{4}-\d{2}-\d{2}T/.test(value)) {
+                return /h/i.test(format) ? value.replace('T', ' ') : value.slice(0, 10);
+            }
+            return value;
+        }
+        if (!format || typeof value !== 'number') {
+            return String(value);
+        }
+        const decimals = (format.match(/\.(0+)/) || ['', ''])[1].length;
+        if (format.includes('%')) {
+            return `${(value * 100).toFixed(decimals)}%`;
+        }
+        if (format.includes(',')) {
+            return value.toLocaleString(undefined, { minimumFractionDigits: decimals, maximumFractionDigits: decimals });
+        }
+        return /[0#]/.test(format) ? value.toFixed(decimals) : String(value);
+    }
+}
+
+// Workbook parsed by static/xlsx_worker.js, in a Web Worker when possible
+//
+// const workbook = new XlsxWorkbook();
+// const names = await workbook.open(arrayBuffer);   // the buffer is transferred
+// const source = await workbook.sheet(1);            // an ExcelGrid source
+class XlsxWorkbook {
+    static WORKER_URL = 'static/xlsx_worker.js';
+    // Loads SheetJS into the page, for parsing without a worker
+    static loadLibrary = () => Promise.resolve();
+
+    constructor(options = {}) {
+        this.sheetsOnDemand = options.sheetsOnDemand;
+        this.worker = new WorkerClient(XlsxWorkbook.WORKER_URL, async () => {
+            await XlsxWorkbook.loadLibrary();
+            return new XlsxSheetStore();
+        });
+    }
+
+    open(arrayBuffer) {
+        return this.worker.call('open', [arrayBuffer, { sheetsOnDemand: this.sheetsOnDemand }], [arrayBuffer]);
+    }
+
+    async sheet(index) {
+        const info = await this.worker.call('sheet', [index]);
+        return {
+            name: info.name,
+            rowCount: info.rowCount,
+            colCount: info.colCount,
+            fetchCells: (rowStart, rowEnd, colStart, colEnd) => this.worker.call('rows', [index, rowStart, rowEnd, colStart, colEnd])
+        };
+    }
+
+    close() {
+        this.worker.close();
+    }
+}
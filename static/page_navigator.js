@@ -0,0 +1,107 @@
+// Virtualised quick-navigation panel
+//
+// The server only sends a small placeholder:
+//   <div class="docnav" data-total="2000" data-current="1" data-label="Page">...</div>
+// and the page buttons are built here. Documents with more than FLAT_LIMIT
+// pages are split into ranges (1-50, 51-100, ...) and only the buttons of the
+// selected range exist in the DOM, so a 2000-page PDF costs 50 buttons, not 2000.
+
+class PageNavigator {
+    static GROUP_SIZE = 50;
+    static FLAT_LIMIT = 100;
+
+    constructor(root) {
+        this.root = root;
+        this.total = parseInt(root.dataset.total, 10) || 0;
+        this.current = parseInt(root.dataset.current, 10) || 1;
+        this.label = root.dataset.label || 'Page';
+        this.grid = root.querySelector('.docnav-pages');
+        this.rangeStart = this.rangeFor(this.current);
+
+        this.grid.addEventListener('click', (e) => {
+            const button = e.target.closest('button[data-page]');
+            if (button) {
+                this.select(parseInt(button.dataset.page, 10));
+            }
+        });
+
+        if (this.total > PageNavigator.FLAT_LIMIT) {
+            this.buildRangeSelector();
+        }
+        this.renderRange();
+    }
+
+    rangeFor(page) {
+        if (this.total <= PageNavigator.FLAT_LIMIT) {
+            return 1;
+        }
+        return Math.floor((page - 1) / PageNavigator.GROUP_SIZE) * PageNavigator.GROUP_SIZE + 1;
+    }
+
+    rangeEnd(start) {
+        if (this.total <= PageNavigator.FLAT_LIMIT) {
+            return this.total;
+        }
+        return Math.min(start + PageNavigator.GROUP_SIZE - 1, this.total);
+    }
+
+    buildRangeSelector() {
+        const select = document.createElement('select');
+        select.className = 'docnav-range';
+        select.setAttribute('aria-label', `${this.label} range`);
+        for (let start = 1; start <= this.total; start += PageNavigator.GROUP_SIZE) {
+            const option = document.createElement('option');
+            option.value = start;
+            option.textContent = `${this.label}s ${start}-${this.rangeEnd(start)}`;
+            select.appendChild(option);
+        }
+        select.value = this.rangeStart;
+        select.addEventListener('change', () => {
+            this.rangeStart = parseInt(select.value, 10);
+            this.renderRange();
+        });
+        this.rangeSelect = select;
+        this.grid.before(select);
+    }
+
+    renderRange() {
+        const fragment = document.createDocumentFragment();
+        for (let page = this.rangeStart; page <= this.rangeEnd(this.rangeStart); page++) {
+            const button = document.createElement('button');
+            button.type = 'button';
+            button.dataset.page = page;
+            button.className = page === this.current ? 'docnav-page docnav-current' : 'docnav-page';
+            button.textContent = `${this.label} ${page}`;
+            fragment.appendChild(button);
+        }
+        this.grid.replaceChildren(fragment);
+    }
+
+    // Always sent, even for the highlighted page: the app may have moved on
+    // (Previous/Next, search hits) before re-sending the panel
+    select(page) {
+        this.current = page;
+        this.root.dataset.current = page;
+        this.renderRange();
+        requestPage(page);
+    }
+}
+
+// Ask the app to show a page: the hidden jump button's click event sends the
+// page number straight to Python (see page_navigator.add_page_jump)
+function requestPage(page) {
+    window.docnavRequestedPage = page;
+    const target = document.getElementById('docnav-jump');
+    (target.tagName === 'BUTTON' ? target : target.querySelector('button')).click();
+}
+
+// Gradio swaps the HTML component's content on every update; build new panels as they appear
+function initPageNavigators() {
+    document.querySelectorAll('.docnav:not([data-ready])').forEach((root) => {
+        root.dataset.ready = 'true';
+        new PageNavigator(root);
+    });
+}
+
+new MutationObserver(initPageNavigators).observe(document.documentElement, { childList: true, subtree: true });
+document.addEventListener('DOMContentLoaded', initPageNavigators);
@@ -0,0 +1,260 @@
+// PDF.js page view shared by the JavaScript viewers
+//
+// - Pages are rendered at the container's width times devicePixelRatio, so
+//   they are sharp on HiDPI screens without rendering more pixels than shown.
+// - Where OffscreenCanvas is available pages are rendered off-DOM and kept as
+//   ImageBitmaps; showing a cached page is a single drawImage() blit.
+//   Otherwise rendered canvases are kept and recycled through a pool.
+// - The most recently used pages stay in a small LRU, and the neighbours of
+//   the visible page are prefetched while the browser is idle, so flipping
+//   back and forth is instant.
+// - Navigating away cancels in-flight page.render() tasks.
+// - All documents share one long-lived PDF.js worker for parsing, instead of
+//   spawning a new worker per getDocument() call.
+
+class PdfPageView {
+    static MAX_SCALE = 4;
+
+    // Pass as getDocument({ url, worker: PdfPageView.worker() })
+    static worker() {
+        if (!PdfPageView.sharedWorker) {
+            PdfPageView.sharedWorker = new pdfjsLib.PDFWorker({ name: 'pdf-page-view' });
+        }
+        return PdfPageView.sharedWorker;
+    }
+
+    constructor(pdfDoc, container, options = {}) {
+        this.pdfDoc = pdfDoc;
+        this.container = container;
+        this.fixedScale = options.scale || null;
+        this.maxCachedPages = options.maxCachedPages || 8;
+        this.maxPooledCanvases = options.maxPooledCanvases || 2;
+        this.prefetchPages = options.prefetch === undefined ? 1 : options.prefetch;
+        this.useBitmaps = typeof OffscreenCanvas !== 'undefined' && options.offscreen !== false;
+
+        this.cache = new Map();     // pageNum -> { image, scale, cssWidth }, oldest first
+        this.pool = [];             // spare canvases ready for reuse (non-bitmap mode)
+        this.tasks = new Set();     // in-flight render tasks
+        this.generation = 0;        // bumped on every navigation; stale renders check it
+        this.currentPage = null;
+        this.displayCanvas = null;  // the on-screen canvas in bitmap mode
+        this.idleHandle = null;
+    }
+
+    // Show a page; resolves to false if a later call superseded this one
+    async show(pageNum) {
+        this.cancel();
+        const generation = this.generation;
+
+        const page = await this.pdfDoc.getPage(pageNum);
+        if (generation !== this.generation) {
+            return false;
+        }
+
+        const scale = this.scaleFor(page);
+        let entry = this.lookup(pageNum, scale);
+        if (!entry) {
+            entry = await this.render(page, scale, generation);
+            if (!entry) {
+                return false;
+            }
+            this.remember(pageNum, entry);
+        }
+
+        this.present(pageNum, entry);
+        this.schedulePrefetch(pageNum, generation);
+        return true;
+    }
+
+    // Fit the container width, in device pixels
+    scaleFor(page) {
+        if (this.fixedScale) {
+            return this.fixedScale;
+        }
+        const base = page.getViewport({ scale: 1 });
+        const cssWidth = this.container.clientWidth || base.width * 1.5;
+        const scale = (cssWidth / base.width) * (window.devicePixelRatio || 1);
+        return Math.min(Math.round(scale * 1000) / 1000, PdfPageView.MAX_SCALE);
+    }
+
+    lookup(pageNum, scale) {
+        const entry = this.cache.get(pageNum);
+        if (!entry || entry.scale !== scale) {
+            return null;
+        }
+        // Refresh its LRU position
+        this.cache.delete(pageNum);
+        this.cache.set(pageNum, entry);
+        return entry;
+    }
+
+    async render(page, scale, generation) {
+        const viewport = page.getViewport({ scale });
+        const width = Math.floor(viewport.width);
+        const height = Math.floor(viewport.height);
+        const target = this.useBitmaps ? new OffscreenCanvas(width, height) : this.acquireCanvas(width, height);
+        const task = page.render({
+            canvasContext: target.getContext('2d'),
+            viewport: viewport
+        });
+        this.tasks.add(task);
+
+        try {
+            await task.promise;
+        } catch (error) {
+            this.discard(target);
+            if (error && error.name === 'RenderingCancelledException') {
+                return null;
+            }
+            throw error;
+        } finally {
+            this.tasks.delete(task);
+        }
+
+        if (generation !== this.generation) {
+            this.discard(target);
+            return null;
+        }
+        const image = this.useBitmaps ? target.transferToImageBitmap() : target;
+        return { image, scale, cssWidth: width / (this.fixedScale ? 1 : (window.devicePixelRatio || 1)) };
+    }
+
+    present(pageNum, entry) {
+        let canvas = entry.image;
+        if (this.useBitmaps) {
+            if (!this.displayCanvas) {
+                this.displayCanvas = document.createElement('canvas');
+                this.displayCanvas.className = 'pdf-canvas';
+            }
+            canvas = this.displayCanvas;
+            canvas.width = entry.image.width;
+            canvas.height = entry.image.height;
+            canvas.getContext('2d').drawImage(entry.image, 0, 0);
+        }
+        canvas.style.width = `${entry.cssWidth}px`;
+        if (canvas.parentNode !== this.container || this.container.childNodes.length !== 1) {
+            this.container.replaceChildren(canvas);
+        }
+        this.currentPage = pageNum;
+    }
+
+    schedulePrefetch(pageNum, generation) {
+        if (!this.prefetchPages) {
+            return;
+        }
+        const whenIdle = window.requestIdleCallback || ((callback) => setTimeout(callback, 50));
+        this.idleHandle = whenIdle(async () => {
+            this.idleHandle = null;
+            const neighbours = [];
+            for (let offset = 1; offset <= this.prefetchPages; offset++) {
+                neighbours.push(pageNum + offset, pageNum - offset);
+            }
+            try {
+                for (const neighbour of neighbours) {
+                    if (generation !== this.generation) {
+                        return;
+                    }
+                    if (neighbour < 1 || neighbour > this.pdfDoc.numPages) {
+                        continue;
+                    }
+                    const page = await this.pdfDoc.getPage(neighbour);
+                    const scale = this.scaleFor(page);
+                    if (this.cache.has(neighbour) && this.cache.get(neighbour).scale === scale) {
+                        continue;
+                    }
+                    const entry = await this.render(page, scale, generation);
+                    if (entry) {
+                        this.remember(neighbour, entry);
+                    }
+                }
+            } catch (error) {
+                console.warn('PDF prefetch failed:', error);
+            }
+        });
+    }
+
+    // Abandon renders and prefetches started for a previous navigation
+    cancel() {
+        this.generation++;
+        for (const task of this.tasks) {
+            task.cancel();
+        }
+        this.tasks.clear();
+        if (this.idleHandle !== null) {
+            (window.cancelIdleCallback || clearTimeout)(this.idleHandle);
+            this.idleHandle = null;
+        }
+    }
+
+    remember(pageNum, entry) {
+        const previous = this.cache.get(pageNum);
+        if (previous && previous !== entry) {
+            this.evict(pageNum, previous);
+        }
+        this.cache.delete(pageNum);
+        this.cache.set(pageNum, entry);
+        for (const [oldest, oldEntry] of this.cache) {
+            if (this.cache.size <= this.maxCachedPages) {
+                break;
+            }
+            // Never pull the visible canvas out of the DOM
+            if (oldest !== this.currentPage || this.useBitmaps) {
+                this.cache.delete(oldest);
+                this.evict(oldest, oldEntry);
+            }
+        }
+    }
+
+    evict(pageNum, entry) {
+        if (this.useBitmaps) {
+            entry.image.close();
+        } else {
+            this.releaseCanvas(entry.image);
+        }
+    }
+
+    discard(target) {
+        if (!this.useBitmaps) {
+            this.releaseCanvas(target);
+        }
+    }
+
+    acquireCanvas(width, height) {
+        const canvas = this.pool.pop() || document.createElement('canvas');
+        // Resizing also clears the previous contents
+        canvas.width = width;
+        canvas.height = height;
+        canvas.className = 'pdf-canvas';
+        return canvas;
+    }
+
+    releaseCanvas(canvas) {
+        canvas.remove();
+        if (this.pool.length < this.maxPooledCanvases) {
+            this.pool.push(canvas);
+        } else {
+            // Drop the backing store now rather than whenever GC runs
+            canvas.width = 0;
+            canvas.height = 0;
+        }
+    }
+
+    // Free every page and the document itself; call before switching documents
+    destroy() {
+        this.cancel();
+        for (const [pageNum, entry] of this.cache) {
+            this.evict(pageNum, entry);
+        }
+        for (const canvas of this.pool) {
+            canvas.width = 0;
+            canvas.height = 0;
+        }
+        if (this.displayCanvas) {
+            this.displayCanvas.width = 0;
+            this.displayCanvas.height = 0;
+        }
+        this.cache.clear();
+        this.pool = [];
+        this.pdfDoc.destroy();
+    }
+}
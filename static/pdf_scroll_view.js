@@ -0,0 +1,240 @@
+// Continuous-scroll PDF view shared by the JavaScript viewers
+//
+// Every page gets a lightweight placeholder sized from its dimensions, so the
+// scrollbar is right from the start, but a page is only rendered when its
+// placeholder comes near the viewport (IntersectionObserver). Rendered pages
+// that scroll away are kept until their canvases exceed the memory budget;
+// then the ones furthest from the viewport are released. Memory therefore
+// stays bounded however long the document is.
+
+class PdfScrollView {
+    constructor(pdfDoc, container, options = {}) {
+        this.pdfDoc = pdfDoc;
+        this.container = container;
+        this.pageSizes = options.pageSizes || null;     // [{ width, height }] in PDF points, if known
+        this.memoryBudget = options.memoryBudget || 256 * 1024 * 1024;
+        this.renderMargin = options.renderMargin || '100% 0px';
+        this.height = options.height || '80vh';
+        this.gap = options.gap === undefined ? 12 : options.gap;
+        this.onPageChange = options.onPageChange || (() => {});
+
+        this.placeholders = [];
+        this.rendered = new Map();  // pageNum -> { canvas, bytes }, least recently visible first
+        this.tasks = new Map();     // pageNum -> in-flight render task
+        this.near = new Set();      // pages within the render margin
+        this.visibility = new Map(); // pageNum -> visible ratio
+        this.bytes = 0;
+        this.currentPage = 1;
+        this.destroyed = false;
+    }
+
+    async init(startPage = 1) {
+        const first = this.pageSizes ? this.pageSizes[0] : (await this.pdfDoc.getPage(1)).getViewport({ scale: 1 });
+
+        this.scroller = document.createElement('div');
+        this.scroller.className = 'pdf-scroll';
+        this.scroller.style.height = this.height;
+        this.scroller.style.overflowY = 'auto';
+        // Placeholder offsets are then relative to the scroller
+        this.scroller.style.position = 'relative';
+        this.container.replaceChildren(this.scroller);
+
+        this.pageWidth = this.scroller.clientWidth || first.width * 1.5;
+        const fragment = document.createDocumentFragment();
+        for (let pageNum = 1; pageNum <= this.pdfDoc.numPages; pageNum++) {
+            const size = (this.pageSizes && this.pageSizes[pageNum - 1]) || first;
+            const placeholder = document.createElement('div');
+            placeholder.className = 'pdf-scroll-page';
+            placeholder.dataset.page = pageNum;
+            placeholder.style.width = `${this.pageWidth}px`;
+            placeholder.style.height = `${this.cssHeight(size)}px`;
+            placeholder.style.margin = `0 auto ${this.gap}px`;
+            placeholder.style.background = 'white';
+            placeholder.style.boxShadow = '0 2px 8px rgba(0, 0, 0, 0.1)';
+            this.placeholders.push(placeholder);
+            fragment.appendChild(placeholder);
+        }
+        this.scroller.appendChild(fragment);
+
+        this.nearObserver = new IntersectionObserver((entries) => this.onNear(entries), {
+            root: this.scroller,
+            rootMargin: this.renderMargin
+        });
+        this.visibleObserver = new IntersectionObserver((entries) => this.onVisible(entries), {
+            root: this.scroller,
+            threshold: [0, 0.25, 0.5, 0.75, 1]
+        });
+        for (const placeholder of this.placeholders) {
+            this.nearObserver.observe(placeholder);
+            this.visibleObserver.observe(placeholder);
+        }
+
+        this.scrollToPage(startPage);
+    }
+
+    cssHeight(size) {
+        return Math.round(this.pageWidth * size.height / size.width);
+    }
+
+    scrollToPage(pageNum) {
+        const placeholder = this.placeholders[pageNum - 1];
+        if (placeholder) {
+            this.scroller.scrollTop = placeholder.offsetTop;
+            this.setCurrentPage(pageNum);
+        }
+    }
+
+    onNear(entries) {
+        for (const entry of entries) {
+            const pageNum = parseInt(entry.target.dataset.page, 10);
+            if (entry.isIntersecting) {
+                this.near.add(pageNum);
+                this.materialise(pageNum);
+            } else {
+                this.near.delete(pageNum);
+                // No point finishing a page that scrolled away before it was drawn
+                const task = this.tasks.get(pageNum);
+                if (task) {
+                    task.cancel();
+                }
+            }
+        }
+    }
+
+    onVisible(entries) {
+        for (const entry of entries) {
+            const pageNum = parseInt(entry.target.dataset.page, 10);
+            if (entry.intersectionRatio > 0) {
+                this.visibility.set(pageNum, entry.intersectionRatio);
+                // Keep visible pages at the young end of the eviction order
+                const rendered = this.rendered.get(pageNum);
+                if (rendered) {
+                    this.rendered.delete(pageNum);
+                    this.rendered.set(pageNum, rendered);
+                }
+            } else {
+                this.visibility.delete(pageNum);
+            }
+        }
+        let best = null;
+        for (const [pageNum, ratio] of this.visibility) {
+            if (best === null || ratio > this.visibility.get(best) || (ratio === this.visibility.get(best) && pageNum < best)) {
+                best = pageNum;
+            }
+        }
+        if (best !== null) {
+            this.setCurrentPage(best);
+        }
+    }
+
+    setCurrentPage(pageNum) {
+        if (pageNum !== this.currentPage) {
+            this.currentPage = pageNum;
+            this.onPageChange(pageNum);
+        }
+    }
+
+    async materialise(pageNum) {
+        if (this.rendered.has(pageNum) || this.tasks.has(pageNum)) {
+            return;
+        }
+        const placeholder = this.placeholders[pageNum - 1];
+        const page = await this.pdfDoc.getPage(pageNum);
+        if (this.destroyed || !this.near.has(pageNum) || this.tasks.has(pageNum)) {
+            return;
+        }
+
+        const base = page.getViewport({ scale: 1 });
+        this.resizePlaceholder(placeholder, base);
+
+        const dpr = window.devicePixelRatio || 1;
+        const viewport = page.getViewport({ scale: (this.pageWidth / base.width) * dpr });
+        const canvas = document.createElement('canvas');
+        canvas.width = Math.floor(viewport.width);
+        canvas.height = Math.floor(viewport.height);
+        canvas.style.width = '100%';
+        canvas.style.height = '100%';
+        canvas.style.display = 'block';
+
+        const task = page.render({ canvasContext: canvas.getContext('2d'), viewport: viewport });
+        this.tasks.set(pageNum, task);
+        try {
+            await task.promise;
+        } catch (error) {
+            this.tasks.delete(pageNum);
+            canvas.width = 0;
+            canvas.height = 0;
+            if (!error || error.name !== 'RenderingCancelledException') {
+                console.warn(`Failed to render page ${pageNum}:`, error);
+            } else if (this.near.has(pageNum) && !this.destroyed) {
+                // Scrolled back into range while the cancellation was pending
+                this.materialise(pageNum);
+            }
+            return;
+        }
+        this.tasks.delete(pageNum);
+        if (this.destroyed) {
+            return;
+        }
+
+        placeholder.replaceChildren(canvas);
+        const bytes = canvas.width * canvas.height * 4;
+        this.rendered.set(pageNum, { canvas, bytes });
+        this.bytes += bytes;
+        this.enforceBudget();
+    }
+
+    // Correct a placeholder sized from page 1 once the real dimensions are known
+    resizePlaceholder(placeholder, size) {
+        const height = this.cssHeight(size);
+        const previous = parseFloat(placeholder.style.height);
+        if (height === previous) {
+            return;
+        }
+        const above = placeholder.offsetTop < this.scroller.scrollTop;
+        placeholder.style.height = `${height}px`;
+        if (above) {
+            // Keep what the user is looking at in place
+            this.scroller.scrollTop += height - previous;
+        }
+    }
+
+    enforceBudget() {
+        for (const [pageNum, rendered] of this.rendered) {
+            if (this.bytes <= this.memoryBudget) {
+                break;
+            }
+            if (this.near.has(pageNum)) {
+                continue;
+            }
+            this.release(pageNum, rendered);
+        }
+    }
+
+    release(pageNum, rendered) {
+        this.rendered.delete(pageNum);
+        this.bytes -= rendered.bytes;
+        rendered.canvas.remove();
+        rendered.canvas.width = 0;
+        rendered.canvas.height = 0;
+    }
+
+    // Tear down the view; the PDF document itself stays open
+    destroy() {
+        this.destroyed = true;
+        if (this.nearObserver) {
+            this.nearObserver.disconnect();
+            this.visibleObserver.disconnect();
+        }
+        for (const task of this.tasks.values()) {
+            task.cancel();
+        }
+        this.tasks.clear();
+        for (const [pageNum, rendered] of this.rendered) {
+            this.release(pageNum, rendered);
+        }
+        if (this.scroller) {
+            this.scroller.remove();
+        }
+    }
+}
@@ -0,0 +1,532 @@
+// Positioned PPTX slides for the JavaScript viewers
+//
+// The browser counterpart of pptx_slides.py. JSZip only inflates the entries
+// that are read: opening a deck reads presentation.xml, and a slide's XML
+// (with the layout, master and theme it inherits from, parsed once per deck)
+// is read when that slide is shown. Shapes are placed with percentages of the
+// slide size and text is sized in container units, so a slide scales with the
+// viewer. Embedded media becomes one object URL per part, shared by every
+// slide that uses it, so the browser decodes each image once.
+
+class PptxDeck {
+    static NS = {
+        a: 'http://schemas.openxmlformats.org/drawingml/2006/main',
+        p: 'http://schemas.openxmlformats.org/presentationml/2006/main',
+        r: 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    };
+    static EMU_PER_POINT = 12700;
+    static DEFAULT_INSETS = [91440, 45720, 91440, 45720];   // left, top, right, bottom
+    static DEFAULT_TEXT_SIZES = { title: 44, body: 28, other: 18 };
+    static SCHEME_ALIASES = { tx1: 'dk1', bg1: 'lt1', tx2: 'dk2', bg2: 'lt2' };
+    static MEDIA_TYPES = { png: 'image/png', jpg: 'image/jpeg', jpeg: 'image/jpeg', gif: 'image/gif', bmp: 'image/bmp', svg: 'image/svg+xml', webp: 'image/webp' };
+
+    static async open(arrayBuffer) {
+        const deck = new PptxDeck(await JSZip.loadAsync(arrayBuffer));
+        const presentation = await deck.xml('ppt/presentation.xml');
+        const size = PptxDeck.find(presentation.documentElement, 'p:sldSz');
+        deck.slideSize = [PptxDeck.int(size, 'cx', 9144000), PptxDeck.int(size, 'cy', 6858000)];
+        const rels = await deck.rels('ppt/presentation.xml');
+        deck.slideParts = PptxDeck.findAll(presentation.documentElement, 'p:sldIdLst/p:sldId')
+            .map((sld) => rels.get(sld.getAttributeNS(PptxDeck.NS.r, 'id')))
+            .filter(Boolean);
+        return deck;
+    }
+
+    constructor(zip) {
+        this.zip = zip;
+        this.slideSize = [9144000, 6858000];
+        this.slideParts = [];
+        this.shared = new Map();    // part name -> parsed layout, master or theme (promise)
+        this.media = new Map();     // part name -> object URL (promise)
+    }
+
+    get slideCount() {
+        return this.slideParts.length;
+    }
+
+    // --- XML helpers: paths like 'p:spPr/a:xfrm' over direct children ---
+
+    static children(element, step) {
+        const [prefix, name] = step.split(':');
+        return element ? Array.from(element.children).filter(
+            (child) => child.localName === name && child.namespaceURI === PptxDeck.NS[prefix]) : [];
+    }
+
+    static find(element, path) {
+        for (const step of path.split('/')) {
+            element = PptxDeck.children(element, step)[0] || null;
+        }
+        return element;
+    }
+
+    static findAll(element, path) {
+        const steps = path.split('/');
+        const last = steps.pop();
+        const parent = steps.length ? PptxDeck.find(element, steps.join('/')) : element;
+        return PptxDeck.children(parent, last);
+    }
+
+    static int(element, name, fallback = 0) {
+        const value = element ? element.getAttribute(name) : null;
+        return value === null ? fallback : parseInt(value, 10);
+    }
+
+    static resolve(directory, target) {
+        if (target.startsWith('/')) {
+            return target.slice(1);
+        }
+        const parts = directory ? directory.split('/') : [];
+        for (const segment of target.split('/')) {
+            if (segment === '..') {
+                parts.pop();
+            } else if (segment !== '.') {
+                parts.push(segment);
+            }
+        }
+        return parts.join('/');
+    }
+
+    async xml(partName) {
+        const entry = this.zip.file(partName);
+        if (!entry) {
+            throw new Error(`Missing part ${partName}`);
+        }
+        return new DOMParser().parseFromString(await entry.async('string'), 'application/xml');
+    }
+
+    // Layouts, masters and themes are shared between slides: parse each once
+    sharedXml(partName) {
+        if (!this.shared.has(partName)) {
+            this.shared.set(partName, this.xml(partName).then((doc) => doc.documentElement));
+        }
+        return this.shared.get(partName);
+    }
+
+    async rels(partName) {
+        const slash = partName.lastIndexOf('/');
+        const directory = partName.slice(0, slash);
+        const relsName = `${directory}/_rels/${partName.slice(slash + 1)}.rels`;
+        const targets = new Map();
+        if (!this.zip.file(relsName)) {
+            return targets;
+        }
+        const doc = await this.xml(relsName);
+        for (const rel of Array.from(doc.documentElement.children)) {
+            if (rel.getAttribute('TargetMode') !== 'External') {
+                targets.set(rel.getAttribute('Id'), PptxDeck.resolve(directory, rel.getAttribute('Target')));
+            }
+        }
+        return targets;
+    }
+
+    async related(partName, kind) {
+        for (const target of (await this.rels(partName)).values()) {
+            if (target.includes(`/${kind}`)) {
+                return target;
+            }
+        }
+        return null;
+    }
+
+    mediaUrl(partName) {
+        if (!this.media.has(partName)) {
+            const extension = partName.split('.').pop().toLowerCase();
+            const entry = this.zip.file(partName);
+            this.media.set(partName, entry ? entry.async('blob').then((blob) => URL.createObjectURL(
+                new Blob([blob], { type: PptxDeck.MEDIA_TYPES[extension] || '' }))) : Promise.resolve(null));
+        }
+        return this.media.get(partName);
+    }
+
+    // Background colour and shapes (in z-order) of a slide, numbered from 1
+    async slideShapes(slideNum) {
+        const part = this.slideParts[slideNum - 1];
+        const slide = (await this.xml(part)).documentElement;
+        const layout = await this.related(part, 'slideLayout');
+        const master = layout ? await this.related(layout, 'slideMaster') : null;
+        const theme = master ? await this.related(master, 'theme') : null;
+        const context = new PptxSlideContext(
+            await this.rels(part),
+            await Promise.all([layout, master].filter(Boolean).map((name) => this.sharedXml(name))),
+            master ? await this.sharedXml(master) : null,
+            theme ? await this.sharedXml(theme) : null
+        );
+
+        let background = null;
+        for (const root of [slide, ...context.inherited]) {
+            const fill = PptxDeck.find(root, 'p:cSld/p:bg/p:bgPr/a:solidFill');
+            if (fill) {
+                background = context.color(fill);
+                break;
+            }
+        }
+        const shapes = [];
+        const tree = PptxDeck.find(slide, 'p:cSld/p:spTree');
+        if (tree) {
+            context.collect(tree, (x, y, cx, cy) => [x, y, cx, cy], shapes);
+        }
+        return { background, shapes };
+    }
+
+    // Replace the container's content with the slide
+    async renderSlide(slideNum, container) {
+        // A slide still loading when another is requested must not replace it
+        const token = this.renderToken = (this.renderToken || 0) + 1;
+        const { background, shapes } = await this.slideShapes(slideNum);
+        const [slideWidth, slideHeight] = this.slideSize;
+        const percent = (emu, total) => `${(emu / total) * 100}%`;
+        // Lengths in EMU as a share of the slide's width, which is 100cqw
+        const cqw = (emu) => `${(emu / slideWidth) * 100}cqw`;
+
+        const canvas = document.createElement('div');
+        canvas.className = 'pptx-canvas';
+        canvas.style.aspectRatio = `${slideWidth} / ${slideHeight}`;
+        if (background) {
+            canvas.style.background = background;
+        }
+
+        for (const shape of shapes) {
+            const [x, y, cx, cy] = shape.box;
+            const place = (element) => {
+                Object.assign(element.style, {
+                    left: percent(Math.min(x, x + cx), slideWidth),
+                    top: percent(Math.min(y, y + cy), slideHeight),
+                    width: percent(Math.abs(cx), slideWidth),
+                    height: percent(Math.abs(cy), slideHeight)
+                });
+                canvas.appendChild(element);
+                return element;
+            };
+
+            if (shape.kind === 'picture') {
+                const img = place(document.createElement('img'));
+                img.className = 'pptx-picture';
+                img.alt = '';
+                const url = await this.mediaUrl(shape.image);
+                if (url) {
+                    img.src = url;
+                }
+            } else if (shape.kind === 'line') {
+                const svg = place(document.createElementNS('http://www.w3.org/2000/svg', 'svg'));
+                svg.setAttribute('class', 'pptx-line');
+                svg.setAttribute('viewBox', '0 0 100 100');
+                svg.setAttribute('preserveAspectRatio', 'none');
+                const line = document.createElementNS('http://www.w3.org/2000/svg', 'line');
+                const [flipH, flipV] = shape.flip;
+                line.setAttribute('x1', flipH ? 100 : 0);
+                line.setAttribute('y1', flipV ? 100 : 0);
+                line.setAttribute('x2', flipH ? 0 : 100);
+                line.setAttribute('y2', flipV ? 0 : 100);
+                line.setAttribute('stroke', shape.outline || 'black');
+                line.setAttribute('vector-effect', 'non-scaling-stroke');
+                line.style.strokeWidth = `max(1px, ${cqw(shape.outlineWidth)})`;
+                svg.appendChild(line);
+            } else {
+                const box = place(document.createElement('div'));
+                box.className = 'pptx-shape';
+                if (shape.fill) {
+                    box.style.background = shape.fill;
+                }
+                if (shape.outline) {
+                    box.style.border = `max(1px, ${cqw(shape.outlineWidth)}) solid ${shape.outline}`;
+                }
+                if (shape.geometry === 'ellipse') {
+                    box.style.borderRadius = '50%';
+                } else if (shape.geometry === 'roundRect') {
+                    box.style.borderRadius = cqw(Math.min(Math.abs(cx), Math.abs(cy)) / 6);
+                }
+                box.style.justifyContent = { ctr: 'center', b: 'flex-end' }[shape.anchor] || 'flex-start';
+                // Insets are left, top, right, bottom; CSS padding starts at the top
+                box.style.padding = [1, 2, 3, 0].map((i) => cqw(shape.insets[i])).join(' ');
+                for (const para of shape.paragraphs) {
+                    const p = document.createElement('p');
+                    p.textContent = para.text || ' ';
+                    Object.assign(p.style, {
+                        fontSize: cqw(para.size * PptxDeck.EMU_PER_POINT),
+                        fontWeight: para.bold ? 'bold' : 'normal',
+                        color: para.color,
+                        textAlign: { ctr: 'center', r: 'right', just: 'justify' }[para.align] || 'left'
+                    });
+                    box.appendChild(p);
+                }
+            }
+        }
+
+        if (token !== this.renderToken) {
+            return null;
+        }
+        container.replaceChildren(canvas);
+        return canvas;
+    }
+
+    destroy() {
+        for (const url of this.media.values()) {
+            url.then((objectUrl) => objectUrl && URL.revokeObjectURL(objectUrl));
+        }
+        this.media.clear();
+        this.shared.clear();
+        this.zip = null;
+    }
+}
+
+// What a slide inherits: relationships, placeholder positions, text styles and theme colours
+class PptxSlideContext {
+    constructor(rels, inherited, master, theme) {
+        this.rels = rels;
+        this.inherited = inherited;     // layout, then master
+        this.master = master;
+        this.theme = theme;
+    }
+
+    collect(tree, transform, shapes) {
+        const { find, int } = PptxDeck;
+        for (const child of Array.from(tree.children)) {
+            if (child.namespaceURI !== PptxDeck.NS.p) {
+                continue;
+            }
+            if (child.localName === 'sp') {
+                this.addShape(child, transform, shapes);
+            } else if (child.localName === 'pic') {
+                const box = this.box(find(child, 'p:spPr/a:xfrm'), transform);
+                const blip = find(child, 'p:blipFill/a:blip');
+                const target = blip ? this.rels.get(blip.getAttributeNS(PptxDeck.NS.r, 'embed')) : null;
+                if (box && target) {
+                    shapes.push({ kind: 'picture', box, image: target });
+                }
+            } else if (child.localName === 'cxnSp') {
+                const xfrm = find(child, 'p:spPr/a:xfrm');
+                const box = this.box(xfrm, transform);
+                const line = find(child, 'p:spPr/a:ln');
+                if (box) {
+                    shapes.push({
+                        kind: 'line',
+                        box,
+                        outline: this.color(find(line, 'a:solidFill')),
+                        outlineWidth: int(line, 'w', 12700),
+                        flip: [xfrm.getAttribute('flipH') === '1', xfrm.getAttribute('flipV') === '1']
+                    });
+                }
+            } else if (child.localName === 'graphicFrame') {
+                this.addTable(child, transform, shapes);
+            } else if (child.localName === 'grpSp') {
+                this.collect(child, this.groupTransform(child, transform), shapes);
+            }
+        }
+    }
+
+    // Map child coordinates of a group through its chOff/chExt into the parent's space
+    groupTransform(group, transform) {
+        const { find, int } = PptxDeck;
+        const xfrm = find(group, 'p:grpSpPr/a:xfrm');
+        const off = find(xfrm, 'a:off'), ext = find(xfrm, 'a:ext');
+        const chOff = find(xfrm, 'a:chOff'), chExt = find(xfrm, 'a:chExt');
+        if (!off || !ext || !chOff || !chExt) {
+            return transform;
+        }
+        const sx = int(ext, 'cx') / (int(chExt, 'cx') || 1);
+        const sy = int(ext, 'cy') / (int(chExt, 'cy') || 1);
+        return (x, y, cx, cy) => transform(
+            int(off, 'x') + (x - int(chOff, 'x')) * sx,
+            int(off, 'y') + (y - int(chOff, 'y')) * sy,
+            cx * sx, cy * sy
+        );
+    }
+
+    box(xfrm, transform) {
+        const { find, int } = PptxDeck;
+        const off = find(xfrm, 'a:off'), ext = find(xfrm, 'a:ext');
+        if (!off || !ext) {
+            return null;
+        }
+        return transform(int(off, 'x'), int(off, 'y'), int(ext, 'cx'), int(ext, 'cy'));
+    }
+
+    placeholder(shape) {
+        const ph = PptxDeck.find(shape, 'p:nvSpPr/p:nvPr/p:ph');
+        return ph ? { type: ph.getAttribute('type') || 'body', idx: ph.getAttribute('idx') } : null;
+    }
+
+    static styleName(type) {
+        if (type === 'title' || type === 'ctrTitle') {
+            return 'title';
+        }
+        return ['body', 'subTitle', 'obj'].includes(type) ? 'body' : 'other';
+    }
+
+    // Position of a placeholder from the layout, then the master
+    inheritedXfrm(ph) {
+        for (const root of this.inherited) {
+            let byType = null;
+            for (const candidate of PptxDeck.findAll(root, 'p:cSld/p:spTree/p:sp')) {
+                const other = this.placeholder(candidate);
+                const xfrm = PptxDeck.find(candidate, 'p:spPr/a:xfrm');
+                if (!other || !xfrm) {
+                    continue;
+                }
+                if (ph.idx !== null && other.idx === ph.idx) {
+                    return xfrm;
+                }
+                if (!byType && PptxSlideContext.styleName(other.type) === PptxSlideContext.styleName(ph.type)) {
+                    byType = xfrm;
+                }
+            }
+            if (byType) {
+                return byType;
+            }
+        }
+        return null;
+    }
+
+    // Level-1 size, alignment and colour of the master text style a shape follows
+    textDefaults(ph, style = null) {
+        const styleName = ph ? PptxSlideContext.styleName(ph.type) : 'other';
+        const defaults = { size: PptxDeck.DEFAULT_TEXT_SIZES[styleName], align: 'l', color: '#000000' };
+        if (this.master) {
+            this.applyLevel(defaults, PptxDeck.find(this.master, `p:txStyles/p:${styleName}Style/a:lvl1pPr`));
+        }
+        defaults.color = this.color(PptxDeck.find(style, 'a:fontRef')) || defaults.color;
+        return defaults;
+    }
+
+    applyLevel(defaults, level) {
+        if (!level) {
+            return;
+        }
+        defaults.align = level.getAttribute('algn') || defaults.align;
+        const props = PptxDeck.find(level, 'a:defRPr');
+        if (props) {
+            defaults.size = PptxDeck.int(props, 'sz') / 100 || defaults.size;
+            defaults.color = this.color(PptxDeck.find(props, 'a:solidFill')) || defaults.color;
+        }
+    }
+
+    addShape(shape, transform, shapes) {
+        const { find, int } = PptxDeck;
+        const ph = this.placeholder(shape);
+        let xfrm = find(shape, 'p:spPr/a:xfrm');
+        if (!xfrm && ph) {
+            xfrm = this.inheritedXfrm(ph);
+        }
+        const box = this.box(xfrm, transform);
+        if (!box) {
+            return;
+        }
+
+        const spPr = find(shape, 'p:spPr');
+        const style = find(shape, 'p:style');
+        const geometry = find(spPr, 'a:prstGeom');
+        // Explicit fills and lines win over the theme references of p:style
+        let fill = find(spPr, 'a:solidFill');
+        const fillRef = find(style, 'a:fillRef');
+        if (!fill && !find(spPr, 'a:noFill') && fillRef && fillRef.getAttribute('idx') !== '0') {
+            fill = fillRef;
+        }
+        const line = find(spPr, 'a:ln');
+        let outline = null;
+        if (!find(line, 'a:noFill')) {
+            outline = this.color(find(line, 'a:solidFill'));
+            const lineRef = find(style, 'a:lnRef');
+            if (!outline && lineRef && lineRef.getAttribute('idx') !== '0') {
+                outline = this.color(lineRef);
+            }
+        }
+        shapes.push({
+            kind: 'shape',
+            box,
+            geometry: geometry ? geometry.getAttribute('prst') || 'rect' : 'rect',
+            fill: this.color(fill),
+            outline,
+            outlineWidth: int(line, 'w', 12700),
+            ...this.text(find(shape, 'p:txBody'), this.textDefaults(ph, style))
+        });
+    }
+
+    // Tables become one outlined shape per cell
+    addTable(frame, transform, shapes) {
+        const { find, findAll, int } = PptxDeck;
+        const table = find(frame, 'a:graphic/a:graphicData/a:tbl');
+        const off = find(frame, 'p:xfrm/a:off');
+        if (!table || !off) {
+            return;
+        }
+        const widths = findAll(table, 'a:tblGrid/a:gridCol').map((col) => int(col, 'w'));
+        let y = int(off, 'y');
+        for (const row of findAll(table, 'a:tr')) {
+            const height = int(row, 'h');
+            let x = int(off, 'x');
+            let column = 0;
+            for (const cell of findAll(row, 'a:tc')) {
+                const span = int(cell, 'gridSpan', 1);
+                const width = widths.slice(column, column + span).reduce((a, b) => a + b, 0);
+                if (cell.getAttribute('hMerge') !== '1' && cell.getAttribute('vMerge') !== '1') {
+                    shapes.push({
+                        kind: 'shape',
+                        box: transform(x, y, width, height),
+                        geometry: 'rect',
+                        fill: this.color(find(cell, 'a:tcPr/a:solidFill')),
+                        outline: '#000000',
+                        outlineWidth: PptxDeck.EMU_PER_POINT,
+                        ...this.text(find(cell, 'a:txBody'), this.textDefaults(null))
+                    });
+                }
+                x += width;
+                column += span;
+            }
+            y += height;
+        }
+    }
+
+    // Paragraphs, vertical anchor and insets of a text body
+    text(body, defaults) {
+        const { find, findAll, int } = PptxDeck;
+        if (!body) {
+            return { paragraphs: [], anchor: 't', insets: PptxDeck.DEFAULT_INSETS };
+        }
+        const bodyPr = find(body, 'a:bodyPr');
+        const insets = ['lIns', 'tIns', 'rIns', 'bIns'].map((name, i) => int(bodyPr, name, PptxDeck.DEFAULT_INSETS[i]));
+        const anchor = (bodyPr && bodyPr.getAttribute('anchor')) || 't';
+        // Shrink-on-overflow text records the scale PowerPoint applied
+        const fontScale = int(find(bodyPr, 'a:normAutofit'), 'fontScale', 100000) / 100000;
+        defaults = { ...defaults };
+        this.applyLevel(defaults, find(body, 'a:lstStyle/a:lvl1pPr'));
+
+        const paragraphs = findAll(body, 'a:p').map((para) => {
+            const style = { ...defaults };
+            this.applyLevel(style, find(para, 'a:pPr'));
+            const runs = [...para.getElementsByTagNameNS(PptxDeck.NS.a, 'r'), ...para.getElementsByTagNameNS(PptxDeck.NS.a, 'fld')];
+            const text = Array.from(para.getElementsByTagNameNS(PptxDeck.NS.a, 't'), (t) => t.textContent).join('');
+            const props = runs.length ? find(runs[0], 'a:rPr') : find(para, 'a:endParaRPr');
+            return {
+                text,
+                size: (int(props, 'sz') / 100 || style.size) * fontScale,
+                bold: !!props && props.getAttribute('b') === '1',
+                color: this.color(find(props, 'a:solidFill')) || style.color,
+                align: style.align
+            };
+        });
+        return { paragraphs, anchor, insets };
+    }
+
+    // '#RRGGBB' of the colour inside `fill` (an a:solidFill or style reference), or null
+    color(fill) {
+        const { find } = PptxDeck;
+        const srgb = find(fill, 'a:srgbClr');
+        if (srgb) {
+            return '#' + (srgb.getAttribute('val') || '000000');
+        }
+        const scheme = find(fill, 'a:schemeClr');
+        if (scheme && this.theme) {
+            const value = scheme.getAttribute('val');
+            const entry = find(this.theme, `a:themeElements/a:clrScheme/a:${PptxDeck.SCHEME_ALIASES[value] || value}`);
+            const entrySrgb = find(entry, 'a:srgbClr');
+            if (entrySrgb) {
+                return '#' + (entrySrgb.getAttribute('val') || '000000');
+            }
+            const system = find(entry, 'a:sysClr');
+            if (system) {
+                return '#' + (system.getAttribute('lastClr') || '000000');
+            }
+        }
+        return null;
+    }
+}
@@ -0,0 +1,115 @@
+// Request/response calls into the viewers' Web Workers
+//
+// A worker script defines a handler object and calls serveWorker(handler,
+// scripts); the page calls it through new WorkerClient(url, fallback). If the
+// worker cannot start or its scripts fail to load (e.g. when the viewer is
+// opened from file://), calls go to the handler returned (or resolved) by
+// fallback(), running in the page instead. A worker that dies after starting
+// (e.g. out of memory on a huge workbook) holds the state of earlier calls, so
+// later calls are rejected rather than sent to a fresh in-page handler.
+
+class WorkerClient {
+    constructor(url, fallback) {
+        this.fallback = fallback;
+        this.requests = new Map();  // id -> { resolve, reject }
+        this.nextId = 1;
+        this.ready = this.start(url);
+    }
+
+    // Resolves to true once the worker has loaded its scripts, false to run in-page
+    start(url) {
+        if (typeof Worker === 'undefined') {
+            return Promise.resolve(false);
+        }
+        return new Promise((resolve) => {
+            try {
+                this.worker = new Worker(url);
+            } catch (error) {
+                resolve(false);
+                return;
+            }
+            this.worker.onmessage = (e) => {
+                if ('ready' in e.data) {
+                    resolve(e.data.ready);
+                    return;
+                }
+                const request = this.requests.get(e.data.id);
+                this.requests.delete(e.data.id);
+                if ('error' in e.data) {
+                    request.reject(new Error(e.data.error));
+                } else {
+                    request.resolve(e.data.result);
+                }
+            };
+            this.worker.onerror = (e) => {
+                e.preventDefault();
+                resolve(false);
+                this.failed = new Error(e.message || `Worker ${url} failed`);
+                for (const request of this.requests.values()) {
+                    request.reject(this.failed);
+                }
+                this.requests.clear();
+                this.terminate();
+            };
+        }).then((ready) => {
+            if (!ready) {
+                this.terminate();
+                console.warn(`Worker ${url} unavailable, running on the main thread`);
+            }
+            return ready;
+        });
+    }
+
+    // Buffers listed in `transfer` are moved to the worker, not copied
+    async call(method, args, transfer = []) {
+        if (!(await this.ready)) {
+            if (!this.local) {
+                this.local = Promise.resolve(this.fallback());
+            }
+            return (await this.local)[method](...args);
+        }
+        if (this.failed) {
+            throw this.failed;
+        }
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            this.requests.set(id, { resolve, reject });
+            this.worker.postMessage({ id, method, args }, transfer);
+        });
+    }
+
+    terminate() {
+        if (this.worker) {
+            this.worker.terminate();
+            this.worker = null;
+        }
+    }
+
+    close() {
+        for (const request of this.requests.values()) {
+            request.reject(new Error('Worker closed'));
+        }
+        this.requests.clear();
+        this.terminate();
+        this.local = null;
+    }
+}
+
+// Worker side: load `scripts`, then answer { id, method, args } messages with handler[method](...args)
+function serveWorker(handler, scripts) {
+    try {
+        importScripts(...scripts);
+    } catch (error) {
+        postMessage({ ready: false, error: error.message });
+        return;
+    }
+    onmessage = async (e) => {
+        const { id, method, args } = e.data;
+        try {
+            postMessage({ id, result: await handler[method](...args) });
+        } catch (error) {
+            postMessage({ id, error: error.message });
+        }
+    };
+    postMessage({ ready: true });
+}
@@ -0,0 +1,103 @@
+// Workbook parsing for the Excel viewers
+//
+// Loaded as a Web Worker, this parses .xlsx files with SheetJS off the main
+// thread and answers requests for row windows, so the page never holds a
+// whole sheet. Loaded with a <script> tag it only defines XlsxSheetStore,
+// which XlsxWorkbook (static/excel_grid.js) uses in-page when workers are
+// unavailable (e.g. when the viewer is opened from file://).
+//
+// Sheets are parsed in dense mode. Large workbooks are opened "on demand":
+// only the sheet names are read up front and each sheet is parsed when it is
+// first shown, keeping just the most recent ones in memory.
+
+const XLSX_URL = 'https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.18.5/xlsx.full.min.js';
+
+class XlsxSheetStore {
+    static ON_DEMAND_BYTES = 4 * 1024 * 1024;
+    static MAX_PARSED_SHEETS = 2;
+
+    open(buffer, options = {}) {
+        const onDemand = options.sheetsOnDemand === undefined
+            ? buffer.byteLength > XlsxSheetStore.ON_DEMAND_BYTES
+            : options.sheetsOnDemand;
+        this.buffer = onDemand ? buffer : null;
+        this.sheets = new Map();    // index -> { sheet, name, rowCount, colCount }, oldest first
+
+        const workbook = XLSX.read(buffer, onDemand
+            ? { type: 'array', bookSheets: true }
+            : { type: 'array', dense: true });
+        this.sheetNames = workbook.SheetNames;
+        if (!onDemand) {
+            this.sheetNames.forEach((name, index) => {
+                this.sheets.set(index + 1, this.describe(workbook.Sheets[name], name));
+            });
+        }
+        return this.sheetNames;
+    }
+
+    // Sheet numbers are 1-based, like pages
+    sheet(index) {
+        let entry = this.sheets.get(index);
+        if (!entry) {
+            const name = this.sheetNames[index - 1];
+            if (name === undefined) {
+                throw new Error(`No sheet ${index}`);
+            }
+            const workbook = XLSX.read(this.buffer, { type: 'array', dense: true, sheets: name });
+            entry = this.describe(workbook.Sheets[name], name);
+        }
+        this.sheets.delete(index);
+        this.sheets.set(index, entry);
+        if (this.buffer) {
+            for (const oldest of this.sheets.keys()) {
+                if (this.sheets.size <= XlsxSheetStore.MAX_PARSED_SHEETS) {
+                    break;
+                }
+                this.sheets.delete(oldest);
+            }
+        }
+        return { name: entry.name, rowCount: entry.rowCount, colCount: entry.colCount };
+    }
+
+    describe(sheet, name) {
+        const range = sheet && sheet['!ref'] ? XLSX.utils.decode_range(sheet['!ref']) : null;
+        return {
+            sheet,
+            name,
+            // Count from A1 so row and column numbers match Excel's
+            rowCount: range ? range.e.r + 1 : 0,
+            colCount: range ? range.e.c + 1 : 0
+        };
+    }
+
+    // Formatted cell text for rows [rowStart, rowEnd) and columns [colStart, colEnd)
+    rows(index, rowStart, rowEnd, colStart, colEnd) {
+        if (!this.sheets.has(index)) {
+            this.sheet(index);
+        }
+        const { sheet, rowCount, colCount } = this.sheets.get(index);
+        // SheetJS 0.18 dense sheets are arrays of rows; later versions keep them in '!data'
+        const data = sheet['!data'] || (Array.isArray(sheet) ? sheet : null);
+        colEnd = Math.min(colEnd, colCount);
+        const rows = [];
+        for (let r = rowStart; r < Math.min(rowEnd, rowCount); r++) {
+            const values = new Array(Math.max(colEnd - colStart, 0)).fill('');
+            const row = data ? data[r] : null;
+            for (let c = colStart; c < colEnd; c++) {
+                const cell = data ? (row && row[c]) : sheet[XLSX.utils.encode_cell({ r, c })];
+                if (cell) {
+                    values[c - colStart] = cell.w !== undefined ? cell.w : (cell.v === undefined ? '' : String(cell.v));
+                }
+            }
+            rows.push(values);
+        }
+        return rows;
+    }
+}
+
+if (typeof importScripts === 'function') {
+    // static/asset_loader.js passes the (hashed) script URLs in the fragment
+    const scripts = self.location.hash ? JSON.parse(decodeURIComponent(self.location.hash.slice(1))) : {};
+    importScripts(scripts.client || 'worker_client.js');
+    serveWorker(new XlsxSheetStore(), [scripts.library || XLSX_URL]);
+}
@@ -0,0 +1,67 @@
+from pypdf import PdfWriter
+from pypdf.generic import RectangleObject
+
+from page_sizes import PageSizes, pdf_page_sizes
+
+LETTER = (612.0, 792.0)
+A4 = (595.28, 841.89)
+
+
+def _sizes(pages):
+    sizes = PageSizes()
+    for page in pages:
+        sizes.append(*page)
+    return sizes
+
+
+def _pages(sizes):
+    return [(round(w, 2), round(h, 2), r) for w, h, r in zip(sizes.widths, sizes.heights, sizes.rotations)]
+
+
+def test_identical_consecutive_pages_merge_into_one_run():
+    sizes = _sizes([LETTER + (0,)] * 3 + [A4 + (0,)] + [LETTER + (90,)] * 2 + [LETTER + (0,)])
+    assert sizes.to_runs() == [
+        [3, 612.0, 792.0, 0],
+        [1, 595.28, 841.89, 0],
+        [2, 612.0, 792.0, 90],
+        [1, 612.0, 792.0, 0],
+    ]
+
+
+def test_runs_round_trip():
+    pages = [LETTER + (0,), LETTER + (0,), A4 + (270,), LETTER + (0,)]
+    sizes = _sizes(pages)
+    restored = PageSizes.from_runs(sizes.to_runs())
+    assert len(restored) == len(pages)
+    assert _pages(restored) == _pages(sizes)
+    assert restored.to_runs() == sizes.to_runs()
+    assert restored.size(3) == sizes.size(3)
+
+
+def test_uniform_table_is_a_single_run():
+    sizes = PageSizes.uniform(2000, *LETTER)
+    assert len(sizes) == 2000
+    assert sizes.to_runs() == [[2000, 612.0, 792.0, 0]]
+    assert PageSizes.from_runs(sizes.to_runs()).size(2000) == LETTER
+
+
+def test_empty_table():
+    assert PageSizes().to_runs() == []
+    assert len(PageSizes.from_runs([])) == 0
+
+
+def test_pdf_sizes_are_as_displayed(tmp_path):
+    writer = PdfWriter()
+    writer.add_blank_page(*LETTER)
+    writer.add_blank_page(*LETTER).rotate(90)
+    cropped = writer.add_blank_page(*LETTER)
+    cropped.cropbox = RectangleObject([0, 0, 300, 400])
+    path = str(tmp_path / 'pages.pdf')
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+    assert pdf_page_sizes(path).to_runs() == [
+        [1, 612.0, 792.0, 0],
+        [1, 792.0, 612.0, 90],
+        [1, 300.0, 400.0, 0],
+    ]
@@ -0,0 +1,112 @@
+import time
+import threading
+
+import pytest
+from PIL import Image
+
+from fork_safety import renew_locks_after_fork
+from render_limits import DocumentQuarantined, Quarantine, RenderLimitExceeded, RenderLimits
+
+
+def _pixel_bomb():
+    raise Image.DecompressionBombError('too many pixels')
+
+
+def _inline_limits(**kwargs):
+    limits = RenderLimits(**kwargs)
+    limits.can_isolate = False
+    return limits
+
+
+def test_quarantined_after_the_allowed_number_of_strikes():
+    quarantine = Quarantine(strikes_allowed=3)
+    for _ in range(2):
+        quarantine.record_strike('doc', 'timeout')
+        assert not quarantine.is_quarantined('doc')
+    quarantine.record_strike('doc', 'timeout')
+    assert quarantine.is_quarantined('doc')
+    assert not quarantine.is_quarantined('other')
+
+    quarantine.release('doc')
+    assert not quarantine.is_quarantined('doc')
+
+
+def test_strikes_persist_across_instances(tmp_path):
+    path = str(tmp_path / 'quarantine.json')
+    first = Quarantine(path, strikes_allowed=2)
+    first.record_strike('doc', 'memory')
+    first.record_strike('doc', 'memory')
+
+    second = Quarantine(path, strikes_allowed=2)
+    assert second.is_quarantined('doc')
+    assert second.entries()['doc']['last_reason'] == 'memory'
+
+
+def test_limit_violations_count_towards_quarantine():
+    limits = _inline_limits(quarantine=Quarantine(strikes_allowed=2))
+    for _ in range(2):
+        with pytest.raises(RenderLimitExceeded, match='pixel budget'):
+            limits.run('doc', _pixel_bomb)
+
+    calls = []
+    with pytest.raises(DocumentQuarantined):
+        limits.run('doc', calls.append, 1)
+    assert calls == []
+    assert limits.run('other', lambda: 'ok') == 'ok'
+
+
+def test_ordinary_errors_are_not_strikes():
+    limits = _inline_limits(quarantine=Quarantine(strikes_allowed=1))
+    with pytest.raises(ValueError):
+        limits.run('doc', int, 'not a number')
+    assert not limits.quarantine.is_quarantined('doc')
+
+
+def test_inline_renders_restore_the_pixel_budget():
+    original = Image.MAX_IMAGE_PIXELS
+    limits = _inline_limits(max_pixels=1234)
+    assert limits.run('doc', lambda: Image.MAX_IMAGE_PIXELS) == 1234
+    assert Image.MAX_IMAGE_PIXELS == original
+
+
+isolated = pytest.mark.skipif(not RenderLimits().can_isolate, reason="needs fork")
+
+
+@isolated
+def test_timeout_kills_the_render_and_records_a_strike():
+    limits = RenderLimits(timeout_s=0.2, quarantine=Quarantine(strikes_allowed=1))
+    start = time.monotonic()
+    with pytest.raises(RenderLimitExceeded, match='timed out'):
+        limits.run('doc', time.sleep, 10)
+    assert time.monotonic() - start < 5
+    assert limits.quarantine.is_quarantined('doc')
+
+
+class _Shared:
+    def __init__(self):
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+
+    def touch(self):
+        with self._lock:
+            return 'rendered'
+
+
+@isolated
+def test_locks_held_by_other_threads_are_free_in_the_child():
+    shared = _Shared()
+    held, done = threading.Event(), threading.Event()
+
+    def hold():
+        with shared._lock:
+            held.set()
+            done.wait(10)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        assert held.wait(5)
+        assert RenderLimits(timeout_s=5).run('doc', shared.touch) == 'rendered'
+    finally:
+        done.set()
+        holder.join()
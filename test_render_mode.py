@@ -0,0 +1,72 @@
+import pytest
+
+from render_mode import CLIENT, SERVER, SMALL_FILE_BYTES, ClientHints, RenderModePolicy
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def document(tmp_path):
+    def make(ext, size):
+        path = tmp_path / f"doc-{size}{ext}"
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        return str(path)
+    return make
+
+
+def test_sheets_always_render_in_the_client(document):
+    policy = RenderModePolicy(force=SERVER)
+    assert policy.decide(document('.xlsx', 100 * MB), ClientHints()) == (CLIENT, 'format')
+
+
+def test_forced_mode_wins_for_server_formats(document):
+    assert RenderModePolicy(force=SERVER).decide(document('.pdf', 1000), ClientHints()) == (SERVER, 'forced')
+    assert RenderModePolicy(force=CLIENT).decide(document('.pdf', 100 * MB), ClientHints()) == (CLIENT, 'forced')
+    # Anything else means auto
+    assert RenderModePolicy(force='auto').decide(document('.pdf', 1000), ClientHints()) == (CLIENT, 'small_file')
+
+
+def test_small_files_go_to_the_client_whatever_the_device(document):
+    hints = ClientHints(device_memory_gb=0.25, effective_type='2g')
+    assert RenderModePolicy().decide(document('.docx', SMALL_FILE_BYTES), hints) == (CLIENT, 'small_file')
+
+
+def test_files_over_the_client_limit_render_on_the_server_even_when_busy(document):
+    policy = RenderModePolicy(client_max_bytes=10 * MB, server_busy_queue=1)
+    assert policy.decide(document('.pdf', 11 * MB), ClientHints(), queue_depth=100) == (SERVER, 'large_file')
+
+
+@pytest.mark.parametrize('hints, expected', [
+    # A 3 MB DOCX parses to ~36 MB: too much for 10% of 0.25 GB, fine for 10% of 8 GB
+    (ClientHints(device_memory_gb=0.25), (SERVER, 'device_memory')),
+    (ClientHints(device_memory_gb=8), (CLIENT, 'capable_client')),
+    (ClientHints(), (CLIENT, 'capable_client')),
+])
+def test_device_memory(document, hints, expected):
+    assert RenderModePolicy().decide(document('.docx', 3 * MB), hints) == expected
+
+
+def test_mobile_without_memory_hint_uses_the_assumed_memory(document):
+    assert RenderModePolicy().decide(document('.docx', 20 * MB), ClientHints(mobile=True)) == (SERVER, 'device_memory')
+
+
+@pytest.mark.parametrize('hints', [
+    ClientHints(effective_type='2g'),
+    ClientHints(downlink_mbps=0.5),
+    ClientHints(save_data=True),
+])
+def test_slow_networks_get_page_images_unless_the_server_is_busy(document, hints):
+    policy = RenderModePolicy(server_busy_queue=10)
+    path = document('.pdf', 2 * MB)
+    assert policy.decide(path, hints, queue_depth=9) == (SERVER, 'slow_network')
+    assert policy.decide(path, hints, queue_depth=10) == (CLIENT, 'server_busy')
+
+
+def test_hints_from_headers_are_overridden_by_viewer_parameters():
+    hints = ClientHints.from_request({'Device-Memory': '8', 'ECT': '4g', 'Sec-CH-UA-Mobile': '?1'},
+                                     {'memory': '0.5', 'ect': '2g'})
+    assert hints.device_memory_gb == 0.5
+    assert hints.effective_type == '2g'
+    assert hints.mobile
+    assert hints.slow_network
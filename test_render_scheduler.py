@@ -0,0 +1,130 @@
+import time
+import threading
+
+import pytest
+
+from render_scheduler import Priority, RenderScheduler, SchedulerRejected
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = RenderScheduler(**kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+class Gate:
+    """A job that occupies a worker until opened."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self._open = threading.Event()
+
+    def __call__(self, result=None):
+        self.started.set()
+        self._open.wait(TIMEOUT)
+        return result
+
+    def open(self):
+        self._open.set()
+
+
+def test_most_urgent_queued_job_runs_first(make_scheduler):
+    scheduler = make_scheduler(workers=1)
+    gate = Gate()
+    scheduler.submit(gate)
+    assert gate.started.wait(TIMEOUT)
+
+    order = []
+    futures = [scheduler.submit(order.append, priority, priority=priority)
+               for priority in (Priority.WARMUP, Priority.THUMBNAIL, Priority.PREFETCH, Priority.VISIBLE)]
+    gate.open()
+    for future in futures:
+        future.result(TIMEOUT)
+    assert order == [Priority.VISIBLE, Priority.PREFETCH, Priority.THUMBNAIL, Priority.WARMUP]
+
+
+def test_per_user_limit_leaves_workers_to_other_users(make_scheduler):
+    scheduler = make_scheduler(workers=3, per_user_limit=1)
+    first, second, other = Gate(), Gate(), Gate()
+    scheduler.submit(first, user='alice')
+    assert first.started.wait(TIMEOUT)
+    second_future = scheduler.submit(second, user='alice')
+    scheduler.submit(other, user='bob')
+
+    # bob starts on a free worker while alice's second job waits for her first
+    assert other.started.wait(TIMEOUT)
+    assert not second.started.wait(0.2)
+    first.open()
+    assert second.started.wait(TIMEOUT)
+    second.open()
+    other.open()
+    second_future.result(TIMEOUT)
+
+
+def test_background_work_leaves_a_worker_for_interactive_requests(make_scheduler):
+    scheduler = make_scheduler(workers=2, reserved_interactive=1)
+    warmups = [Gate(), Gate()]
+    for gate in warmups:
+        scheduler.submit(gate, priority=Priority.WARMUP)
+    assert warmups[0].started.wait(TIMEOUT)
+    assert not warmups[1].started.wait(0.2)
+
+    assert scheduler.submit(lambda: 'page', priority=Priority.VISIBLE).result(TIMEOUT) == 'page'
+    assert scheduler.queue_depths()['warmup'] == 1
+    for gate in warmups:
+        gate.open()
+
+
+def test_jobs_queued_past_their_deadline_are_dropped(make_scheduler):
+    scheduler = make_scheduler(workers=1)
+    gate = Gate()
+    scheduler.submit(gate)
+    assert gate.started.wait(TIMEOUT)
+
+    stale = scheduler.submit(lambda: 'late', priority=Priority.PREFETCH, deadline=0.05)
+    fresh = scheduler.submit(lambda: 'on time', priority=Priority.PREFETCH, deadline=TIMEOUT)
+    time.sleep(0.1)
+    gate.open()
+    with pytest.raises(SchedulerRejected, match='deadline'):
+        stale.result(TIMEOUT)
+    assert fresh.result(TIMEOUT) == 'on time'
+
+
+def test_newer_job_supersedes_queued_ones_with_the_same_key(make_scheduler):
+    scheduler = make_scheduler(workers=1)
+    gate = Gate()
+    scheduler.submit(gate)
+    assert gate.started.wait(TIMEOUT)
+
+    page_2 = scheduler.submit(lambda: 2, replaces='alice-view')
+    page_3 = scheduler.submit(lambda: 3, replaces='alice-view')
+    other = scheduler.submit(lambda: 'bob', replaces='bob-view')
+    gate.open()
+    with pytest.raises(SchedulerRejected, match='superseded'):
+        page_2.result(TIMEOUT)
+    assert page_3.result(TIMEOUT) == 3
+    assert other.result(TIMEOUT) == 'bob'
+
+
+def test_full_queue_rejects_new_work(make_scheduler):
+    scheduler = make_scheduler(workers=1, max_queue={Priority.PREFETCH: 1})
+    gate = Gate()
+    scheduler.submit(gate)
+    assert gate.started.wait(TIMEOUT)
+
+    queued = scheduler.submit(lambda: 'queued', priority=Priority.PREFETCH)
+    rejected = scheduler.submit(lambda: 'rejected', priority=Priority.PREFETCH)
+    with pytest.raises(SchedulerRejected, match='queue_full'):
+        rejected.result(TIMEOUT)
+    gate.open()
+    assert queued.result(TIMEOUT) == 'queued'
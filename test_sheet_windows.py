@@ -0,0 +1,72 @@
+import openpyxl
+import pytest
+
+from render_cache import RenderCache
+from sheet_windows import INDEX_STRIDE, MAX_WINDOW_ROWS, SheetWindows
+
+ROWS = INDEX_STRIDE * 2 + 45
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Data'
+    for r in range(ROWS):
+        ws.append([r, f"item {r}", r * 1.5, None])
+    ws.cell(row=1, column=3).number_format = '0.00%'
+    wb.create_sheet('Empty')
+    path = str(tmp_path / 'book.xlsx')
+    wb.save(path)
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / 'cache'))
+
+
+def test_offset_index_has_one_entry_per_stride(workbook, cache):
+    index = SheetWindows(cache)._index(workbook, 1)
+    assert len(index.offsets) == -(-ROWS // INDEX_STRIDE)
+    assert index.offsets[0] == 0
+
+
+@pytest.mark.parametrize('row_start', [0, 5, INDEX_STRIDE - 1, INDEX_STRIDE, INDEX_STRIDE + 1, ROWS - 3])
+def test_window_rows_match_the_sheet_across_stride_boundaries(workbook, cache, row_start):
+    window = SheetWindows(cache).window(workbook, 1, row_start, row_start + 3, 0, 2)
+    expected = [[r, f"item {r}"] for r in range(row_start, min(row_start + 3, ROWS))]
+    assert window['cells'] == expected
+    assert window['row_start'] == row_start
+    assert (window['rows'], window['cols']) == (ROWS, 3)
+
+
+def test_number_formats_and_trailing_empty_cells(workbook, cache):
+    window = SheetWindows(cache).window(workbook, 1, 0, 2)
+    assert window['formats'] == ['0.00%']
+    # Formatted cells carry the index of their format; the empty fourth column is dropped
+    assert window['cells'] == [[0, 'item 0', [0, 0]], [1, 'item 1', 1.5]]
+
+
+def test_windows_are_clipped(workbook, cache):
+    window = SheetWindows(cache).window(workbook, 1, ROWS - 2, ROWS + MAX_WINDOW_ROWS * 2, 2, 50)
+    assert window['cells'] == [[(ROWS - 2) * 1.5], [(ROWS - 1) * 1.5]]
+
+
+def test_index_is_reused_from_the_cache(workbook, cache, monkeypatch):
+    SheetWindows(cache).sheet_info(workbook, 1)
+
+    def rebuild(*args):
+        raise AssertionError("index rebuilt")
+
+    reopened = SheetWindows(cache)
+    monkeypatch.setattr(reopened, '_build', rebuild)
+    assert reopened.window(workbook, 1, INDEX_STRIDE + 7, INDEX_STRIDE + 8, 0, 1)['cells'] == [[INDEX_STRIDE + 7]]
+
+
+def test_sheet_names_and_missing_sheets(workbook, cache):
+    windows = SheetWindows(cache)
+    assert windows.sheet_names(workbook) == ['Data', 'Empty']
+    assert windows.sheet_info(workbook, 2)['rows'] == 0
+    with pytest.raises(IndexError):
+        windows.sheet_info(workbook, 3)
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight
+
+CALLERS = 8
+
+
+def _fan_out(flight, key, fn):
+    """Call `flight.do(key, fn)` from CALLERS threads; returns (threads, results, errors)."""
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(CALLERS)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    release = threading.Event()
+    joined = threading.Semaphore(0)
+    calls = []
+
+    def render():
+        calls.append(1)
+        release.wait(5)
+        return 'page'
+
+    flight = SingleFlight(on_coalesced=lambda key: joined.release())
+    threads, results, errors = _fan_out(flight, 'doc-1', render)
+    # Every caller but the leader has joined before the leader finishes
+    for _ in range(CALLERS - 1):
+        assert joined.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['page'] * CALLERS
+    assert errors == []
+    assert flight.in_flight() == 0
+
+
+def test_followers_receive_the_leaders_exception():
+    release = threading.Event()
+    joined = threading.Semaphore(0)
+    failure = ValueError('corrupt page')
+
+    def render():
+        release.wait(5)
+        raise failure
+
+    flight = SingleFlight(on_coalesced=lambda key: joined.release())
+    threads, results, errors = _fan_out(flight, 'doc-1', render)
+    for _ in range(CALLERS - 1):
+        assert joined.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == []
+    assert len(errors) == CALLERS
+    assert all(error is failure for error in errors)
+    assert flight.in_flight() == 0
+
+
+def test_completed_calls_are_not_cached():
+    flight = SingleFlight()
+    counter = iter(range(10))
+    assert flight.do('k', lambda: next(counter)) == 0
+    assert flight.do('k', lambda: next(counter)) == 1
+
+
+def test_an_exception_does_not_stick_to_the_key():
+    def fail():
+        raise RuntimeError('boom')
+
+    flight = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flight.do('k', fail)
+    assert flight.do('k', lambda: 'ok') == 'ok'
+
+
+def test_distinct_keys_run_independently():
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def render(page):
+        started.release()
+        release.wait(5)
+        return page
+
+    flight = SingleFlight()
+    results = {}
+    threads = [threading.Thread(target=lambda p=p: results.update({p: flight.do(p, render, p)})) for p in (1, 2)]
+    for thread in threads:
+        thread.start()
+    # Both run at once: neither waits for the other
+    assert started.acquire(timeout=5) and started.acquire(timeout=5)
+    assert flight.in_flight() == 2
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == {1: 1, 2: 2}
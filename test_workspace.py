@@ -0,0 +1,63 @@
+from workspace import MemoryBudget, OpenDocument, Workspace
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    budget = MemoryBudget(max_bytes=300)
+    budget.put('a', 'page a', 100, owner='doc-1')
+    budget.put('b', 'page b', 100, owner='doc-1')
+    budget.put('c', 'page c', 100, owner='doc-2')
+    assert budget.get('a') == 'page a'     # now most recently used
+
+    budget.put('d', 'page d', 100, owner='doc-2')
+    assert budget.get('b') is None
+    assert [budget.get(key) for key in ('a', 'c', 'd')] == ['page a', 'page c', 'page d']
+    assert budget.used == 300
+
+
+def test_one_put_evicts_as_many_entries_as_needed():
+    budget = MemoryBudget(max_bytes=300)
+    for key in 'abc':
+        budget.put(key, key, 100, owner='doc')
+    budget.put('big', 'big', 250, owner='doc')
+    assert [budget.get(key) for key in 'abc'] == [None, None, None]
+    assert budget.get('big') == 'big'
+    assert budget.used == 250
+
+
+def test_replacing_an_entry_accounts_for_its_new_size():
+    budget = MemoryBudget(max_bytes=300)
+    budget.put('a', 'small', 50, owner='doc')
+    budget.put('a', 'large', 200, owner='doc')
+    assert budget.get('a') == 'large'
+    assert budget.used == 200
+
+
+def test_entries_larger_than_the_budget_are_not_held():
+    budget = MemoryBudget(max_bytes=100)
+    budget.put('a', 'page a', 60, owner='doc')
+    budget.put('huge', 'huge', 101, owner='doc')
+    assert budget.get('huge') is None
+    assert budget.get('a') == 'page a'
+
+
+def test_release_drops_every_entry_of_an_owner():
+    budget = MemoryBudget(max_bytes=1000)
+    budget.put('a', 'a', 100, owner='doc-1')
+    budget.put('b', 'b', 100, owner='doc-2')
+    budget.put('c', 'c', 100, owner='doc-1')
+    assert budget.release('doc-1') == 2
+    assert budget.get('a') is None and budget.get('c') is None
+    assert budget.get('b') == 'b'
+    assert budget.used == 100
+    assert budget.release('doc-1') == 0
+
+
+def test_workspace_closes_its_least_recently_used_document():
+    workspace = Workspace(max_documents=2)
+    first, second, third = (OpenDocument(f"/{n}.pdf", n, n, 1) for n in ('one', 'two', 'three'))
+    workspace.activate(first)
+    workspace.activate(second)
+    workspace.activate(first)
+    assert workspace.activate(third) == [second]
+    assert list(workspace.documents) == ['one', 'three']
+    assert workspace.active is third
@@ -1,13 +1,36 @@
 import gradio as gr
 import os
 from document_previewer import DocumentPreviewer
+from metrics import maybe_start_metrics_server, span
+from profiler import SlowRenderProfiler
+from render_cache import RenderCache
+from render_limits import RenderLimits
+from document_store import DocumentStore
+from render_scheduler import RenderScheduler, Priority, SchedulerRejected
+from search_index import SearchIndex, extract_pages, query_terms
+from page_navigator import navigator_html, add_page_jump, blocks_kwargs, launch_kwargs
+from workspace import MemoryBudget, OpenDocument, WorkspaceManager
 
 class DocumentPreviewApp:
     def __init__(self):
-        self.previewer = DocumentPreviewer()
-        self.current_file = None
-        self.current_page = 1
-        self.total_pages = 0
+        # Opt-in slow request profiling (DOCPREVIEW_PROFILE_DIR); renders in limit children are profiled there
+        self.profiler = SlowRenderProfiler.from_env()
+        # Pages held in memory across all sessions, within one budget (DOCPREVIEW_WORKSPACE_MEMORY_MB)
+        self.memory = MemoryBudget.from_env()
+        self.previewer = DocumentPreviewer(
+            cache=RenderCache(os.environ.get('DOCPREVIEW_CACHE_DIR', '.render_cache')),
+            profiler=self.profiler,
+            limits=RenderLimits.from_env(),
+            memory=self.memory
+        )
+        # Visible pages go ahead of prefetch, thumbnails and warm-up work
+        self.scheduler = RenderScheduler(workers=int(os.environ.get('DOCPREVIEW_RENDER_WORKERS', 4)))
+        # Uploaded documents, deduplicated by content hash
+        self.store = DocumentStore(os.environ.get('DOCPREVIEW_STORE_DIR', '.document_store'))
+        # Page-level full-text index (SQLite FTS5)
+        self.search_index = SearchIndex(os.environ.get('DOCPREVIEW_SEARCH_DB', '.search_index.sqlite3'))
+        # Documents each session has open, with their current page and search terms
+        self.workspaces = WorkspaceManager.from_env(self.previewer)
         
         # Sample documents for demo
         self.sample_docs = {
@@ -17,78 +40,236 @@ class DocumentPreviewApp:
             "Sample Excel (5 sheets)": "/home/ubuntu/gradio_document_previewer/sample_docs/sample_excel.xlsx"
         }
     
-    def load_document(self, sample_doc):
-        """Load a document and return the first page preview with navigation."""
+    def _workspace(self, request=None):
+        """The requesting session's workspace."""
+        return self.workspaces.workspace(request.session_hash if request is not None else None)
+    
+    def render_visible_page(self, document, page_number, request=None):
+        """Render the page the user is looking at, then prefetch its neighbours."""
+        user = request.session_hash if request is not None else None
+        # A newer page request from the same user supersedes a still-queued one
+        future = self.scheduler.submit(
+            self.previewer.preview_page, document.path, page_number, document.highlight_terms,
+            priority=Priority.VISIBLE, user=user, replaces=(user, 'visible')
+        )
+        preview_image = future.result()
+        
+        for neighbour in (page_number + 1, page_number - 1):
+            if 1 <= neighbour <= document.page_count:
+                self.scheduler.submit(
+                    self.previewer.render_page, document.path, neighbour,
+                    priority=Priority.PREFETCH, user=user, replaces=(user, 'prefetch', neighbour)
+                )
+        return preview_image
+    
+    def analyse_document(self, file_path, thumbnail_pages=20):
+        """Background analysis of an ingested document: page count and thumbnails."""
+        page_count = self.previewer.get_page_count(file_path)
+        for page_number in range(1, min(page_count, thumbnail_pages) + 1):
+            self.scheduler.submit(self.previewer.get_thumbnail, file_path, page_number, priority=Priority.THUMBNAIL)
+        return page_count
+    
+    def index_document(self, file_path):
+        """Add a document's page texts to the search index (no-op if already indexed)."""
+        doc_key = self.previewer.cache.document_key(file_path)
+        if self.search_index.is_indexed(doc_key):
+            return 0
+        with span('index', format=os.path.splitext(file_path.lower())[1]):
+            # Extract under the render limits, like every other parse of an uploaded document
+            pages = self.previewer.run_limited(file_path, extract_pages, file_path)
+            return self.search_index.index_document(
+                file_path, doc_key, name=os.path.basename(file_path),
+                page_count=self.previewer.get_page_count(file_path), pages=pages
+            )
+    
+    def search_document(self, query, request: gr.Request = None):
+        """Search the current document and jump to the best matching page."""
+        document = self._workspace(request).active
+        if document is None:
+            return gr.update(choices=[], value=None), gr.update(), "No document loaded.", gr.update(), gr.update()
+        if not query or not query.strip():
+            document.highlight_terms = []
+            return gr.update(choices=[], value=None), gr.update(), "Enter text to search for.", gr.update(), gr.update()
+        
         try:
-            if sample_doc == "Select a sample document...":
-                return None, "Please select a document", "", gr.update(visible=False)
-            
-            file_path = self.sample_docs[sample_doc]
-            self.current_file = file_path
-            
-            if not os.path.exists(self.current_file):
-                return None, f"File not found: {self.current_file}", "", gr.update(visible=False)
-            
-            if not self.previewer.is_supported(self.current_file):
-                return None, "Unsupported file format.", "", gr.update(visible=False)
-            
-            # Get total pages and load first page
-            self.total_pages = self.previewer.get_page_count(self.current_file)
-            self.current_page = 1
-            
-            if self.total_pages == 0:
-                return None, "Could not read the document.", "", gr.update(visible=False)
+            # Indexing normally happens in the background; do it now if it has not run yet
+            self.index_document(document.path)
+            with span('handler', handler='search'):
+                hits = self.search_index.search(query, doc_key=document.doc_key)
+        except Exception as e:
+            return gr.update(choices=[], value=None), gr.update(), f"Error searching document: {str(e)}", gr.update(), gr.update()
+        
+        if not hits:
+            document.highlight_terms = []
+            return gr.update(choices=[], value=None), gr.update(), f"No matches for \"{query}\".", gr.update(), gr.update()
+        
+        # Highlights are drawn over the cached page render, so jumping between hits stays cheap
+        document.highlight_terms = query_terms(query)
+        
+        choices = [(f"Page {hit['page']}: {' '.join(hit['snippet'].split())}", hit['page']) for hit in hits]
+        preview_image, status, nav_info, page_links = self.navigate_to_page(hits[0]['page'], request)
+        if isinstance(status, str):
+            status = f"{len(hits)} matching page(s) for \"{query}\". {status}"
+        return gr.update(choices=choices, value=hits[0]['page']), preview_image, status, nav_info, page_links
+    
+    def open_search_hit(self, page_number, request: gr.Request = None):
+        """Jump to the page of a selected search hit."""
+        document = self._workspace(request).active
+        if page_number is None or document is None or page_number == document.current_page:
+            return gr.update(), gr.update(), gr.update(), gr.update()
+        return self.navigate_to_page(page_number, request)
+    
+    def load_upload(self, upload_path, request: gr.Request = None):
+        """Ingest an uploaded file into the document store and open it."""
+        if not upload_path:
+            return None, "Please upload a document", "", gr.update(visible=False), gr.update()
+        
+        if not self.previewer.is_supported(upload_path):
+            return None, "Unsupported file format.", "", gr.update(visible=False), gr.update()
+        
+        try:
+            # Gradio has already spooled the upload to a temp file; stream it into the store
+            stored = self.store.ingest(upload_path, os.path.basename(upload_path))
+        except OSError as e:
+            return None, f"Error storing upload: {str(e)}", "", gr.update(visible=False), gr.update()
+        
+        self.previewer.cache.remember(stored.path, stored.doc_key)
+        if stored.is_new:
+            self.scheduler.submit(self.analyse_document, stored.path, priority=Priority.WARMUP)
+        
+        result = self.open_document(stored.path, request)
+        if not stored.is_new and result[0] is not None:
+            result = (result[0], f"{result[1]} (already known document, cached renders reused)") + result[2:]
+        return result
+    
+    def load_document(self, sample_doc, request: gr.Request = None):
+        """Load a sample document and return the first page preview with navigation."""
+        if sample_doc == "Select a sample document...":
+            return None, "Please select a document", "", gr.update(visible=False), gr.update()
+        
+        return self.open_document(self.sample_docs[sample_doc], request)
+    
+    def open_document(self, file_path, request: gr.Request = None):
+        """Open a document in the session's workspace and show its current page."""
+        try:
+            if not os.path.exists(file_path):
+                return None, f"File not found: {file_path}", "", gr.update(visible=False), gr.update()
             
-            # Generate preview for first page
-            preview_image = self.previewer.preview_page(self.current_file, self.current_page)
+            if not self.previewer.is_supported(file_path):
+                return None, "Unsupported file format.", "", gr.update(visible=False), gr.update()
             
-            # Generate navigation info
-            nav_info = self.generate_navigation_info()
+            workspace = self._workspace(request)
+            doc_key = self.previewer.cache.document_key(file_path)
+            document = workspace.get(doc_key)
+            if document is not None:
+                # Already open here: go back to where the user left it
+                status = f"Back to {document.name}"
+            else:
+                known = self.workspaces.find(doc_key)
+                if known is not None:
+                    # Open in another session: its metadata is reused as is
+                    document = OpenDocument(file_path, known.name, doc_key, known.page_count, known.page_sizes)
+                else:
+                    # Sizes first: the same pass stores the page count in the cache metadata
+                    page_sizes = self.previewer.get_page_sizes(file_path)
+                    page_count = self.previewer.get_page_count(file_path)
+                    if page_count == 0:
+                        return None, "Could not read the document.", "", gr.update(visible=False), gr.update()
+                    document = OpenDocument(file_path, os.path.basename(file_path), doc_key, page_count, page_sizes)
+                    self.scheduler.submit(self.index_document, file_path, priority=Priority.WARMUP)
+                status = f"Document loaded successfully! Total pages: {document.page_count}"
+            self.workspaces.open(workspace, document)
             
-            # Generate page links
-            page_links = self.generate_page_links()
+            with span('handler', handler='load_document'):
+                preview_image = self.render_visible_page(document, document.current_page, request)
             
-            return preview_image, f"Document loaded successfully! Total pages: {self.total_pages}", nav_info, gr.update(visible=True, value=page_links)
+            return (preview_image, status, self.generate_navigation_info(document),
+                    gr.update(visible=True, value=self.generate_page_links(document)), self.open_documents_update(workspace))
             
         except Exception as e:
-            return None, f"Error loading document: {str(e)}", "", gr.update(visible=False)
+            return None, f"Error loading document: {str(e)}", "", gr.update(visible=False), gr.update()
+    
+    def switch_document(self, doc_key, request: gr.Request = None):
+        """Show another document open in the workspace, at the page it was left on."""
+        workspace = self._workspace(request)
+        document = workspace.get(doc_key) if doc_key else None
+        if document is None or document is workspace.active:
+            return gr.update(), gr.update(), gr.update(), gr.update(), gr.update()
+        return self.open_document(document.path, request)
+    
+    def close_document(self, request: gr.Request = None):
+        """Close the shown document and switch to the most recently used one left."""
+        workspace = self._workspace(request)
+        if workspace.active is None:
+            return None, "No document loaded.", "", gr.update(visible=False), self.open_documents_update(workspace)
+        
+        name = workspace.active.name
+        document = self.workspaces.close(workspace, workspace.active.doc_key)
+        if document is None:
+            return (None, f"Closed {name}.", "No document loaded", gr.update(visible=False),
+                    self.open_documents_update(workspace))
+        result = self.open_document(document.path, request)
+        return (result[0], f"Closed {name}. {result[1]}") + result[2:]
+    
+    def open_documents_update(self, workspace):
+        """Choices and selection of the open documents selector."""
+        return gr.update(choices=workspace.choices(),
+                         value=workspace.active.doc_key if workspace.active is not None else None)
     
-    def navigate_to_page(self, page_number):
-        """Navigate to a specific page."""
+    def navigate_to_page(self, page_number, request: gr.Request = None):
+        """Navigate to a specific page; the navigation panel is re-sent to highlight it."""
         try:
-            if not self.current_file:
-                return None, "No document loaded.", ""
+            document = self._workspace(request).active
+            if document is None:
+                return None, "No document loaded.", "", gr.update()
             
-            if page_number is None or page_number < 1 or page_number > self.total_pages:
-                return None, f"Invalid page number. Please enter a number between 1 and {self.total_pages}.", ""
+            if page_number is None or page_number < 1 or page_number > document.page_count:
+                return None, f"Invalid page number. Please enter a number between 1 and {document.page_count}.", "", gr.update()
             
-            self.current_page = int(page_number)
-            preview_image = self.previewer.preview_page(self.current_file, self.current_page)
-            nav_info = self.generate_navigation_info()
+            document.current_page = int(page_number)
+            document.touch()
+            with span('handler', handler='navigate_to_page'):
+                preview_image = self.render_visible_page(document, document.current_page, request)
+            nav_info = self.generate_navigation_info(document)
             
-            return preview_image, f"Navigated to page {self.current_page}", nav_info
+            return (preview_image, f"Navigated to page {document.current_page}", nav_info,
+                    gr.update(value=self.generate_page_links(document)))
             
+        except SchedulerRejected:
+            # Superseded by a newer navigation or dropped under load: keep the current view
+            return gr.update(), gr.update(), gr.update(), gr.update()
         except Exception as e:
-            return None, f"Error navigating to page: {str(e)}", ""
+            return None, f"Error navigating to page: {str(e)}", "", gr.update()
     
-    def navigate_prev(self):
+    def navigate_prev(self, request: gr.Request = None):
         """Navigate to previous page."""
-        if self.current_page > 1:
-            return self.navigate_to_page(self.current_page - 1)
-        return None, "Already at the first page.", self.generate_navigation_info()
+        document = self._workspace(request).active
+        if document is not None and document.current_page > 1:
+            return self.navigate_to_page(document.current_page - 1, request)
+        return None, "Already at the first page.", self.generate_navigation_info(document), gr.update()
     
-    def navigate_next(self):
+    def navigate_next(self, request: gr.Request = None):
         """Navigate to next page."""
-        if self.current_page < self.total_pages:
-            return self.navigate_to_page(self.current_page + 1)
-        return None, "Already at the last page.", self.generate_navigation_info()
+        document = self._workspace(request).active
+        if document is not None and document.current_page < document.page_count:
+            return self.navigate_to_page(document.current_page + 1, request)
+        return None, "Already at the last page.", self.generate_navigation_info(document), gr.update()
     
-    def generate_navigation_info(self):
+    def slow_render_report(self):
+        """List the slowest profiled renders for the admin view."""
+        if self.profiler is None:
+            return []
+        return [
+            [row['seconds'], row['file'], row['page'], row['format'], row['occurrences'], row['doc_key'][:12], row['profile']]
+            for row in self.profiler.worst_offenders()
+        ]
+    
+    def generate_navigation_info(self, document):
         """Generate navigation information text."""
-        if not self.current_file:
+        if document is None:
             return ""
         
-        file_name = os.path.basename(self.current_file)
+        file_name = document.name
         file_ext = os.path.splitext(file_name)[1].upper()
         
         if file_ext == '.PDF':
@@ -100,14 +281,14 @@ class DocumentPreviewApp:
         else:
             page_type = "Page"
         
-        return f"📄 {file_name} | {page_type} {self.current_page} of {self.total_pages}"
+        return f"📄 {file_name} | {page_type} {document.current_page} of {document.page_count}"
     
-    def generate_page_links(self):
-        """Generate HTML with clickable page links."""
-        if not self.current_file or self.total_pages == 0:
+    def generate_page_links(self, document):
+        """Generate the quick-navigation panel for a document."""
+        if document is None or document.page_count == 0:
             return ""
         
-        file_ext = os.path.splitext(self.current_file)[1].upper()
+        file_ext = os.path.splitext(document.path)[1].upper()
         
         if file_ext == '.PDF':
             page_type = "Page"
@@ -118,69 +299,16 @@ class DocumentPreviewApp:
         else:
             page_type = "Page"
         
-        html = f"""
-        <div style="padding: 15px; background-color: #f8f9fa; border-radius: 8px; margin: 10px 0;">
-            <h3 style="margin-top: 0; color: #333;">Quick Navigation - Click any {page_type.lower()} to jump to it!</h3>
-            <div style="display: flex; flex-wrap: wrap; gap: 8px; margin-top: 15px;">
-        """
-        
-        for i in range(1, self.total_pages + 1):
-            if i == self.current_page:
-                # Current page - highlighted
-                html += f"""
-                <span style="
-                    padding: 8px 12px; 
-                    background-color: #007bff; 
-                    color: white; 
-                    border-radius: 4px; 
-                    font-weight: bold;
-                    min-width: 40px;
-                    text-align: center;
-                    display: inline-block;
-                ">{page_type} {i}</span>
-                """
-            else:
-                # Other pages - clickable links
-                html += f"""
-                <button onclick="
-                    document.querySelector('input[placeholder=\\"Enter page number\\"]').value = '{i}';
-                    document.querySelector('input[placeholder=\\"Enter page number\\"]').dispatchEvent(new Event('input', {{bubbles: true}}));
-                    setTimeout(() => {{
-                        const buttons = document.querySelectorAll('button');
-                        for(let btn of buttons) {{
-                            if(btn.textContent.trim() === 'Go to Page') {{
-                                btn.click();
-                                break;
-                            }}
-                        }}
-                    }}, 100);
-                " style="
-                    padding: 8px 12px; 
-                    background-color: #e9ecef; 
-                    color: #495057; 
-                    border: 1px solid #ced4da; 
-                    border-radius: 4px; 
-                    cursor: pointer;
-                    min-width: 40px;
-                    text-align: center;
-                    transition: all 0.2s;
-                " onmouseover="this.style.backgroundColor='#dee2e6'" 
-                   onmouseout="this.style.backgroundColor='#e9ecef'">{page_type} {i}</button>
-                """
-        
-        html += """
-            </div>
-            <p style="margin-top: 15px; margin-bottom: 0; color: #666; font-size: 0.9em;">
-                💡 <strong>Tip:</strong> You can also use the Previous/Next buttons or enter a page number manually.
-            </p>
-        </div>
-        """
-        
-        return html
+        # The buttons themselves are built client-side, only for the visible range
+        return navigator_html(
+            document.page_count, document.current_page, page_type,
+            title=f"Quick Navigation - Click any {page_type.lower()} to jump to it!",
+            tip="💡 <strong>Tip:</strong> You can also use the Previous/Next buttons or enter a page number manually."
+        )
     
     def create_interface(self):
         """Create the Gradio interface."""
-        with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft()) as interface:
+        with gr.Blocks(title="Document Previewer", theme=gr.themes.Soft(), **blocks_kwargs()) as interface:
             gr.Markdown("""
             # 📄 Document Previewer
             
@@ -199,6 +327,23 @@ class DocumentPreviewApp:
                         label="Try a Sample Document"
                     )
                     
+                    # Upload your own document
+                    upload_file = gr.File(
+                        label="Or Upload a Document",
+                        file_types=[".pdf", ".docx", ".pptx", ".xlsx"],
+                        type="filepath"
+                    )
+                    
+                    # Documents open in this session; switching keeps each one's page and search
+                    with gr.Row():
+                        open_docs = gr.Dropdown(
+                            label="Open Documents",
+                            choices=[],
+                            interactive=True,
+                            scale=3
+                        )
+                        close_btn = gr.Button("✖️ Close", variant="secondary", scale=1)
+                    
                     # Navigation controls
                     gr.Markdown("### 🧭 Navigation")
                     
@@ -220,6 +365,18 @@ class DocumentPreviewApp:
                             precision=0
                         )
                         go_btn = gr.Button("Go to Page", variant="primary")
+                    
+                    gr.Markdown("### 🔍 Search")
+                    
+                    search_input = gr.Textbox(
+                        label="Search in Document",
+                        placeholder="Type words and press Enter"
+                    )
+                    search_results = gr.Dropdown(
+                        label="Matching Pages",
+                        choices=[],
+                        interactive=True
+                    )
                 
                 with gr.Column(scale=2):
                     gr.Markdown("### 👁️ Document Preview")
@@ -240,30 +397,71 @@ class DocumentPreviewApp:
             
             # Page navigation links (initially hidden)
             page_links = gr.HTML(visible=False)
+            # Clicks in the navigation panel send the page number as one event
+            add_page_jump(self.navigate_to_page, [preview_image, status_msg, nav_info, page_links])
             
             # Event handlers
             sample_dropdown.change(
                 fn=self.load_document,
                 inputs=[sample_dropdown],
-                outputs=[preview_image, status_msg, nav_info, page_links]
+                outputs=[preview_image, status_msg, nav_info, page_links, open_docs]
+            )
+            
+            upload_file.upload(
+                fn=self.load_upload,
+                inputs=[upload_file],
+                outputs=[preview_image, status_msg, nav_info, page_links, open_docs]
+            )
+            
+            open_docs.input(
+                fn=self.switch_document,
+                inputs=[open_docs],
+                outputs=[preview_image, status_msg, nav_info, page_links, open_docs]
+            )
+            
+            close_btn.click(
+                fn=self.close_document,
+                outputs=[preview_image, status_msg, nav_info, page_links, open_docs]
             )
             
             prev_btn.click(
                 fn=self.navigate_prev,
-                outputs=[preview_image, status_msg, nav_info]
+                outputs=[preview_image, status_msg, nav_info, page_links]
             )
             
             next_btn.click(
                 fn=self.navigate_next,
-                outputs=[preview_image, status_msg, nav_info]
+                outputs=[preview_image, status_msg, nav_info, page_links]
             )
             
             go_btn.click(
                 fn=self.navigate_to_page,
                 inputs=[page_input],
-                outputs=[preview_image, status_msg, nav_info]
+                outputs=[preview_image, status_msg, nav_info, page_links]
             )
             
+            search_input.submit(
+                fn=self.search_document,
+                inputs=[search_input],
+                outputs=[search_results, preview_image, status_msg, nav_info, page_links]
+            )
+            
+            search_results.input(
+                fn=self.open_search_hit,
+                inputs=[search_results],
+                outputs=[preview_image, status_msg, nav_info, page_links]
+            )
+            
+            # Admin view of profiled slow renders (only when profiling is enabled)
+            with gr.Accordion("🐢 Slow Renders (Admin)", open=False, visible=self.profiler is not None):
+                slow_renders = gr.Dataframe(
+                    headers=["Seconds", "File", "Page", "Format", "Occurrences", "Document Hash", "Profile"],
+                    value=self.slow_render_report,
+                    interactive=False
+                )
+                refresh_btn = gr.Button("🔄 Refresh", variant="secondary")
+                refresh_btn.click(fn=self.slow_render_report, outputs=[slow_renders])
+            
             # Add demo section
             with gr.Accordion("📚 Demo Examples & Features", open=True):
                 gr.Markdown("""
@@ -278,6 +476,7 @@ class DocumentPreviewApp:
                 - ✅ **Clickable Page Navigation**: Click on page numbers to jump directly to any page
                 - ✅ **Sequential Navigation**: Use Previous/Next buttons for step-by-step browsing
                 - ✅ **Direct Page Input**: Enter a specific page number and click "Go to Page"
+                - ✅ **Full-Text Search**: Search the document and jump straight to highlighted matches
                 - ✅ **Multiple File Formats**: Supports PDF, DOCX, PPTX, and Excel files
                 - ✅ **Visual Preview**: See actual document content rendered as images
                 - ✅ **Responsive Interface**: Works on both desktop and mobile devices
@@ -292,6 +491,9 @@ class DocumentPreviewApp:
         return interface
 
 def main():
+    # Serve Prometheus metrics when DOCPREVIEW_METRICS_PORT is set
+    maybe_start_metrics_server()
+    
     app = DocumentPreviewApp()
     interface = app.create_interface()
     
@@ -300,7 +502,8 @@ def main():
         server_name="0.0.0.0",
         server_port=7862,
         share=False,
-        show_error=True
+        show_error=True,
+        **launch_kwargs()
     )
 
 if __name__ == "__main__":
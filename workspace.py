@@ -0,0 +1,263 @@
+"""Per-session document workspaces with memory budgets shared across sessions.
+
+A session keeps several documents open at once. Switching back to one shows
+it at the page it was left on, without opening or counting anything again.
+State per document comes in two weights:
+
+- metadata (path, content hash, page count, page sizes, current page, search
+  terms) is a few hundred bytes and kept while the document stays open;
+- heavy state (rendered pages held in memory and parsed decks, see
+  `DocumentPreviewer.memory`) lives in one `MemoryBudget` shared by every
+  session, least recently used first out once the budget is exceeded.
+
+Documents nobody has looked at for `idle_seconds` are put to sleep: their
+heavy state is released and their metadata kept, so reopening one is instant
+and only its page has to come from the disk render cache again. A session
+idle for `session_ttl` is dropped along with its documents.
+
+Environment variables:
+    DOCPREVIEW_WORKSPACE_MEMORY_MB=N      shared budget for pages and parsed documents
+    DOCPREVIEW_WORKSPACE_DOCUMENTS=N      documents kept open per session
+    DOCPREVIEW_WORKSPACE_IDLE_S=N         seconds before an unviewed document sleeps
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from fork_safety import renew_locks_after_fork
+from metrics import registry as metrics
+
+DEFAULT_MEMORY_MB = 256
+DEFAULT_MAX_DOCUMENTS = 8
+DEFAULT_IDLE_SECONDS = 600.0
+DEFAULT_SESSION_TTL = 6 * 3600.0
+# Idle documents are looked for at most this often, on the next request
+SWEEP_INTERVAL = 30.0
+
+
+class MemoryBudget:
+    """Byte-accounted LRU of in-memory objects, shared by every session.
+
+    Each entry belongs to an owner (a document), so all that is held for a
+    document can be released at once.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._lock = threading.Lock()
+        renew_locks_after_fork(self)
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()   # key -> (value, size, owner)
+
+        self._used_gauge = metrics.gauge('docpreview_workspace_memory_bytes', 'Bytes held in the shared workspace budget')
+        self._evictions = metrics.counter('docpreview_workspace_evictions_total', 'Objects dropped from the workspace budget')
+
+    @classmethod
+    def from_env(cls) -> 'MemoryBudget':
+        return cls(int(float(os.environ.get('DOCPREVIEW_WORKSPACE_MEMORY_MB', DEFAULT_MEMORY_MB)) * 1024 * 1024))
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value, size: int, owner: Hashable) -> None:
+        """Hold `value`, evicting the least recently used entries beyond the budget."""
+        if size > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.used -= previous[1]
+            self._entries[key] = (value, size, owner)
+            self.used += size
+            while self.used > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.used -= evicted_size
+                evicted += 1
+        if evicted:
+            metrics.inc(self._evictions, evicted, reason='budget')
+        self._update_gauge()
+
+    def release(self, owner: Hashable) -> int:
+        """Drop every entry of `owner`; returns how many there were."""
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[2] == owner]
+            for key in keys:
+                self.used -= self._entries.pop(key)[1]
+        if keys:
+            metrics.inc(self._evictions, len(keys), reason='released')
+            self._update_gauge()
+        return len(keys)
+
+    def _update_gauge(self):
+        if metrics.enabled:
+            self._used_gauge.set(self.used)
+
+
+class OpenDocument:
+    """Lightweight state of a document open in a workspace."""
+
+    def __init__(self, path: str, name: str, doc_key: str, page_count: int, page_sizes=None):
+        self.path = path
+        self.name = name
+        self.doc_key = doc_key
+        self.page_count = page_count
+        self.page_sizes = page_sizes
+        self.current_page = 1
+        # Terms of the last search, highlighted on every page shown
+        self.highlight_terms: List[str] = []
+        self.last_used = time.monotonic()
+        self.asleep = False
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+        self.asleep = False
+
+
+class Workspace:
+    """The documents one session has open, most recently used last."""
+
+    def __init__(self, max_documents: int = DEFAULT_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self.documents: 'OrderedDict[str, OpenDocument]' = OrderedDict()
+        self.active: Optional[OpenDocument] = None
+        self.last_used = time.monotonic()
+
+    def get(self, doc_key: str) -> Optional[OpenDocument]:
+        return self.documents.get(doc_key)
+
+    def activate(self, document: OpenDocument) -> List[OpenDocument]:
+        """Make `document` the one shown, adding it if new; returns documents closed to make room."""
+        self.documents[document.doc_key] = document
+        self.documents.move_to_end(document.doc_key)
+        self.active = document
+        document.touch()
+        self.last_used = document.last_used
+        closed = []
+        while len(self.documents) > self.max_documents:
+            _, oldest = self.documents.popitem(last=False)
+            closed.append(oldest)
+        return closed
+
+    def close(self, doc_key: str) -> Optional[OpenDocument]:
+        """Remove a document; the most recently used remaining one becomes active."""
+        document = self.documents.pop(doc_key, None)
+        if document is not None and document is self.active:
+            self.active = next(reversed(self.documents.values()), None)
+        return document
+
+    def choices(self) -> List[Tuple[str, str]]:
+        """(label, doc_key) of each open document, for a selector."""
+        return [(document.name, doc_key) for doc_key, document in self.documents.items()]
+
+
+class WorkspaceManager:
+    """Workspaces of all sessions, releasing documents nobody is viewing.
+
+    `previewer.release(path)` frees what the previewer holds for a document;
+    it is called once no session has the document open and awake.
+    """
+
+    def __init__(self, previewer, max_documents: int = DEFAULT_MAX_DOCUMENTS,
+                 idle_seconds: float = DEFAULT_IDLE_SECONDS, session_ttl: float = DEFAULT_SESSION_TTL):
+        self.previewer = previewer
+        self.max_documents = max_documents
+        self.idle_seconds = idle_seconds
+        self.session_ttl = session_ttl
+        self._workspaces: Dict[Hashable, Workspace] = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+        self._open_documents = metrics.gauge('docpreview_workspace_documents', 'Documents open across sessions by state')
+
+    @classmethod
+    def from_env(cls, previewer) -> 'WorkspaceManager':
+        return cls(
+            previewer,
+            max_documents=int(os.environ.get('DOCPREVIEW_WORKSPACE_DOCUMENTS', DEFAULT_MAX_DOCUMENTS)),
+            idle_seconds=float(os.environ.get('DOCPREVIEW_WORKSPACE_IDLE_S', DEFAULT_IDLE_SECONDS)),
+        )
+
+    def workspace(self, session: Hashable) -> Workspace:
+        """The session's workspace, created on first use."""
+        self.sweep()
+        with self._lock:
+            workspace = self._workspaces.get(session)
+            if workspace is None:
+                workspace = self._workspaces[session] = Workspace(self.max_documents)
+            workspace.last_used = time.monotonic()
+            return workspace
+
+    def find(self, doc_key: str) -> Optional[OpenDocument]:
+        """The document with this content hash in any workspace, to reuse its metadata."""
+        with self._lock:
+            for workspace in self._workspaces.values():
+                document = workspace.get(doc_key)
+                if document is not None:
+                    return document
+        return None
+
+    def open(self, workspace: Workspace, document: OpenDocument) -> OpenDocument:
+        """Add (or bring forward) a document in a workspace and make it active."""
+        with self._lock:
+            closed = workspace.activate(document)
+        for document_closed in closed:
+            self._release_if_unused(document_closed)
+        return document
+
+    def close(self, workspace: Workspace, doc_key: str) -> Optional[OpenDocument]:
+        with self._lock:
+            document = workspace.close(doc_key)
+        if document is not None:
+            self._release_if_unused(document)
+        return workspace.active
+
+    def sweep(self, force: bool = False) -> None:
+        """Put idle documents to sleep and drop expired sessions."""
+        now = time.monotonic()
+        if not force and now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+
+        with self._lock:
+            expired = []
+            for session, workspace in list(self._workspaces.items()):
+                if now - workspace.last_used > self.session_ttl:
+                    expired.extend(workspace.documents.values())
+                    del self._workspaces[session]
+            # A document is idle only if every session holding it is
+            last_used: Dict[str, float] = {}
+            documents: Dict[str, List[OpenDocument]] = {}
+            for workspace in self._workspaces.values():
+                for doc_key, document in workspace.documents.items():
+                    last_used[doc_key] = max(last_used.get(doc_key, 0.0), document.last_used)
+                    documents.setdefault(doc_key, []).append(document)
+            sleeping = []
+            for doc_key, copies in documents.items():
+                if now - last_used[doc_key] > self.idle_seconds and not all(d.asleep for d in copies):
+                    for document in copies:
+                        document.asleep = True
+                    sleeping.append(copies[0])
+            # Documents only expired sessions had open
+            released = {d.doc_key: d for d in expired if d.doc_key not in documents and not d.asleep}
+            sleeping.extend(released.values())
+            if metrics.enabled:
+                asleep = sum(1 for copies in documents.values() if copies[0].asleep)
+                self._open_documents.set(len(documents) - asleep, state='awake')
+                self._open_documents.set(asleep, state='asleep')
+
+        for document in sleeping:
+            self.previewer.release(document.path)
+            metrics.log_event('workspace_sleep', file=document.name, doc_key=document.doc_key)
+
+    def _release_if_unused(self, document: OpenDocument) -> None:
+        if self.find(document.doc_key) is None:
+            self.previewer.release(document.path)